@@ -10,9 +10,10 @@ bl_info = {
 }
 
 import bpy
-from . import sge_import, sge_export
+import os
+from . import sge_import, sge_export, sge_influences, sge_map
 from bpy_extras.io_utils import ImportHelper, ExportHelper
-from bpy.props import StringProperty, IntProperty
+from bpy.props import StringProperty, IntProperty, FloatProperty, BoolProperty, EnumProperty
 
 class ImportSgeJson(bpy.types.Operator, ImportHelper):
     bl_idname = "import.sge_json_data"
@@ -21,8 +22,67 @@ class ImportSgeJson(bpy.types.Operator, ImportHelper):
     filename_ext = ".json"
     filter_glob = StringProperty(default="*.sge.json", options={'HIDDEN'})
 
+    import_sge_profile: BoolProperty(
+        name='Profile',
+        description='Record per-stage timings and memory use to a .sge_import_profile.json next to the model (also enabled by SGE_PROFILE=1)',
+        default=False,
+    )
+
+    import_sge_update_existing: BoolProperty(
+        name='Update Existing',
+        description='Re-import into a scene this model was already imported into, rebuilding only the materials, submeshes and animations that changed',
+        default=False,
+    )
+
+    import_sge_merge_submeshes: BoolProperty(
+        name='Merge Submeshes',
+        description='Import each submesh group as a single object, welding the vertices its submeshes share (the exporter splits it back into the original submeshes)',
+        default=False,
+    )
+
+    import_sge_lazy_animations: BoolProperty(
+        name='Lazy Animations',
+        description='Only create the list of animations at import and build each one the first time it is selected or exported',
+        default=False,
+    )
+
     def execute(self, context):
-        return sge_import.import_sge(self.filepath)
+        return sge_import.import_sge(self.filepath, 'blend', self.import_sge_profile or None, self.import_sge_update_existing,
+                                     self.import_sge_merge_submeshes, self.import_sge_lazy_animations)
+
+class ImportSgeMap(bpy.types.Operator, ImportHelper):
+    bl_idname = "import.sge_map"
+    bl_label = "Import SGE Map"
+    bl_options = {'PRESET'}
+    filename_ext = ".csv"
+    filter_glob = StringProperty(default="*.csv", options={'HIDDEN'})
+
+    import_sge_map_models: StringProperty(
+        name='Models Directory',
+        description='Directory searched for the .sge.json of every model the map places (defaults to the directory of the CSV)',
+        default='',
+        subtype='DIR_PATH',
+    )
+    import_sge_map_rotation_units: IntProperty(
+        name='Rotation Units',
+        description='Rotation value of a full turn about the vertical axis',
+        default=sge_map.default_rotation_units,
+        min=1,
+    )
+
+    def execute(self, context):
+        return sge_map.assemble_map(self.filepath, self.import_sge_map_models or os.path.dirname(self.filepath),
+                                    rotation_units=self.import_sge_map_rotation_units)
+
+class BuildSgeAnimations(bpy.types.Operator):
+    bl_idname = "object.sge_build_animations"
+    bl_label = "Build SGE Animations"
+    bl_description = "Build every lazily imported SGE animation that hasn't been built yet"
+
+    def execute(self, context):
+        count = sge_import.build_lazy_animations()
+        self.report({'INFO'}, f'Built {count} SGE animations')
+        return {'FINISHED'}
 
 class ExportSgeJson(bpy.types.Operator, ExportHelper):
     bl_idname = "export.sge_json_data"
@@ -38,26 +98,105 @@ class ExportSgeJson(bpy.types.Operator, ExportHelper):
         min=0,
         max=5,
     )
+    export_sge_geometry_sidecar: BoolProperty(
+        name='Geometry Sidecar',
+        description='Write vertex and face data to a binary .sge.bin file next to the .sge.json instead of into the JSON',
+        default=False,
+    )
+    export_sge_float_precision: IntProperty(
+        name='Float Precision',
+        description='Decimal places to keep for vertex positions, normals, UVs and colors (-1 keeps full precision)',
+        default=-1,
+        min=-1,
+        max=9,
+    )
+    export_sge_cache_optimization: EnumProperty(
+        name='Vertex Cache Optimization',
+        description="Reorder each submesh's triangles (and optionally its vertices) so the GPU's vertex cache is reused more",
+        items=[
+            ('NONE', 'None', 'Keep the faces in the order of the mesh polygons'),
+            ('FACES', 'Faces', 'Reorder the triangles'),
+            ('VERTICES', 'Faces and Vertices', 'Reorder the triangles, then renumber the vertices in the order they are used'),
+        ],
+        default='NONE',
+    )
+    export_sge_influence_budget: BoolProperty(
+        name='Influence Budget',
+        description='Limit, prune and renormalize each vertex\'s bone weights before building bone palettes so stray weights do not cost palette slots or extra submeshes',
+        default=False,
+    )
+    export_sge_max_influences: IntProperty(
+        name='Max Influences',
+        description='Bones each vertex keeps, strongest first',
+        default=4,
+        min=1,
+        max=4,
+    )
+    export_sge_min_weight: FloatProperty(
+        name='Min Weight',
+        description='Bone weights below this are dropped (each vertex always keeps its strongest bone)',
+        default=0.01,
+        min=0.0,
+        max=1.0,
+    )
+    export_sge_smooth_weight: FloatProperty(
+        name='Smooth Weight',
+        description='Drop a vertex\'s weakest bone up to this weight when that leaves a bone set more vertices use (0 disables smoothing)',
+        default=0.0,
+        min=0.0,
+        max=1.0,
+    )
+    export_sge_use_cache: BoolProperty(
+        name='Export Cache',
+        description='Reuse the submeshes of objects that have not changed since the last export to this file (kept in a .sge_export_cache.json next to it)',
+        default=False,
+    )
+    export_sge_profile: BoolProperty(
+        name='Profile',
+        description='Record per-stage timings and memory use to a .sge_export_profile.json next to the model (also enabled by SGE_PROFILE=1)',
+        default=False,
+    )
 
     def execute(self, context):
-        return sge_export.export_sge(self.filepath, self.export_sge_model_type)
+        float_precision = None
+        if self.export_sge_float_precision >= 0:
+            float_precision = { attribute: self.export_sge_float_precision for attribute in ('Position', 'Normal', 'UVCoords', 'Color') }
+        cache_optimization = None if self.export_sge_cache_optimization == 'NONE' else self.export_sge_cache_optimization.lower()
+        influence_budget = None
+        if self.export_sge_influence_budget:
+            influence_budget = sge_influences.InfluenceBudget(self.export_sge_max_influences, self.export_sge_min_weight, self.export_sge_smooth_weight)
+        return sge_export.export_sge(self.filepath, self.export_sge_model_type, self.export_sge_geometry_sidecar, float_precision,
+                                     self.export_sge_profile or None, self.export_sge_use_cache, cache_optimization, influence_budget)
 
 def menu_func_import(self, context):
     self.layout.operator(ImportSgeJson.bl_idname, text="SGE JSON (.sge.json)")
+    self.layout.operator(ImportSgeMap.bl_idname, text="SGE Map Placements (.csv)")
 def menu_func_export(self, context):
     self.layout.operator(ExportSgeJson.bl_idname, text="SGE JSON (.sge.json)")
+def menu_func_animation(self, context):
+    self.layout.operator(BuildSgeAnimations.bl_idname)
 
 def register():
     bpy.utils.register_class(ImportSgeJson)
+    bpy.utils.register_class(ImportSgeMap)
     bpy.types.TOPBAR_MT_file_import.append(menu_func_import)
     bpy.utils.register_class(ExportSgeJson)
     bpy.types.TOPBAR_MT_file_export.append(menu_func_export)
+    bpy.utils.register_class(BuildSgeAnimations)
+    bpy.types.VIEW3D_MT_object_animation.append(menu_func_animation)
+    bpy.app.handlers.depsgraph_update_post.append(sge_import.build_active_lazy_animations)
+    bpy.app.handlers.load_post.append(sge_import.reset_lazy_animations)
 
 def unregister():
     bpy.utils.unregister_class(ImportSgeJson)
+    bpy.utils.unregister_class(ImportSgeMap)
     bpy.types.TOPBAR_MT_file_import.remove(menu_func_import)
     bpy.utils.unregister_class(ExportSgeJson)
     bpy.types.TOPBAR_MT_file_export.remove(menu_func_export)
+    bpy.utils.unregister_class(BuildSgeAnimations)
+    bpy.types.VIEW3D_MT_object_animation.remove(menu_func_animation)
+    bpy.app.handlers.depsgraph_update_post.remove(sge_import.build_active_lazy_animations)
+    bpy.app.handlers.load_post.remove(sge_import.reset_lazy_animations)
 
 if __name__ == '__main__':
     register()
\ No newline at end of file
@@ -0,0 +1,189 @@
+import argparse
+import json
+import math
+import os
+import random
+import struct
+import sys
+import zlib
+
+# Seeded synthetic .sge.json models; palette_size > 16 weights grid columns to more bones than one palette holds
+
+def png_bytes(rgba):
+    def chunk(chunk_type, data):
+        return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+    header = struct.pack('>2I5B', 1, 1, 8, 6, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(b'\x00' + bytes(rgba))) + chunk(b'IEND', b'')
+
+def json_vector(x, y, z):
+    return { 'X': x, 'Y': y, 'Z': z }
+
+def generate_bones(rng, num_bones):
+    bones = []
+    for i in range(num_bones):
+        bones.append({
+            'Address': i + 1,
+            'TailOffset': json_vector(0.0, 0.1, 0.0),
+            'HeadPosition': json_vector(rng.uniform(-1, 1), rng.uniform(-1, 1), rng.uniform(0, 2)) if i > 0 else json_vector(0.0, 0.0, 0.0),
+            'ParentAddress': (i - 1) // 2 + 1 if i > 0 else 0,
+            'ChildAddress': 0,
+            'NextSiblingAddress': 0,
+            'BodyPart': 0,
+            'VertexGroup': {},
+        })
+    return bones
+
+def generate_submesh(rng, submesh_idx, num_vertices, bones, materials, palette_size, start_vertex, start_face):
+    columns = max(2, int(math.ceil(math.sqrt(num_vertices))))
+    rows = max(2, int(math.ceil(num_vertices / columns)))
+    num_vertices = columns * rows
+    # Bone 0 is the root and is never weighted; each submesh gets its own window of bones
+    window_size = max(1, min(palette_size, len(bones) - 1))
+    window_start = 1 + (submesh_idx * window_size) % max(1, len(bones) - window_size)
+    window = list(range(window_start, window_start + window_size))
+    palette = window[:16] if palette_size <= 16 else window
+
+    vertices = []
+    for i in range(num_vertices):
+        (row, column) = divmod(i, columns)
+        primary = column * len(window) // columns
+        secondary = min(primary + 1, len(window) - 1)
+        weights = [0.7, 0.3, 0.0, 0.0] if secondary != primary else [1.0, 0.0, 0.0, 0.0]
+        slots = [primary, secondary, 0, 0]
+        for (slot, weight) in zip(slots, weights):
+            if weight > 0:
+                bones[window[slot]]['VertexGroup'][f'0,{submesh_idx},{i}'] = weight
+        vertices.append({
+            'Position': json_vector(column / columns, row / rows, rng.uniform(-0.01, 0.01)),
+            'Weight': weights,
+            'BoneIndices': slots if palette_size <= 16 else [min(s, 15) for s in slots],
+            'Normal': json_vector(0.0, 0.0, 1.0),
+            'Color': { 'R': rng.random(), 'G': rng.random(), 'B': rng.random(), 'A': 1.0 },
+            'UVCoords': { 'X': column / (columns - 1), 'Y': row / (rows - 1) },
+            'Unknown2': 65535,
+        })
+    faces = []
+    for row in range(rows - 1):
+        for column in range(columns - 1):
+            i = row * columns + column
+            faces.append({ 'Polygon': [i, i + columns, i + 1] })
+            faces.append({ 'Polygon': [i + 1, i + columns, i + columns + 1] })
+
+    material = materials[submesh_idx % len(materials)] if len(materials) > 0 else None
+    return {
+        'SubmeshVertices': vertices,
+        'SubmeshFaces': faces,
+        'Material': material,
+        'Unknown00': 0,
+        'Unknown02': 0,
+        'BlendDataAddress': 0,
+        'GXLightingAddress': 1,
+        'OutlineAddress': 1 if submesh_idx % 2 == 0 else 0,
+        'Unknown18': 0,
+        'Unknown1C': 0,
+        'Unknown20': 0,
+        'StartVertex': start_vertex,
+        'EndVertex': start_vertex + num_vertices - 1,
+        'StartFace': start_face,
+        'FaceCount': len(faces),
+        'BonePalette': [b for b in palette] + [-1] * (16 - len(palette)),
+        'Unknown54': 0.0,
+        'Unknown58': 0.0,
+        'Unknown5C': 0.0,
+        'Unknown60': 0.0,
+    }
+
+def generate_animations(rng, num_animations, num_keyframes, num_bones):
+    keyframe_definitions = []
+    animations = []
+    table_size = max(1, num_bones * num_keyframes // 4)
+    for _ in range(num_animations):
+        used_keyframes = []
+        for k in range(num_keyframes):
+            used_keyframes.append(len(keyframe_definitions))
+            keyframe_definitions.append({ 'Unknown00': 0.0, 'Unknown04': 0.0, 'Unknown08': 0, 'Unknown0A': 0, 'Unknown0C': 0,
+                                          'NumFrames': 1, 'EndFrame': 2 * k + 1, 'Unknown14': 0, 'Unknown18': 0,
+                                          'Unknown1C': 0, 'Unknown20': 0, 'Unknown24': 0 })
+        animations.append({
+            'TotalFrames': float(2 * num_keyframes),
+            'Unknown04': 0,
+            'UsedKeyframes': used_keyframes,
+            'BoneTable': [{ 'Keyframes': [{
+                'TranslateIndex': rng.randrange(table_size),
+                'RotateIndex': rng.randrange(table_size),
+                'ScaleIndex': rng.randrange(table_size),
+            } for _ in range(num_keyframes)] } for _ in range(num_bones - 1)],
+        })
+    translations = [json_vector(rng.uniform(-0.1, 0.1), rng.uniform(-0.1, 0.1), rng.uniform(-0.1, 0.1)) for _ in range(table_size)]
+    rotations = []
+    for _ in range(table_size):
+        (w, x, y, z) = (rng.gauss(0, 1) for _ in range(4))
+        length = math.sqrt(w * w + x * x + y * y + z * z) or 1.0
+        rotations.append({ 'X': x / length, 'Y': y / length, 'Z': z / length, 'W': w / length })
+    scales = [json_vector(1.0, 1.0, 1.0) for _ in range(table_size)]
+    return (animations, keyframe_definitions, translations, rotations, scales)
+
+def generate_sge(name='synthetic', vertices=1000, bones=20, submeshes=4, materials=2, animations=2, keyframes=30,
+                 palette_size=16, seed=0, texture_dir=None):
+    rng = random.Random(seed)
+    sge_materials = []
+    for i in range(materials):
+        texture_path = ''
+        if texture_dir is not None:
+            os.makedirs(texture_dir, exist_ok=True)
+            texture_path = os.path.join(texture_dir, f'{name}_mat{i}.png')
+            with open(texture_path, 'wb') as f:
+                f.write(png_bytes([(i * 37) % 256, (i * 91) % 256, (i * 53) % 256, 255]))
+        sge_materials.append({ 'Index': i, 'Name': f'{name}_mat{i}', 'TexturePath': texture_path })
+    sge_bones = generate_bones(rng, max(2, bones))
+    (sge_animations, keyframe_definitions, translations, rotations, scales) = generate_animations(rng, animations, keyframes, len(sge_bones))
+
+    sge_submeshes = []
+    (start_vertex, start_face) = (0, 0)
+    for s in range(submeshes):
+        submesh = generate_submesh(rng, s, max(4, vertices // max(1, submeshes)), sge_bones, sge_materials, palette_size, start_vertex, start_face)
+        sge_submeshes.append(submesh)
+        start_vertex = submesh['EndVertex'] + 1
+        start_face += submesh['FaceCount'] * 3
+
+    return {
+        'Name': name,
+        'SgeHeader': { 'Version': 8, 'ModelType': 3 },
+        'SgeAnimations': sge_animations,
+        'TranslateDataEntries': translations,
+        'RotateDataEntries': rotations,
+        'ScaleDataEntries': scales,
+        'KeyframeDefinitions': keyframe_definitions,
+        'SgeGXLightingDataTable': [],
+        'SubmeshBlendDataTable': [],
+        'OutlineDataTable': [{ 'Offset': 1, 'Unknown00': 0, 'Unknown04': 0.0, 'Weight': 0.0025, 'Color': '#ff000000' }],
+        'Unknown4CTable': [],
+        'BoneAnimationGroups': [],
+        'Unknown58Table': [],
+        'SgeMeshes': [{} for _ in range(10)],
+        'SgeMaterials': sge_materials,
+        'SgeBones': sge_bones,
+        'SgeSubmeshes': [sge_submeshes],
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generates a synthetic .sge.json model for benchmarking')
+    parser.add_argument('output', help='Path of the .sge.json file to write (textures go in a folder next to it)')
+    parser.add_argument('--vertices', type=int, default=1000, help='Approximate total number of vertices')
+    parser.add_argument('--bones', type=int, default=20)
+    parser.add_argument('--submeshes', type=int, default=4)
+    parser.add_argument('--materials', type=int, default=2)
+    parser.add_argument('--animations', type=int, default=2)
+    parser.add_argument('--keyframes', type=int, default=30, help='Keyframes per animation')
+    parser.add_argument('--palette-size', type=int, default=16, help='Bones each submesh is weighted to (more than 16 needs splitting on export)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    name = os.path.basename(args.output).split('.')[0]
+    sge = generate_sge(name, args.vertices, args.bones, args.submeshes, args.materials, args.animations, args.keyframes,
+                       args.palette_size, args.seed, os.path.join(os.path.dirname(os.path.abspath(args.output)), f'{name}_textures'))
+    with open(args.output, 'w') as f:
+        json.dump(sge, f)
+    print(f"Wrote {args.output}: {sum(len(s['SubmeshVertices']) for s in sge['SgeSubmeshes'][0])} vertices, "
+          f"{sum(len(s['SubmeshFaces']) for s in sge['SgeSubmeshes'][0])} faces, {len(sge['SgeBones'])} bones, "
+          f"{len(sge['SgeAnimations'])} animations", file=sys.stderr)
@@ -0,0 +1,155 @@
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+# Times the import/export hot paths against the bpy stand-in and compares each run with the previous one in a JSONL history
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(benchmarks_dir, 'standin'))
+sys.path.insert(1, os.path.dirname(benchmarks_dir))
+sys.path.insert(2, benchmarks_dir)
+
+import bpy
+import generate_sge
+import sge_animation
+import sge_export
+import sge_geometry
+import sge_import
+import sge_model
+
+# name: generate_sge arguments
+tiers = {
+    'small': { 'vertices': 1000, 'bones': 20, 'submeshes': 4, 'materials': 2, 'animations': 2, 'keyframes': 30 },
+    'medium': { 'vertices': 20000, 'bones': 60, 'submeshes': 16, 'materials': 8, 'animations': 8, 'keyframes': 60 },
+    'large': { 'vertices': 100000, 'bones': 120, 'submeshes': 48, 'materials': 16, 'animations': 16, 'keyframes': 120 },
+}
+stages = ('construct_armature', 'construct_mesh', 'construct_animation', 'extract_submesh', 'split_submeshes')
+default_history = os.path.join(benchmarks_dir, 'results.jsonl')
+
+def timed(timings, stage, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+    return result
+
+# The bones and materials export_sge would have gathered from the scene import_sge built for model
+def export_model(model):
+    exported = sge_model.SgeModel(model.name)
+    exported.bones = [sge_model.SgeBone(b.address, blender_name=f'Bone{b.address}') for b in model.bones]
+    exported.materials = [sge_model.SgeMaterial(m.index, m.name, m.texture_path) for m in model.materials]
+    return exported
+
+# Builds a scene from the model the way import_sge does, then extracts every submesh back out the way export_sge does
+def run_pipeline(sge, split_sge):
+    timings = {}
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    (model, split_model) = (sge_model.SgeModel.from_json(sge), sge_model.SgeModel.from_json(split_sge))
+    materials = sge_import.construct_materials(model)
+    (armature, bones_list) = timed(timings, 'construct_armature', sge_import.construct_armature, model)
+
+    vertex_group_index = sge_geometry.build_vertex_group_index(model.bones)
+    meshes = []
+    i = 0
+    for (j, submesh_group) in enumerate(model.submesh_groups):
+        for submesh in submesh_group:
+            meshes.append(timed(timings, 'construct_mesh', sge_import.construct_mesh, model, submesh, materials, vertex_group_index, j, i))
+            i += 1
+
+    bpy.context.object = armature
+    armature.animation_data_create()
+    transform_tables = sge_animation.decode_transform_tables(model, sge_import.model_scale)
+    for (i, anim) in enumerate(model.animations):
+        armature.animation_data.action = bpy.data.actions.new(f'Animation{i:3d}')
+        timed(timings, 'construct_animation', sge_import.construct_animation, model, anim, bones_list, i, transform_tables)
+
+    exported = export_model(model)
+    export_context = sge_export.SgeExportContext(exported)
+    (vtx, face) = (0, 0)
+    for obj in meshes:
+        sge_submesh = timed(timings, 'extract_submesh', sge_export.extract_submesh, obj, obj.data, exported, vtx, face, export_context)
+        (vtx, face) = sge_export.next_submesh_offsets(sge_submesh.end_vertex, sge_submesh.start_face, sge_submesh.face_count, 3)
+
+    # One mesh weighted to every bone, which has to be split into 16-bone palettes
+    split_materials = sge_import.construct_materials(split_model)
+    split_obj = sge_import.construct_mesh(split_model, split_model.submesh_groups[0][0], split_materials,
+                                          sge_geometry.build_vertex_group_index(split_model.bones), 0, 0)
+    split_context = sge_export.SgeExportContext(export_model(split_model))
+    timed(timings, 'split_submeshes', sge_export.split_submeshes, split_obj, split_context)
+    return timings
+
+def model_counts(sge):
+    submeshes = [s for group in sge['SgeSubmeshes'] for s in group]
+    return {
+        'Vertices': sum(len(s['SubmeshVertices']) for s in submeshes),
+        'Faces': sum(len(s['SubmeshFaces']) for s in submeshes),
+        'Submeshes': len(submeshes),
+        'Bones': len(sge['SgeBones']),
+        'Animations': len(sge['SgeAnimations']),
+        'Keyframes': sum(len(a['UsedKeyframes']) for a in sge['SgeAnimations']),
+    }
+
+def read_history(history_path):
+    previous = {}
+    if os.path.exists(history_path):
+        with open(history_path) as f:
+            for line in f:
+                if len(line.strip()) > 0:
+                    result = json.loads(line)
+                    previous[(result['Tier'], result['Stage'])] = result
+    return previous
+
+def run_benchmarks(tier_names, repeat, history_path, threshold, verbose=False):
+    previous = read_history(history_path)
+    timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+    results = []
+    regressions = []
+    with tempfile.TemporaryDirectory(prefix='sge-bench-') as texture_dir, open(os.devnull, 'w') as devnull:
+        for tier_name in tier_names:
+            tier = tiers[tier_name]
+            sge = generate_sge.generate_sge(f'bench_{tier_name}', texture_dir=texture_dir, **tier)
+            split_sge = generate_sge.generate_sge(f'bench_{tier_name}_split', vertices=tier['vertices'] // 4, bones=tier['bones'],
+                                                  submeshes=1, materials=1, animations=0, palette_size=tier['bones'], texture_dir=texture_dir)
+            counts = model_counts(sge)
+            print(f"{tier_name}: {counts['Vertices']} vertices, {counts['Faces']} faces, {counts['Submeshes']} submeshes, "
+                  f"{counts['Bones']} bones, {counts['Keyframes']} keyframes")
+            best = {}
+            for _ in range(repeat):
+                with contextlib.redirect_stdout(sys.stdout if verbose else devnull):
+                    timings = run_pipeline(sge, split_sge)
+                for (stage, seconds) in timings.items():
+                    best[stage] = min(seconds, best.get(stage, seconds))
+            for stage in stages:
+                result = { 'Timestamp': timestamp, 'Python': platform.python_version(), 'Tier': tier_name, 'Stage': stage,
+                           'Seconds': best[stage], 'Counts': counts }
+                results.append(result)
+                change = ''
+                last = previous.get((tier_name, stage))
+                if last is not None and last['Seconds'] > 0:
+                    ratio = best[stage] / last['Seconds'] - 1
+                    change = f'  {ratio:+.1%} vs {last["Timestamp"]}'
+                    if ratio > threshold:
+                        change += '  REGRESSION'
+                        regressions.append(result)
+                print(f'  {stage:<20} {best[stage]:9.4f}s{change}')
+    if history_path is not None:
+        with open(history_path, 'a') as f:
+            for result in results:
+                f.write(json.dumps(result) + '\n')
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the SGE import/export hot paths outside of Blender')
+    parser.add_argument('--tiers', default='small,medium', help=f'Comma-separated size tiers to run ({", ".join(tiers)})')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per tier; the fastest time of each stage is kept')
+    parser.add_argument('--history', default=default_history, help='JSONL file results are appended to and compared against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Slowdown (as a fraction) relative to the previous run that counts as a regression')
+    parser.add_argument('--verbose', action='store_true', help="Show the scripts' own progress output")
+    args = parser.parse_args()
+
+    regressions = run_benchmarks(args.tiers.split(','), args.repeat, args.history, args.threshold, args.verbose)
+    sys.exit(1 if len(regressions) > 0 else 0)
@@ -0,0 +1,713 @@
+# Pure-Python stand-in for the parts of bpy the SGE scripts use; data-blocks only hold what the scripts read back
+from array import array
+import bisect
+import os
+import struct
+from types import SimpleNamespace
+
+from mathutils import Matrix, Vector
+
+# Flat per-element attribute storage with Blender's foreach_get/foreach_set semantics
+class ElementCollection:
+    def __init__(self, attributes, length=0):
+        self._attributes = attributes # name: (typecode, components)
+        self._data = { name: array(typecode) for (name, (typecode, _)) in attributes.items() }
+        self._length = 0
+        self.add(length)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError(f'index {i} out of range')
+        return Element(self, i)
+
+    def __iter__(self):
+        return (Element(self, i) for i in range(self._length))
+
+    def add(self, count):
+        for (name, (typecode, components)) in self._attributes.items():
+            self._data[name].extend(array(typecode, [0]) * (count * components))
+        self._length += count
+
+    def foreach_set(self, attribute, values):
+        (typecode, components) = self._attributes[attribute]
+        if len(values) != self._length * components:
+            raise RuntimeError(f'internal error setting the array, expected {self._length * components} items, got {len(values)}')
+        self._data[attribute] = array(typecode, values)
+
+    def foreach_get(self, attribute, buffer):
+        data = self._data[attribute]
+        if len(buffer) != len(data):
+            raise RuntimeError(f'internal error getting the array, expected {len(data)} items, got {len(buffer)}')
+        if isinstance(buffer, array) and buffer.typecode == data.typecode:
+            buffer[:] = data
+        else:
+            buffer[:] = type(buffer)(data) if isinstance(buffer, array) else data.tolist()
+
+    def get_element(self, i, attribute):
+        (_, components) = self._attributes[attribute]
+        if components == 1:
+            return self._data[attribute][i]
+        return Vector(self._data[attribute][i * components:(i + 1) * components])
+
+    def set_element(self, i, attribute, value):
+        (_, components) = self._attributes[attribute]
+        if components == 1:
+            self._data[attribute][i] = value
+        else:
+            self._data[attribute][i * components:(i + 1) * components] = array(self._data[attribute].typecode, value)
+
+class Element:
+    def __init__(self, collection, index):
+        object.__setattr__(self, '_collection', collection)
+        object.__setattr__(self, 'index', index)
+
+    def __getattr__(self, name):
+        collection = object.__getattribute__(self, '_collection')
+        if name in collection._attributes:
+            return collection.get_element(self.index, name)
+        extra = getattr(collection, 'element_' + name, None)
+        if extra is not None:
+            return extra(self.index)
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self._collection.set_element(self.index, name, value)
+
+class MeshVertices(ElementCollection):
+    def __init__(self):
+        self.groups = []
+        super().__init__({ 'co': ('f', 3) })
+
+    def add(self, count):
+        super().add(count)
+        self.groups += [[] for _ in range(count)]
+
+    def element_groups(self, i):
+        return self.groups[i]
+
+class MeshPolygons(ElementCollection):
+    def __init__(self, mesh):
+        self._mesh = mesh
+        super().__init__({ 'loop_start': ('i', 1), 'loop_total': ('i', 1), 'material_index': ('i', 1), 'use_smooth': ('b', 1) })
+
+    def element_vertices(self, i):
+        start = self._data['loop_start'][i]
+        return self._mesh.loops._data['vertex_index'][start:start + self._data['loop_total'][i]].tolist()
+
+    def element_loop_indices(self, i):
+        start = self._data['loop_start'][i]
+        return range(start, start + self._data['loop_total'][i])
+
+class IDCollection:
+    def __init__(self, factory):
+        self._factory = factory
+        self._items = []
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._items[key]
+        item = self.get(key)
+        if item is None:
+            raise KeyError(key)
+        return item
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        return [item.name for item in self._items]
+
+    def get(self, name, default=None):
+        return next((item for item in self._items if item.name == name), default)
+
+    def new(self, name, *args, **kwargs):
+        item = self._factory(self.unique_name(name), *args, **kwargs)
+        self._items.append(item)
+        return item
+
+    def remove(self, item):
+        self._items.remove(item)
+        if isinstance(item, ID):
+            item._removed = True
+
+    def unique_name(self, name):
+        names = set(self.keys())
+        if name not in names:
+            return name
+        i = 1
+        while f'{name}.{i:03d}' in names:
+            i += 1
+        return f'{name}.{i:03d}'
+
+class ID:
+    def __init__(self, name):
+        self._name = name
+        self._removed = False
+        self._properties = {}
+
+    # Like Blender, touching a data-block that has been removed (or reset away) raises ReferenceError
+    @property
+    def name(self):
+        if self._removed:
+            raise ReferenceError('StructRNA of type ID has been removed')
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._name = value
+
+    def __getitem__(self, key):
+        return self._properties[key]
+
+    def __setitem__(self, key, value):
+        self._properties[key] = value
+
+    def __delitem__(self, key):
+        del self._properties[key]
+
+    def get(self, key, default=None):
+        return self._properties.get(key, default)
+
+    # Only material slots and texture images are looked at, which is all the scripts remap
+    def user_remap(self, new_id):
+        for mesh in data.meshes:
+            mesh.materials[:] = [new_id if m is self else m for m in mesh.materials]
+        for material in data.materials:
+            if material.node_tree is not None:
+                for node in material.node_tree.nodes:
+                    if getattr(node, 'image', None) is self:
+                        node.image = new_id
+
+class UVLayer:
+    def __init__(self, name, loop_count):
+        self.name = name
+        self.uv = ElementCollection({ 'vector': ('f', 2) }, loop_count)
+
+class UVLayers(IDCollection):
+    def __init__(self, mesh):
+        super().__init__(lambda name: UVLayer(name, len(mesh.loops)))
+
+    def new(self, name='UVMap'):
+        return super().new(name)
+
+class ColorAttribute:
+    def __init__(self, name, data_type, domain, length):
+        self.name = name
+        self.data_type = data_type
+        self.domain = domain
+        self.data = ElementCollection({ 'color': ('f', 4), 'color_srgb': ('f', 4) }, length)
+
+class Attribute:
+    def __init__(self, name, data_type, domain, length):
+        self.name = name
+        self.data_type = data_type
+        self.domain = domain
+        self.data = ElementCollection({ 'value': ('i' if data_type == 'INT' else 'f', 1) }, length)
+
+class Mesh(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.vertices = MeshVertices()
+        self.edges = ElementCollection({ 'vertices': ('i', 2) })
+        self.loops = ElementCollection({ 'vertex_index': ('i', 1), 'normal': ('f', 3) })
+        self.polygons = MeshPolygons(self)
+        self.uv_layers = UVLayers(self)
+        self.color_attributes = IDCollection(lambda name, data_type, domain: ColorAttribute(
+            name, data_type, domain, len(self.loops) if domain == 'CORNER' else len(self.vertices)))
+        self.attributes = IDCollection(lambda name, data_type, domain: Attribute(
+            name, data_type, domain, len(self.polygons) if domain == 'FACE' else len(self.loops) if domain == 'CORNER' else len(self.vertices)))
+        self.materials = []
+        self.use_auto_smooth = False
+        self.custom_normals = None
+
+    def from_pydata(self, vertices, edges, faces):
+        self.vertices.add(len(vertices))
+        self.vertices.foreach_set('co', [c for v in vertices for c in v])
+        corners = [i for f in faces for i in f]
+        self.loops.add(len(corners))
+        self.loops.foreach_set('vertex_index', corners)
+        self.polygons.add(len(faces))
+        starts = []
+        for f in faces:
+            starts.append(starts[-1] + len(f) if len(starts) > 0 else 0)
+        self.polygons.foreach_set('loop_start', starts)
+        self.polygons.foreach_set('loop_total', [len(f) for f in faces])
+
+    def update(self, calc_edges=False):
+        starts = self.polygons._data['loop_start']
+        ends = starts[1:] + array('i', [len(self.loops)])
+        self.polygons._data['loop_total'] = array('i', [e - s for (s, e) in zip(starts, ends)])
+
+    def validate(self, verbose=False):
+        return False
+
+    def calc_normals_split(self):
+        self.loops._data['normal'] = array('f', [0.0, 0.0, 1.0]) * len(self.loops)
+
+    def normals_split_custom_set_from_vertices(self, normals):
+        self.custom_normals = [tuple(n) for n in normals]
+
+class VertexGroup:
+    def __init__(self, obj, index, name):
+        self._obj = obj
+        self.index = index
+        self.name = name
+
+    def add(self, indices, weight, type):
+        groups = self._obj.data.vertices.groups
+        for v in indices:
+            element = next((g for g in groups[v] if g.group == self.index), None)
+            if element is None:
+                groups[v].append(SimpleNamespace(group=self.index, weight=weight))
+            elif type == 'REPLACE':
+                element.weight = weight
+            elif type == 'ADD':
+                element.weight = min(1.0, element.weight + weight)
+            elif type == 'SUBTRACT':
+                element.weight = max(0.0, element.weight - weight)
+
+class VertexGroups(IDCollection):
+    def __init__(self, obj):
+        super().__init__(lambda name: VertexGroup(obj, len(self._items), name))
+
+    def new(self, name='Group'):
+        return super().new(name)
+
+class Object(ID):
+    def __init__(self, name, data):
+        super().__init__(name)
+        self.data = data
+        self.type = 'MESH' if isinstance(data, Mesh) else 'ARMATURE' if isinstance(data, Armature) else 'EMPTY'
+        self.vertex_groups = VertexGroups(self)
+        self.modifiers = IDCollection(lambda name, type: SimpleNamespace(name=name, type=type, object=None))
+        self.parent = None
+        self.matrix_world = Matrix.Identity(4)
+        self.location = Vector((0, 0, 0))
+        self.animation_data = None
+        self.selected = False
+
+    def animation_data_create(self):
+        self.animation_data = AnimationData()
+        return self.animation_data
+
+    def animation_data_clear(self):
+        self.animation_data = None
+
+    def select_set(self, state):
+        self.selected = state
+
+class EditBone:
+    def __init__(self, name):
+        self.name = name
+        self.head = Vector((0, 0, 0))
+        self.tail = Vector((0, 1, 0))
+        self.parent = None
+
+class Bone:
+    def __init__(self, name, head, tail):
+        self.name = name
+        self.head = head
+        self.tail = tail
+        self.parent = None
+        self.children = []
+        self.collections = {}
+
+class BoneCollection:
+    def __init__(self, name):
+        self.name = name
+        self.bones = []
+
+    def assign(self, bone):
+        self.bones.append(bone)
+        bone.collections[self.name] = self
+
+class Armature(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.edit_bones = IDCollection(EditBone)
+        self.bones = IDCollection(None)
+        self.collections = IDCollection(BoneCollection)
+
+    # Called when leaving edit mode, like Blender turning its edit bones into bones
+    def sync_bones(self):
+        collections = { b.name: b.collections for b in self.bones }
+        bones = { e.name: Bone(e.name, e.head.copy(), e.tail.copy()) for e in self.edit_bones }
+        for edit_bone in self.edit_bones:
+            bone = bones[edit_bone.name]
+            bone.collections = collections.get(bone.name, {})
+            if edit_bone.parent is not None:
+                bone.parent = bones[edit_bone.parent.name]
+                bone.parent.children.append(bone)
+        self.bones._items = list(bones.values())
+
+    def sync_edit_bones(self):
+        edit_bones = {}
+        for bone in self.bones:
+            edit_bone = EditBone(bone.name)
+            (edit_bone.head, edit_bone.tail) = (bone.head.copy(), bone.tail.copy())
+            edit_bones[bone.name] = edit_bone
+        for bone in self.bones:
+            if bone.parent is not None:
+                edit_bones[bone.name].parent = edit_bones[bone.parent.name]
+        self.edit_bones._items = list(edit_bones.values())
+
+class FCurve:
+    def __init__(self, data_path, index, action_group):
+        self.data_path = data_path
+        self.array_index = index
+        self.group = action_group
+        self.keyframe_points = ElementCollection({ 'co': ('f', 2), 'interpolation': ('i', 1) })
+        self._points = None
+
+    # Linear between keyframes and constant outside them, which matches Blender on the keyframes themselves
+    def evaluate(self, frame):
+        if self._points is None:
+            co = self.keyframe_points._data['co']
+            self._points = sorted(zip(co[0::2], co[1::2]))
+        points = self._points
+        if len(points) == 0:
+            return 0.0
+        i = bisect.bisect_left(points, (frame, float('-inf')))
+        if i == 0:
+            return points[0][1]
+        if i == len(points):
+            return points[-1][1]
+        ((x0, y0), (x1, y1)) = (points[i - 1], points[i])
+        return y1 if x1 == frame else y0 + (y1 - y0) * (frame - x0) / (x1 - x0)
+
+    def update(self):
+        self._points = None
+
+class FCurves:
+    def __init__(self):
+        self._fcurves = []
+
+    def __len__(self):
+        return len(self._fcurves)
+
+    def __iter__(self):
+        return iter(self._fcurves)
+
+    def new(self, data_path, index=0, action_group=''):
+        if any(f.data_path == data_path and f.array_index == index for f in self._fcurves):
+            raise RuntimeError(f"F-Curve '{data_path}[{index}]' already exists in action")
+        fcurve = FCurve(data_path, index, action_group)
+        self._fcurves.append(fcurve)
+        return fcurve
+
+    def find(self, data_path, index=0):
+        return next((f for f in self._fcurves if f.data_path == data_path and f.array_index == index), None)
+
+class Action(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.fcurves = FCurves()
+        self.use_frame_range = False
+        self.frame_start = 0.0
+        self.frame_end = 0.0
+
+    def animation_data_clear(self):
+        pass
+
+class NlaTracks(IDCollection):
+    def __init__(self):
+        super().__init__(lambda name: SimpleNamespace(name=name, strips=IDCollection(
+            lambda name, start, action: SimpleNamespace(name=name, frame_start=start, action=action))))
+
+    def new(self, prev=None):
+        return super().new('NlaTrack')
+
+class AnimationData:
+    def __init__(self):
+        self.action = None
+        self.use_nla = False
+        self.nla_tracks = NlaTracks()
+
+class NodeSockets:
+    def __init__(self):
+        self._sockets = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return list(self._sockets.values())[key]
+        if key not in self._sockets:
+            self._sockets[key] = SimpleNamespace(name=key, default_value=None, links=[])
+        return self._sockets[key]
+
+node_types = { 'ShaderNodeTexImage': 'TEX_IMAGE', 'ShaderNodeGroup': 'GROUP', 'ShaderNodeMix': 'MIX',
+               'ShaderNodeVertexColor': 'VERTEX_COLOR', 'ShaderNodeBsdfPrincipled': 'BSDF_PRINCIPLED',
+               'ShaderNodeOutputMaterial': 'OUTPUT_MATERIAL', 'NodeGroupInput': 'GROUP_INPUT', 'NodeGroupOutput': 'GROUP_OUTPUT' }
+
+class Node:
+    def __init__(self, name, bl_idname):
+        self.name = name
+        self.bl_idname = bl_idname
+        self.type = node_types.get(bl_idname, bl_idname.upper())
+        self.inputs = NodeSockets()
+        self.outputs = NodeSockets()
+        self.image = None
+        self.node_tree = None
+
+class NodeTree(ID):
+    def __init__(self, name, bl_idname='ShaderNodeTree'):
+        super().__init__(name)
+        self.bl_idname = bl_idname
+        self.nodes = IDCollection(None)
+        self.nodes.new = self._new_node
+        self.links = SimpleNamespace(new=self._new_link, items=[])
+        self.interface = SimpleNamespace(new_socket=self._new_socket, items_tree=[])
+
+    def _new_node(self, type):
+        node = Node(self.nodes.unique_name(node_types.get(type, type)), type)
+        self.nodes._items.append(node)
+        return node
+
+    def _new_link(self, from_socket, to_socket):
+        link = SimpleNamespace(from_socket=from_socket, to_socket=to_socket)
+        self.links.items.append(link)
+        return link
+
+    def _new_socket(self, name, in_out='INPUT', socket_type='NodeSocketFloat'):
+        socket = SimpleNamespace(name=name, in_out=in_out, socket_type=socket_type)
+        self.interface.items_tree.append(socket)
+        return socket
+
+class Material(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.node_tree = None
+        self._use_nodes = False
+        self.use_backface_culling = False
+        self.blend_method = 'OPAQUE'
+
+    @property
+    def use_nodes(self):
+        return self._use_nodes
+
+    @use_nodes.setter
+    def use_nodes(self, value):
+        self._use_nodes = value
+        if value and self.node_tree is None:
+            self.node_tree = NodeTree(f'{self.name} Shader Nodetree')
+            bsdf = self.node_tree.nodes.new('ShaderNodeBsdfPrincipled')
+            bsdf.name = 'Principled BSDF'
+            output = self.node_tree.nodes.new('ShaderNodeOutputMaterial')
+            output.name = 'Material Output'
+
+class Image(ID):
+    def __init__(self, name, filepath='', width=0, height=0):
+        super().__init__(name)
+        self.filepath = filepath
+        self.size = (width, height)
+        self.channels = 4
+        self.is_float = False
+        self.colorspace_settings = SimpleNamespace(name='sRGB')
+        self.pixels = ElementCollection({ 'value': ('f', 1) }, width * height * 4)
+        self.pixels.foreach_get = lambda buffer: ElementCollection.foreach_get(self.pixels, 'value', buffer)
+        self.pixels.foreach_set = lambda values: ElementCollection.foreach_set(self.pixels, 'value', values)
+
+    def reload(self):
+        self.size = png_size(self.filepath)
+
+    def save_render(self, filepath, scene=None):
+        with open(filepath, 'wb'):
+            pass
+
+def png_size(path):
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    if header[:8] != b'\x89PNG\r\n\x1a\n':
+        return (0, 0)
+    return struct.unpack('>2I', header[16:24])
+
+class Images(IDCollection):
+    def __init__(self):
+        super().__init__(Image)
+
+    def load(self, filepath, check_existing=False):
+        if check_existing:
+            existing = next((i for i in self._items if i.filepath == filepath), None)
+            if existing is not None:
+                return existing
+        if not os.path.exists(filepath):
+            raise RuntimeError(f'Error: Cannot read image "{filepath}": No such file or directory')
+        return self.new(os.path.basename(filepath), filepath, *png_size(filepath))
+
+class LinkedItems:
+    def __init__(self, owner):
+        self._owner = owner
+        self.items = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(list(self.items))
+
+    def link(self, item):
+        if item in self.items:
+            raise RuntimeError(f"'{item.name}' already in collection '{self._owner.name}'")
+        self.items.append(item)
+
+    def unlink(self, item):
+        self.items.remove(item)
+
+class Collection(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.objects = LinkedItems(self)
+        self.children = LinkedItems(self)
+
+    def all_objects(self):
+        objects = list(self.objects)
+        for child in self.children:
+            objects += [o for o in child.all_objects() if o not in objects]
+        return objects
+
+# Built from the scene's collections whenever it's looked at, so exclusion is kept on the collection itself
+class LayerCollection:
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+
+    @property
+    def children(self):
+        return { c.name: LayerCollection(c) for c in self.collection.children }
+
+    @property
+    def exclude(self):
+        return getattr(self.collection, '_excluded', False)
+
+    @exclude.setter
+    def exclude(self, value):
+        self.collection._excluded = value
+
+class Scene:
+    def __init__(self):
+        self.collection = Collection('Scene Collection')
+        self.render = SimpleNamespace(fps=24)
+
+    @property
+    def objects(self):
+        return self.collection.all_objects()
+
+class BlendData:
+    def __init__(self):
+        self.filepath = ''
+        self.meshes = IDCollection(Mesh)
+        self.objects = IDCollection(Object)
+        self.materials = IDCollection(Material)
+        self.images = Images()
+        self.collections = IDCollection(Collection)
+        self.actions = IDCollection(Action)
+        self.armatures = IDCollection(Armature)
+        self.node_groups = IDCollection(NodeTree)
+
+class LayerObjects:
+    def __init__(self, context):
+        self._context = context
+
+    @property
+    def active(self):
+        return self._context.object
+
+    @active.setter
+    def active(self, obj):
+        self._context.object = obj
+
+class Context:
+    def __init__(self):
+        self.scene = Scene()
+        self.object = None
+        self.mode = 'OBJECT'
+        self.view_layer = SimpleNamespace(objects=LayerObjects(self), layer_collection=LayerCollection(self.scene.collection))
+
+    @property
+    def selected_objects(self):
+        return [o for o in self.scene.objects if o.selected]
+
+data = BlendData()
+context = Context()
+
+# Operators not implemented below do nothing and report success
+class OperatorGroup:
+    def __init__(self, operators=None):
+        self._operators = operators or {}
+
+    def __getattr__(self, name):
+        return self._operators.get(name, lambda *args, **kwargs: {'FINISHED'})
+
+def _object_add(type='EMPTY', enter_editmode=False, location=(0, 0, 0), **kwargs):
+    obj_data = data.armatures.new('Armature') if type == 'ARMATURE' else None
+    obj = data.objects.new(type.capitalize(), obj_data)
+    obj.location = Vector(location)
+    context.scene.collection.objects.link(obj)
+    for o in context.scene.objects:
+        o.selected = False
+    obj.selected = True
+    context.object = obj
+    context.mode = 'EDIT' if enter_editmode else 'OBJECT'
+    return {'FINISHED'}
+
+def _mode_set(mode='OBJECT', **kwargs):
+    obj = context.object
+    if obj is not None and isinstance(obj.data, Armature):
+        if context.mode == 'EDIT' and mode != 'EDIT':
+            obj.data.sync_bones()
+        elif context.mode != 'EDIT' and mode == 'EDIT':
+            obj.data.sync_edit_bones()
+    context.mode = mode
+    return {'FINISHED'}
+
+def _select_all(action='TOGGLE', **kwargs):
+    for o in context.scene.objects:
+        o.selected = action == 'SELECT'
+    return {'FINISHED'}
+
+def _select_by_type(extend=False, type='MESH', **kwargs):
+    for o in context.scene.objects:
+        if o.type == type:
+            o.selected = True
+            context.object = o
+        elif not extend:
+            o.selected = False
+    return {'FINISHED'}
+
+def _delete(**kwargs):
+    for o in context.selected_objects:
+        for collection in [context.scene.collection] + list(data.collections):
+            if o in collection.objects.items:
+                collection.objects.unlink(o)
+    return {'FINISHED'}
+
+def _read_factory_settings(use_empty=False, **kwargs):
+    global data, context
+    for collection in vars(data).values():
+        if isinstance(collection, IDCollection):
+            for item in list(collection):
+                collection.remove(item)
+    data = BlendData()
+    context = Context()
+    return {'FINISHED'}
+
+# Handlers are only collected; nothing calls them
+app = SimpleNamespace(handlers=SimpleNamespace(persistent=lambda f: f, depsgraph_update_post=[], load_post=[]))
+
+ops = SimpleNamespace(
+    object=OperatorGroup({ 'add': _object_add, 'mode_set': _mode_set, 'select_all': _select_all,
+                           'select_by_type': _select_by_type, 'delete': _delete }),
+    transform=OperatorGroup(),
+    export_scene=OperatorGroup(),
+    wm=OperatorGroup({ 'read_factory_settings': _read_factory_settings }),
+)
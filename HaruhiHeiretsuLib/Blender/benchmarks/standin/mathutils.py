@@ -0,0 +1,179 @@
+# Pure-Python stand-in for the parts of mathutils the SGE scripts use
+import math
+
+class Vector:
+    def __init__(self, values=(0.0, 0.0, 0.0)):
+        self._values = [float(v) for v in values]
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __getitem__(self, i):
+        return self._values[i]
+
+    def __setitem__(self, i, value):
+        self._values[i] = float(value)
+
+    def __add__(self, other):
+        return Vector([a + b for (a, b) in zip(self, other)])
+
+    def __sub__(self, other):
+        return Vector([a - b for (a, b) in zip(self, other)])
+
+    def __mul__(self, scalar):
+        return Vector([a * scalar for a in self])
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, scalar):
+        return Vector([a / scalar for a in self])
+
+    def __neg__(self):
+        return Vector([-a for a in self])
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return f'Vector({tuple(self._values)})'
+
+    @property
+    def x(self):
+        return self._values[0]
+
+    @property
+    def y(self):
+        return self._values[1]
+
+    @property
+    def z(self):
+        return self._values[2]
+
+    @property
+    def length(self):
+        return math.sqrt(sum(a * a for a in self))
+
+    def copy(self):
+        return Vector(self._values)
+
+class Quaternion:
+    def __init__(self, values=(1.0, 0.0, 0.0, 0.0)):
+        self._values = [float(v) for v in values]
+
+    def __len__(self):
+        return 4
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __getitem__(self, i):
+        return self._values[i]
+
+    def __repr__(self):
+        return f'Quaternion({tuple(self._values)})'
+
+    @property
+    def w(self):
+        return self._values[0]
+
+    @property
+    def x(self):
+        return self._values[1]
+
+    @property
+    def y(self):
+        return self._values[2]
+
+    @property
+    def z(self):
+        return self._values[3]
+
+class Matrix:
+    def __init__(self, rows=None):
+        if rows is None:
+            rows = [[1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+        self._rows = [[float(v) for v in row] for row in rows]
+
+    def __getitem__(self, i):
+        return self._rows[i]
+
+    def __matmul__(self, other):
+        if isinstance(other, Matrix):
+            columns = list(zip(*other._rows))
+            return Matrix([[sum(a * b for (a, b) in zip(row, column)) for column in columns] for row in self._rows])
+        values = list(other) + [1.0] * (len(self._rows) - len(other))
+        return Vector([sum(a * b for (a, b) in zip(row, values)) for row in self._rows][:len(other)])
+
+    def __repr__(self):
+        return f'Matrix({self._rows})'
+
+    @staticmethod
+    def Identity(size):
+        return Matrix([[1.0 if i == j else 0.0 for j in range(size)] for i in range(size)])
+
+    @staticmethod
+    def Rotation(angle, size, axis):
+        (c, s) = (math.cos(angle), math.sin(angle))
+        rotation = { 'X': [[1, 0, 0], [0, c, -s], [0, s, c]], 'Y': [[c, 0, s], [0, 1, 0], [-s, 0, c]], 'Z': [[c, -s, 0], [s, c, 0], [0, 0, 1]] }[axis]
+        matrix = Matrix.Identity(size)
+        for i in range(3):
+            for j in range(3):
+                matrix._rows[i][j] = rotation[i][j]
+        return matrix
+
+    @staticmethod
+    def Translation(vector):
+        matrix = Matrix.Identity(4)
+        for i in range(3):
+            matrix._rows[i][3] = vector[i]
+        return matrix
+
+    # Scales along a single axis when one's given
+    @staticmethod
+    def Scale(factor, size, axis=None):
+        matrix = Matrix.Identity(size)
+        for i in range(3):
+            for j in range(3):
+                if axis is None:
+                    matrix._rows[i][j] = factor if i == j else 0.0
+                else:
+                    matrix._rows[i][j] = (factor - 1) * axis[i] * axis[j] + (1.0 if i == j else 0.0)
+        return matrix
+
+    def copy(self):
+        return Matrix(self._rows)
+
+    # Gauss-Jordan elimination with partial pivoting
+    def inverted(self):
+        size = len(self._rows)
+        rows = [list(row) + [1.0 if i == j else 0.0 for j in range(size)] for (i, row) in enumerate(self._rows)]
+        for c in range(size):
+            pivot = max(range(c, size), key=lambda r: abs(rows[r][c]))
+            if abs(rows[pivot][c]) < 1e-12:
+                raise ValueError('Matrix does not have an inverse')
+            (rows[c], rows[pivot]) = (rows[pivot], rows[c])
+            rows[c] = [v / rows[c][c] for v in rows[c]]
+            for r in range(size):
+                if r != c:
+                    rows[r] = [a - rows[r][c] * b for (a, b) in zip(rows[r], rows[c])]
+        return Matrix([row[size:] for row in rows])
+
+    @staticmethod
+    def LocRotScale(location, rotation, scale):
+        matrix = Matrix.Identity(4)
+        if rotation is not None:
+            (w, x, y, z) = rotation
+            matrix._rows[0][:3] = [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)]
+            matrix._rows[1][:3] = [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)]
+            matrix._rows[2][:3] = [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]
+        if scale is not None:
+            for i in range(3):
+                for j in range(3):
+                    matrix._rows[i][j] *= scale[j]
+        if location is not None:
+            for i in range(3):
+                matrix._rows[i][3] = location[i]
+        return matrix
@@ -0,0 +1,131 @@
+from array import array
+from collections import namedtuple
+import math
+import os
+import sys
+
+if __package__:
+    from . import sge_model
+else:
+    # Running as a standalone script, so make sibling modules importable
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import sge_model
+
+# The transform tables decoded once per SGE: scaled translations, (W, X, Y, Z) rotations and scales, all flat
+TransformTables = namedtuple('TransformTables', ['translations', 'rotations', 'scales'])
+
+# (pose bone property, components, TransformTables table) in the order of each keyframe's indices
+channel_layout = (
+    ('location', 3, 'translations'),
+    ('rotation_quaternion', 4, 'rotations'),
+    ('scale', 3, 'scales'),
+)
+
+def decode_transform_tables(model, scale=1.0):
+    translations = array('f', [c * scale for c in model.translations])
+    rotations = array('f')
+    r = model.rotations
+    for i in range(0, len(r), 4):
+        rotations.extend(canonical_quaternion(r[i], r[i + 1], r[i + 2], r[i + 3]))
+    return TransformTables(translations, rotations, array('f', model.scales))
+
+# Normalized with W non-negative, like the quaternion Blender decomposes out of a matrix
+def canonical_quaternion(w, x, y, z):
+    length = math.sqrt(w * w + x * x + y * y + z * z)
+    if length == 0:
+        return (1.0, 0.0, 0.0, 0.0)
+    if w < 0:
+        length = -length
+    return (w / length, x / length, y / length, z / length)
+
+# The sorted frames the used keyframes land on (EndFrame - NumFrames) and the keyframe used for each; the last one wins
+def animation_frames(model, anim):
+    slots = {}
+    keyframe_definitions = model.tables['KeyframeDefinitions']
+    for (i, keyframe_idx) in enumerate(anim.used_keyframes):
+        keyframe = keyframe_definitions[keyframe_idx]
+        slots[keyframe['EndFrame'] - keyframe['NumFrames']] = i
+    frames = sorted(slots)
+    return (array('f', frames), [slots[f] for f in frames])
+
+# Every F-curve of an animation as (bone index, data path, array index, values); bone 0 is the root and has no entry
+def build_animation_channels(model, anim, tables, bone_count):
+    return unpack_animation_channels(*pack_animation(model, anim, bone_count), tables, bone_count)
+
+# What a lazily imported action keeps until it's built: its frames and each bone's keyframe table indices on each frame
+def pack_animation(model, anim, bone_count):
+    (frames, slots) = animation_frames(model, anim)
+    (keyframe_indices, stride) = (anim.keyframe_indices, len(channel_layout) * len(anim.used_keyframes))
+    indices = array('i')
+    for bone_idx in range(1, bone_count):
+        start = (bone_idx - 1) * stride
+        indices.extend(keyframe_indices[start + slot * len(channel_layout) + t] for slot in slots for t in range(len(channel_layout)))
+    return (frames, indices)
+
+def unpack_animation_channels(frames, indices, tables, bone_count):
+    channels = []
+    stride = len(channel_layout) * len(frames)
+    for bone_idx in range(1, bone_count):
+        bone_indices = indices[(bone_idx - 1) * stride:bone_idx * stride]
+        for (t, (data_path, components, table_name)) in enumerate(channel_layout):
+            table = getattr(tables, table_name)
+            entries = [e * components for e in bone_indices[t::len(channel_layout)]]
+            for c in range(components):
+                channels.append((bone_idx, data_path, c, array('f', [table[e + c] for e in entries])))
+    return (frames, channels)
+
+# Interleaves frames and values into the flat [frame, value, frame, value, ...] layout of keyframe_points' co
+def keyframe_coordinates(frames, values):
+    co = array('f', bytes(8 * len(frames)))
+    co[0::2] = frames
+    co[1::2] = values
+    return co
+
+# Quantization step per transform table used to merge near-identical entries on export (translations are in SGE units)
+table_quantization = (('translations', 1e-4), ('rotations', 1e-5), ('scales', 1e-4))
+# BoneTable indices are shorts
+max_table_entries = 0x7FFF
+
+# Hands out the index of an earlier entry for values that round to the same multiple of step in every component
+class TransformTable:
+    def __init__(self, step):
+        self.step = step
+        self.entries = []
+        self.lookups = 0
+        self._index = {}
+
+    def add(self, values):
+        self.lookups += 1
+        key = tuple(round(v / self.step) for v in values)
+        index = self._index.get(key)
+        if index is None:
+            index = len(self.entries)
+            self._index[key] = index
+            self.entries.append(values)
+        return index
+
+def keyframe_definition(num_frames, end_frame):
+    return { 'Unknown00': 0.0, 'Unknown04': 0.0, 'Unknown08': 0, 'Unknown0A': 0, 'Unknown0C': 0, 'NumFrames': num_frames,
+             'EndFrame': end_frame, 'Unknown14': 0, 'Unknown18': 0, 'Unknown1C': 0, 'Unknown20': 0, 'Unknown24': 0 }
+
+# Encodes sampled (frames, bone_transforms) animations into ([SgeAnimation], KeyframeDefinitions, transform tables)
+def encode_animations(sampled):
+    tables = { name: TransformTable(step) for (name, step) in table_quantization }
+    (translations, rotations, scales) = (tables['translations'], tables['rotations'], tables['scales'])
+    animations = []
+    keyframe_definitions = []
+    for (frames, bone_transforms) in sampled:
+        used_keyframes = []
+        for (k, frame) in enumerate(frames):
+            num_frames = frames[k + 1] - frame if k + 1 < len(frames) else 1
+            used_keyframes.append(len(keyframe_definitions))
+            keyframe_definitions.append(keyframe_definition(num_frames, frame + num_frames))
+        keyframe_indices = array('i')
+        for keyframes in bone_transforms:
+            for (location, rotation, scale) in keyframes:
+                keyframe_indices.extend((translations.add(location), rotations.add(canonical_quaternion(*rotation)), scales.add(scale)))
+        animations.append(sge_model.SgeAnimation(float(frames[-1] + 1), 0, array('i', used_keyframes), len(bone_transforms), keyframe_indices))
+    for (name, table) in tables.items():
+        if len(table.entries) > max_table_entries:
+            raise ValueError(f'Too many distinct animation {name} ({len(table.entries)}) for an SGE, which can address {max_table_entries}')
+    return (animations, keyframe_definitions, tables)
@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+# Under plain Python this drives headless Blender workers; inside Blender it's a worker converting its list of models
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+def find_sge_files(input_path):
+    if os.path.isdir(input_path):
+        sge_files = []
+        for (root, _, files) in os.walk(input_path):
+            sge_files += [os.path.join(root, f) for f in files if f.endswith('.sge.json')]
+        return sorted(sge_files)
+    # Otherwise it's a manifest with one .sge.json path per line (relative paths are relative to the manifest)
+    manifest_dir = os.path.dirname(os.path.abspath(input_path))
+    with open(input_path) as f:
+        lines = [l.strip() for l in f.readlines()]
+    return [os.path.join(manifest_dir, l) for l in lines if len(l) > 0 and not l.startswith('#')]
+
+# Splits the models across workers largest-first so every worker ends up with about the same amount of data
+def partition_files(sge_files, num_workers):
+    partitions = [[] for _ in range(num_workers)]
+    sizes = [0] * num_workers
+    for sge_file in sorted(sge_files, key=lambda f: os.path.getsize(f) if os.path.exists(f) else 0, reverse=True):
+        i = sizes.index(min(sizes))
+        partitions[i].append(sge_file)
+        sizes[i] += os.path.getsize(sge_file) if os.path.exists(sge_file) else 0
+    return [p for p in partitions if len(p) > 0]
+
+def read_results(results_path):
+    results = {}
+    if os.path.exists(results_path):
+        with open(results_path) as f:
+            for line in f:
+                if len(line.strip()) > 0:
+                    result = json.loads(line)
+                    results[result['Input']] = result
+    return results
+
+# Runs one worker slot, relaunching Blender on the models left if it dies partway through
+def run_worker(blender_path, sge_files, output_format, worker_idx, results):
+    remaining = list(sge_files)
+    with tempfile.TemporaryDirectory(prefix=f'sge-batch-{worker_idx}-') as temp_dir:
+        attempt = 0
+        while len(remaining) > 0:
+            list_path = os.path.join(temp_dir, f'models{attempt}.txt')
+            results_path = os.path.join(temp_dir, f'results{attempt}.jsonl')
+            with open(list_path, 'w') as f:
+                f.write('\n'.join(remaining))
+            process = subprocess.run([blender_path, '--background', '-noaudio', '-P', os.path.abspath(__file__), '--',
+                                      '--worker', '--format', output_format, '--results', results_path, list_path],
+                                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors='replace')
+            worker_results = read_results(results_path)
+            results.update(worker_results)
+            remaining = [f for f in remaining if f not in worker_results]
+            if len(remaining) > 0:
+                crashed = remaining.pop(0)
+                results[crashed] = {
+                    'Input': crashed,
+                    'Success': False,
+                    'Seconds': None,
+                    'Error': f'Blender exited with code {process.returncode}:\n' + '\n'.join(process.stdout.splitlines()[-20:]),
+                }
+                print(f'Worker {worker_idx}: Blender exited while converting {crashed}, restarting on the remaining {len(remaining)} models')
+            attempt += 1
+
+def run_batch(blender_path, input_path, output_format, num_workers, report_path=None):
+    sge_files = find_sge_files(input_path)
+    print(f'Converting {len(sge_files)} models to {output_format} with {num_workers} Blender workers...')
+    start = time.perf_counter()
+    results = {}
+    threads = [threading.Thread(target=run_worker, args=(blender_path, partition, output_format, i, results))
+               for (i, partition) in enumerate(partition_files(sge_files, max(1, num_workers)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total_seconds = time.perf_counter() - start
+
+    ordered_results = [results[f] for f in sge_files if f in results]
+    failures = [r for r in ordered_results if not r['Success']]
+    for result in ordered_results:
+        if result['Success']:
+            print(f"{result['Seconds']:8.2f}s  {result['Input']}")
+    for result in failures:
+        print(f"FAILED  {result['Input']}\n{result['Error']}")
+    print(f'Converted {len(ordered_results) - len(failures)}/{len(sge_files)} models in {total_seconds:.2f}s ({len(failures)} failed)')
+    if report_path is not None:
+        with open(report_path, 'w') as f:
+            json.dump({ 'Format': output_format, 'Workers': num_workers, 'Seconds': total_seconds, 'Results': ordered_results }, f, indent=2)
+    return len(failures) == 0
+
+def convert_models(sge_files, output_format, results_path):
+    blender_dir = os.path.dirname(os.path.abspath(__file__))
+    if blender_dir not in sys.path:
+        sys.path.append(blender_dir)
+    import sge_import
+
+    for sge_file in sge_files:
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        result = { 'Input': sge_file }
+        start = time.perf_counter()
+        try:
+            sge_import.import_sge(sge_file, output_format)
+            result['Output'] = sge_import.export_scene(sge_file, output_format)
+            result['Success'] = True
+        except Exception:
+            result['Success'] = False
+            result['Error'] = traceback.format_exc()
+        result['Seconds'] = time.perf_counter() - start
+        print(f"{'Converted' if result['Success'] else 'Failed to convert'} {sge_file} in {result['Seconds']:.2f}s")
+        # Results are appended as we go so the driver still knows what finished if Blender goes down
+        with open(results_path, 'a') as f:
+            f.write(json.dumps(result) + '\n')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Converts many SGE JSON files using a pool of headless Blender processes')
+    parser.add_argument('input', help='A directory to search for .sge.json files or a manifest listing one .sge.json file per line')
+    parser.add_argument('--format', default='gltf', help='The output format (gltf, fbx, obj or blend)')
+    parser.add_argument('--blender', help='Path to the Blender executable')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of Blender processes to run at once')
+    parser.add_argument('--report', help='Path to write a JSON report of per-model timings and failures to')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--results', help=argparse.SUPPRESS)
+
+    if bpy is not None:
+        args = parser.parse_args(sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else [])
+        with open(args.input) as f:
+            convert_models([l.strip() for l in f.readlines() if len(l.strip()) > 0], args.format, args.results)
+    else:
+        args = parser.parse_args()
+        if args.blender is None:
+            parser.error('--blender is required')
+        sys.exit(0 if run_batch(args.blender, args.input, args.format, args.workers, args.report) else 1)
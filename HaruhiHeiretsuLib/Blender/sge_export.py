@@ -1,187 +1,468 @@
+import argparse
+from array import array
+from collections import namedtuple
 import bpy
-from mathutils import Vector, Matrix, Quaternion
+from mathutils import Vector, Matrix
 import math
-import json
 import os
+import re
 import sys
 
+if __package__:
+    from . import sge_animation, sge_export_cache, sge_fingerprint, sge_geometry, sge_import, sge_json, sge_model, sge_profile, sge_influences, sge_sidecar, sge_textures, sge_vertex_cache
+else:
+    # Running as a standalone script (e.g. blender -P sge_export.py), so make sibling modules importable
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import sge_animation, sge_export_cache, sge_fingerprint, sge_geometry, sge_import, sge_json, sge_model, sge_profile, sge_influences, sge_sidecar, sge_textures, sge_vertex_cache
+
 model_scale = 25.4
 
-def extract_submesh(obj, submesh, model, start_vertex, start_face):
-    sge_submesh = {}
-    sge_submesh["SubmeshVertices"] = []
-    sge_submesh["Material"] = None
-    bone_palette = []
+# Name lookups built once per export, plus its float precision, vertex cache and influence budget settings
+class SgeExportContext:
+    def __init__(self, model, float_precision=None, cache_optimization=None, influence_budget=None):
+        self.float_precision = float_precision
+        self.cache_optimization = cache_optimization
+        self.influence_budget = influence_budget
+        self.influence_report = sge_influences.InfluenceReport()
+        self.bones_by_name = { b.blender_name: b for b in model.bones }
+        self.materials_by_name = { m.name: m for m in model.materials }
+        self._sge_materials = {}
+
+    # The SGE bone for each of an object's vertex groups, indexed by vertex group index (None if it isn't a bone)
+    def vertex_group_bones(self, obj):
+        return [self.bones_by_name.get(vertex_group.name) for vertex_group in obj.vertex_groups]
+
+    # Resolves a Blender material to its sge_model.SgeMaterial through its image texture node(s)
+    def sge_material(self, material):
+        if material is None or not material.use_nodes:
+            return None
+        if material.name not in self._sge_materials:
+            sge_material = None
+            for n in material.node_tree.nodes:
+                if n.type == 'TEX_IMAGE' and n.image is not None and n.image.name.split(".")[0] in self.materials_by_name:
+                    sge_material = self.materials_by_name[n.image.name.split(".")[0]]
+            self._sge_materials[material.name] = sge_material
+        return self._sge_materials[material.name]
+
+# Reads a property of every element of a bpy collection into a flat typed array in one call
+def foreach_get_array(collection, attribute, typecode, components=1):
+    values = array(typecode, bytes(array(typecode).itemsize * components * len(collection)))
+    collection.foreach_get(attribute, values)
+    return values
+
+# Everything extract_submesh reads out of Blender for a submesh, which is also what the export cache fingerprints
+SubmeshData = namedtuple('SubmeshData', [
+    'positions',
+    'loop_vertices',
+    'loop_normals',
+    'loop_uvs',
+    'loop_starts',
+    'material_indices',
+    'colors',
+    'colors_per_loop',
+    'vertex_groups',
+    'group_addresses',
+    'materials',
+    'merged_submeshes',
+])
+
+def read_submesh(obj, submesh, export_context):
     submesh.calc_normals_split()
-    for vert in submesh.vertices:
-        for group in vert.groups:
-            bone = [b for b in model["SgeBones"] if b["BlenderName"] == obj.vertex_groups[group.group].name][0]
-            bone_palette.append(bone['Address'])
-        sge_submesh["SubmeshVertices"].append({
-            "Position": vector_to_json_vector(vert.co / model_scale),
-            "Unknown2": 65535
-        })
-    bone_palette = list(set(bone_palette))
-    while len(bone_palette) < 16:
-        bone_palette.append(0) # will be -1 when we subtract below
-    for vert in submesh.vertices:
-        bone_indices = []
-        weight = []
-        for group in vert.groups:
-            bone = [b for b in model["SgeBones"] if b["BlenderName"] == obj.vertex_groups[group.group].name][0]
-            bone_indices.append(bone_palette.index(bone['Address']))
-            weight.append(group.weight)
-        while len(bone_indices) < 4:
-            bone_indices.append(0)
-        while len(weight) < 4:
-            weight.append(0)
-        sge_submesh["SubmeshVertices"][vert.index]["BoneIndices"] = bone_indices
-        sge_submesh["SubmeshVertices"][vert.index]["Weight"] = weight
-    bone_palette = [b - 1 for b in bone_palette] # modify bone palette to reflect actual indices
-    sge_submesh["BonePalette"] = bone_palette
-    uv_layer = submesh.uv_layers[0]
-    color = None
+
+    # Pull every attribute out in bulk rather than going through the RNA wrappers one element at a time
+    colors = None
+    colors_per_loop = False
     if len(submesh.color_attributes) > 0:
         color = submesh.color_attributes[0]
-    sge_submesh["SubmeshFaces"] = []
-    for face in submesh.polygons:
-        for vert_idx, loop_idx in zip(face.vertices, face.loop_indices):
-            # print(f'{len(submesh.loops)}, {vert_idx}, {loop_idx}')
-            sge_submesh["SubmeshVertices"][vert_idx]["Normal"] = vector_to_json_vector(submesh.loops[loop_idx].normal)
-            sge_submesh["SubmeshVertices"][vert_idx]["UVCoords"] = vector2_to_json_vector2(uv_layer.uv[loop_idx].vector)
-            if color is not None:
-                sge_submesh["SubmeshVertices"][vert_idx]["Color"] = {
-                    "R": color.data[vert_idx].color_srgb[0],
-                    "G": color.data[vert_idx].color_srgb[1],
-                    "B": color.data[vert_idx].color_srgb[2],
-                    "A": color.data[vert_idx].color_srgb[3]
-                }
-            else:
-                sge_submesh["SubmeshVertices"][vert_idx]["Color"] = {
-                    "R": 1,
-                    "G": 1,
-                    "B": 1,
-                    "A": 1
-                }
-        sge_submesh["SubmeshFaces"].append({
-            "Polygon": [ int(face.vertices[0]), int(face.vertices[1]), int(face.vertices[2]) ],
-        })
-        if sge_submesh["Material"] == None:
-            if submesh.materials[face.material_index] and submesh.materials[face.material_index].use_nodes:
-                for n in submesh.materials[face.material_index].node_tree.nodes:
-                    if n.type == 'TEX_IMAGE':
-                        sge_submesh["Material"] = [m for m in model["SgeMaterials"] if m["Name"] == n.image.name.split(".")[0]][0]
-    
-    sge_submesh["GXLightingAddress"] = 1
-    sge_submesh["StartVertex"] = start_vertex
-    sge_submesh["EndVertex"] = start_vertex + len(sge_submesh["SubmeshVertices"]) - 1
-    sge_submesh["StartFace"] = start_face
-    sge_submesh["FaceCount"] = len(sge_submesh["SubmeshFaces"])
-    return sge_submesh
-
-def split_submeshes(obj):
-    orig_submesh = obj.data
-    submeshes = []
-
-    bone_palette = []
-    verts = []
-    verts_groups = []
-    verts_weights = []
-    faces = []
-    uvs = []
+        colors = foreach_get_array(color.data, 'color_srgb', 'f', 4)
+        colors_per_loop = color.domain == 'CORNER'
+
+    return SubmeshData(
+        positions=foreach_get_array(submesh.vertices, 'co', 'f', 3),
+        loop_vertices=foreach_get_array(submesh.loops, 'vertex_index', 'i'),
+        loop_normals=foreach_get_array(submesh.loops, 'normal', 'f', 3),
+        loop_uvs=foreach_get_array(submesh.uv_layers[0].uv, 'vector', 'f', 2),
+        loop_starts=foreach_get_array(submesh.polygons, 'loop_start', 'i'),
+        material_indices=foreach_get_array(submesh.polygons, 'material_index', 'i'),
+        colors=colors,
+        colors_per_loop=colors_per_loop,
+        # Vertex group memberships have no bulk accessor, so this is the one per-vertex pass left
+        vertex_groups=[[(g.group, g.weight) for g in vert.groups] for vert in submesh.vertices],
+        group_addresses=[bone.address if bone is not None else None for bone in export_context.vertex_group_bones(obj)],
+        materials=[export_context.sge_material(material) for material in submesh.materials],
+        merged_submeshes=merged_submesh_provenance(obj),
+    )
+
+# Everything extract_submesh reads for a submesh plus the export settings that change what gets written
+def submesh_fingerprint(data, export_context, split):
+    return sge_fingerprint.fingerprint(
+        data.positions, data.loop_vertices, data.loop_normals, data.loop_uvs, data.loop_starts, data.material_indices,
+        data.colors if data.colors is not None else array('f'),
+        data.merged_submeshes[1] if data.merged_submeshes is not None else array('i'),
+        [data.colors_per_loop, data.vertex_groups, data.group_addresses, [m.to_json() if m is not None else None for m in data.materials],
+         export_context.float_precision, export_context.cache_optimization,
+         tuple(export_context.influence_budget) if export_context.influence_budget is not None else None, split,
+         data.merged_submeshes[0] if data.merged_submeshes is not None else None])
+
+# Builds the sge_model.SgeSubmesh of a mesh, with its vertices rounded to the export's float precision
+def extract_submesh(obj, submesh, model, start_vertex, start_face, export_context=None, data=None):
+    if export_context is None:
+        export_context = SgeExportContext(model)
+    if data is None:
+        data = read_submesh(obj, submesh, export_context)
+    vertex_count = len(data.positions) // 3
+    loop_vertices = data.loop_vertices
+
+    last_loops = sge_geometry.last_loop_per_vertex(loop_vertices, vertex_count)
+    normals = sge_geometry.gather(data.loop_normals, 3, last_loops, (0, 0, 0))
+    uvs = sge_geometry.gather(data.loop_uvs, 2, last_loops, (0, 0))
+    if data.colors is None:
+        colors = array('f', [1, 1, 1, 1]) * vertex_count
+    elif data.colors_per_loop:
+        colors = sge_geometry.gather(data.colors, 4, last_loops, (1, 1, 1, 1))
+    else:
+        colors = data.colors
+
+    influences = sge_geometry.bone_influences(data.vertex_groups, data.group_addresses)
+    if export_context.influence_budget is not None and not obj.get('SgeInfluencesBudgeted', False):
+        palette_bones = len(set(a for bones in influences for (a, _) in sge_geometry.strongest_influences(bones)))
+        influences = sge_influences.apply_budget(influences, export_context.influence_budget, export_context.influence_report)
+        export_context.influence_report.bones_saved += palette_bones - len(set(a for bones in influences for (a, _) in bones))
+    (bone_palette, bone_indices, weights) = sge_geometry.resolve_influences(influences)
+
+    material = None
+    for material_index in dict.fromkeys(data.material_indices): # distinct indices in the order faces use them
+        if material_index < len(data.materials):
+            material = data.materials[material_index]
+            if material is not None:
+                break
+
+    precision = export_context.float_precision or {}
+    return sge_model.SgeSubmesh(
+        material=material,
+        bone_palette=array('i', [b - 1 for b in bone_palette]), # the padding zeros become -1
+        positions=sge_geometry.rounded_array(data.positions, precision.get('Position'), model_scale),
+        normals=sge_geometry.rounded_array(normals, precision.get('Normal')),
+        uvs=sge_geometry.rounded_array(uvs, precision.get('UVCoords')),
+        colors=sge_geometry.rounded_array(colors, precision.get('Color')),
+        bone_indices=bone_indices,
+        weights=weights,
+        unknown2=array('i', [65535]) * vertex_count,
+        faces=array('i', [loop_vertices[s + c] for s in data.loop_starts for c in range(3)]),
+        gx_lighting_address=1,
+        start_vertex=start_vertex,
+        start_face=start_face,
+    )
+
+# Everything split_submeshes/unmerge_submeshes read out of a mesh to rebuild subsets of its faces as new meshes
+FaceSource = namedtuple('FaceSource', [
+    'positions',
+    'loop_vertices',
+    'loop_normals',
+    'loop_uvs',
+    'loop_starts',
+    'material_indices',
+    'smooth',
+    'colors',
+    'colors_per_loop',
+    'vertex_groups',
+])
+
+def read_face_source(obj):
+    mesh = obj.data
+    mesh.calc_normals_split()
+    smooth = [False] * len(mesh.polygons)
+    mesh.polygons.foreach_get('use_smooth', smooth)
     colors = None
-    prev_verts_len = 0
-    if len(orig_submesh.color_attributes) > 0:
-        colors = []
-    i = 0
-    for face in orig_submesh.polygons:
-        new_bone_palette = list(bone_palette)
-        next_bone_palette = []
-        for vert_idx in face.vertices:
-            verts_groups.append([])
-            verts_weights.append({})
-            for group in orig_submesh.vertices[vert_idx].groups:
-                new_bone_palette.append(obj.vertex_groups[group.group].name)
-                next_bone_palette.append(obj.vertex_groups[group.group].name)
-                verts_groups[len(verts_groups) - 1].append(obj.vertex_groups[group.group].name)
-                verts_weights[len(verts_weights) - 1][obj.vertex_groups[group.group].name] = group.weight
-        new_bone_palette = list(set(new_bone_palette))
-        if len(new_bone_palette) > 16:
-            submesh = bpy.data.meshes.new(f'submesh{i}')
-            subobj = bpy.data.objects.new(f'submesh{i}', submesh)
-            min_face = min(min([[a, b, c] for a, b, c in faces]))
-            faces = [(a - min_face, b - min_face, c - min_face) for a, b, c in faces]
-            submesh.from_pydata(verts, [], faces)
-            uvlayer = submesh.uv_layers.new()
-            uvlayer_name = uvlayer.name
-            if colors is not None:
-                color_layer = submesh.color_attributes.new('vertex_colors', 'FLOAT_COLOR', 'POINT')
-            # Creating the color layer has invalidated the reference to the uv layer, so get it again.
-            uvlayer = submesh.uv_layers[uvlayer_name]
-            for loop_idx in range(len(uvs)):
-                uvlayer.uv[loop_idx].vector = uvs[loop_idx]
-            if colors is not None:
-                for vert_idx in range(len(colors)):
-                    color_layer.data[vert_idx].color_srgb = colors[vert_idx]
-            for material in orig_submesh.materials:
-                submesh.materials.append(material)
-            if len(submesh.materials) > 0:
-                for face in submesh.polygons:
-                    face.material_index = 0
-            for vertex_group in obj.vertex_groups:
-                new_group = subobj.vertex_groups.new(name=vertex_group.name)
-                for v_idx in range(len(verts_groups)):
-                    if new_group.name in verts_groups[v_idx]:
-                        new_group.add([v_idx], verts_weights[v_idx][new_group.name], 'ADD')
-            submeshes.append((submesh, subobj))
-            verts = []
-            faces = []
-            uvs = []
-            if colors is not None:
-                colors = []
-            new_bone_palette = list(set(next_bone_palette))
-            i += 1
-        bone_palette = new_bone_palette
-        faces.append(face.vertices)
-        for vert_idx, loop_idx in zip(face.vertices, face.loop_indices):
-            verts.append(orig_submesh.vertices[vert_idx].co)
-            uvs.append(orig_submesh.uv_layers[0].uv[loop_idx].vector)
-            if colors is not None:
-                colors.append(orig_submesh.color_attributes[0].data[vert_idx].color_srgb)
-    
-    if len(submeshes) == 0:
-        submeshes.append((orig_submesh, obj))
-    elif len(verts) > 0 and len(faces) > 0:
-        submesh = bpy.data.meshes.new(f'submesh{i}')
-        subobj = bpy.data.objects.new(f'submesh{i}', submesh)
-        min_face = min(min([[a, b, c] for a, b, c in faces]))
-        faces = [(a - min_face, b - min_face, c - min_face) for a, b, c in faces]
-        submesh.from_pydata(verts, [], faces)
-        uvlayer = submesh.uv_layers.new()
-        uvlayer_name = uvlayer.name
-        if colors is not None:
-            color_layer = submesh.color_attributes.new('vertex_colors', 'FLOAT_COLOR', 'POINT')
-        # Creating the color layer has invalidated the reference to the uv layer, so get it again.
-        uvlayer = submesh.uv_layers[uvlayer_name]
-        for loop_idx in range(len(uvs)):
-            uvlayer.uv[loop_idx].vector = uvs[loop_idx]
-        if colors is not None:
-            for vert_idx in range(len(colors)):
-                color_layer.data[vert_idx].color_srgb = colors[vert_idx]
-        for material in orig_submesh.materials:
-            submesh.materials.append(material)
-        if len(submesh.materials) > 0:
-            for face in submesh.polygons:
-                face.material_index = 0
-        for vertex_group in obj.vertex_groups:
-            new_group = subobj.vertex_groups.new(name=vertex_group.name)
-            for v_idx in range(len(verts_groups)):
-                if new_group.name in verts_groups[v_idx]:
-                    new_group.add([v_idx], verts_weights[v_idx][new_group.name], 'ADD')
-        submeshes.append((submesh, subobj))
+    colors_per_loop = False
+    if len(mesh.color_attributes) > 0:
+        color = mesh.color_attributes[0]
+        colors = foreach_get_array(color.data, 'color_srgb', 'f', 4)
+        colors_per_loop = color.domain == 'CORNER'
+    return FaceSource(
+        positions=foreach_get_array(mesh.vertices, 'co', 'f', 3),
+        loop_vertices=foreach_get_array(mesh.loops, 'vertex_index', 'i'),
+        loop_normals=foreach_get_array(mesh.loops, 'normal', 'f', 3),
+        loop_uvs=foreach_get_array(mesh.uv_layers[0].uv, 'vector', 'f', 2),
+        loop_starts=foreach_get_array(mesh.polygons, 'loop_start', 'i'),
+        material_indices=foreach_get_array(mesh.polygons, 'material_index', 'i'),
+        smooth=smooth,
+        colors=colors,
+        colors_per_loop=colors_per_loop,
+        vertex_groups=[[(g.group, g.weight) for g in vert.groups] for vert in mesh.vertices],
+    )
+
+# A new mesh object from some of obj's faces, with corners that agree welded back into shared vertices
+def mesh_from_faces(obj, source, faces, name):
+    (positions, loop_vertices, loop_normals, loop_uvs, loop_starts) = source[:5]
+    (colors, colors_per_loop, vertex_groups) = (source.colors, source.colors_per_loop, source.vertex_groups)
+    corners = [loop_starts[f] + k for f in faces for k in range(3)]
+    (corner_vertices, first_corners) = sge_geometry.weld_corners([(
+        loop_vertices[l],
+        loop_uvs[l * 2], loop_uvs[l * 2 + 1],
+        loop_normals[l * 3], loop_normals[l * 3 + 1], loop_normals[l * 3 + 2],
+        tuple(colors[l * 4:l * 4 + 4]) if colors is not None and colors_per_loop else None,
+    ) for l in corners])
+    source_loops = [corners[c] for c in first_corners]
+    source_vertices = [loop_vertices[l] for l in source_loops]
+
+    submesh = bpy.data.meshes.new(name)
+    subobj = bpy.data.objects.new(name, submesh)
+    submesh.vertices.add(len(source_vertices))
+    submesh.vertices.foreach_set('co', sge_geometry.gather(positions, 3, source_vertices, ()))
+    submesh.loops.add(len(corners))
+    submesh.loops.foreach_set('vertex_index', corner_vertices)
+    submesh.polygons.add(len(faces))
+    submesh.polygons.foreach_set('loop_start', array('i', range(0, len(corners), 3)))
+    submesh.polygons.foreach_set('material_index', array('i', [source.material_indices[f] for f in faces]))
+    submesh.polygons.foreach_set('use_smooth', [source.smooth[f] for f in faces])
+    submesh.update(calc_edges=True)
+
+    uvlayer = submesh.uv_layers.new()
+    uvlayer_name = uvlayer.name
+    if colors is not None:
+        color_layer = submesh.color_attributes.new('vertex_colors', 'FLOAT_COLOR', 'POINT')
+        color_layer.data.foreach_set('color_srgb', sge_geometry.gather(colors, 4, source_loops if colors_per_loop else source_vertices, ()))
+    # Creating the color layer has invalidated the reference to the uv layer, so get it again.
+    uvlayer = submesh.uv_layers[uvlayer_name]
+    uvlayer.uv.foreach_set('vector', sge_geometry.gather(loop_uvs, 2, corners, ()))
+    # Keep the original split normals, which extract_submesh will read back
+    vertex_normals = sge_geometry.gather(loop_normals, 3, source_loops, ())
+    submesh.use_auto_smooth = True
+    submesh.normals_split_custom_set_from_vertices([vertex_normals[v * 3:v * 3 + 3] for v in range(len(source_loops))])
+    for material in obj.data.materials:
+        submesh.materials.append(material)
+
+    new_groups = [subobj.vertex_groups.new(name=vertex_group.name) for vertex_group in obj.vertex_groups]
+    memberships = {}
+    for (new_vertex, source_vertex) in enumerate(source_vertices):
+        for (g, w) in vertex_groups[source_vertex]:
+            memberships.setdefault(g, ([], []))
+            memberships[g][0].append(new_vertex)
+            memberships[g][1].append(w)
+    for (g, (vertex_indices, weights)) in memberships.items():
+        for (weight, weighted_vertices) in sge_geometry.group_vertices_by_weight(vertex_indices, weights).items():
+            new_groups[g].add(weighted_vertices, weight, 'ADD')
+    return (submesh, subobj)
+
+# Splits a mesh into submeshes with 16-bone palettes; with a budget the pieces are budgeted here, not in extract_submesh
+def split_submeshes(obj, export_context=None, max_bones=16):
+    orig_submesh = obj.data
+    source = read_face_source(obj)
+    (loop_vertices, loop_starts) = (source.loop_vertices, source.loop_starts)
+
+    if export_context is not None:
+        is_bone = [bone is not None for bone in export_context.vertex_group_bones(obj)]
+    else:
+        is_bone = [True] * len(obj.vertex_groups)
+    vertex_influences = [[(g, w) for (g, w) in groups if is_bone[g]] for groups in source.vertex_groups]
+    def face_bones(vertex_bones):
+        return [vertex_bones[loop_vertices[s]] | vertex_bones[loop_vertices[s + 1]] | vertex_bones[loop_vertices[s + 2]] for s in loop_starts]
+    partitions = sge_geometry.partition_faces(
+        face_bones([frozenset(g for (g, _) in sge_geometry.strongest_influences(influences)) for influences in vertex_influences]), max_bones)
+    if export_context is not None and export_context.influence_budget is not None:
+        (report, split_report) = (export_context.influence_report, sge_influences.InfluenceReport())
+        budgeted = sge_influences.apply_budget(vertex_influences, export_context.influence_budget, split_report)
+        unbudgeted_partitions = partitions
+        partitions = sge_geometry.partition_faces(face_bones([frozenset(g for (g, _) in influences) for influences in budgeted]), max_bones)
+        report.submeshes_saved += len(unbudgeted_partitions) - len(partitions)
+        if len(partitions) > 1:
+            # Pieces are counted here; an unsplit object is counted when it's extracted
+            report.bones_saved += sum(len(palette) for (palette, _) in unbudgeted_partitions) - sum(len(palette) for (palette, _) in partitions)
+            report.pruned += split_report.pruned
+            report.smoothed += split_report.smoothed
+            source = source._replace(vertex_groups=[bones + [(g, w) for (g, w) in groups if not is_bone[g]]
+                                                    for (bones, groups) in zip(budgeted, source.vertex_groups)])
+    if len(partitions) <= 1:
+        return [(orig_submesh, obj)]
+
+    submeshes = [mesh_from_faces(obj, source, faces, f'submesh{i}') for (i, (_, faces)) in enumerate(partitions)]
+    if export_context is not None and export_context.influence_budget is not None:
+        for (_, subobj) in submeshes:
+            subobj['SgeInfluencesBudgeted'] = True
+
+    vertex_count = sum(len(submesh.vertices) for (submesh, _) in submeshes)
+    palette_fill = sum(len(palette) for (palette, _) in partitions) / (max_bones * len(partitions))
+    print(f'Split {obj.name} into {len(submeshes)} submeshes with {vertex_count} vertices ({len(orig_submesh.loops)} face corners); '
+          f'palette fill {palette_fill:.0%} ({", ".join(f"{len(palette)}/{max_bones}" for (palette, _) in partitions)})')
+    return submeshes
+
+# The submesh numbers a merged object was built from (see sge_import.construct_merged_mesh), or None
+def merged_submesh_numbers(obj):
+    numbers = obj.get('SgeMergedSubmeshes')
+    face_submeshes = obj.data.attributes.get('sge_submesh')
+    if numbers is None or face_submeshes is None or face_submeshes.domain != 'FACE':
+        return None
+    return list(numbers)
+
+# (submesh numbers, each face's submesh number) of an object imported with merged submeshes, or None
+def merged_submesh_provenance(obj):
+    numbers = merged_submesh_numbers(obj)
+    if numbers is None:
+        return None
+    return (numbers, foreach_get_array(obj.data.attributes['sge_submesh'].data, 'value', 'i'))
+
+# Splits a merged object back into its submeshes by face; faces added since go with the first one
+def unmerge_submeshes(obj, export_context=None):
+    (numbers, face_submeshes) = merged_submesh_provenance(obj)
+    source = read_face_source(obj)
+    faces_by_number = { n: [] for n in numbers }
+    for (face_idx, n) in enumerate(face_submeshes):
+        faces_by_number.get(n, faces_by_number[numbers[0]]).append(face_idx)
+    submeshes = [mesh_from_faces(obj, source, faces, f'{obj.name}_Submesh{n}') for (n, faces) in faces_by_number.items() if len(faces) > 0]
+    print(f'Split {obj.name} back into {len(submeshes)} submeshes with {sum(len(submesh.vertices) for (submesh, _) in submeshes)} vertices')
     return submeshes
 
-def export_sge(filename, model_type):
+# Reorders faces (and with 'vertices', renumbers vertices) for the vertex cache; returns the ACMR before and after
+def optimize_submesh_cache(sge_submesh, cache_optimization):
+    before = sge_vertex_cache.average_cache_miss_ratio(sge_submesh.faces)
+    faces = sge_vertex_cache.optimize_face_order(sge_submesh.faces, sge_submesh.vertex_count)
+    if cache_optimization == 'vertices':
+        order = sge_vertex_cache.vertex_fetch_order(faces, sge_submesh.vertex_count)
+        faces = sge_vertex_cache.remap_faces(faces, order)
+        for (attribute, components) in (('positions', 3), ('normals', 3), ('uvs', 2), ('colors', 4), ('bone_indices', 4), ('weights', 4),
+                                        ('unknown2', 1)):
+            setattr(sge_submesh, attribute, sge_geometry.gather(getattr(sge_submesh, attribute), components, order, None))
+    sge_submesh.faces = faces
+    return (before, sge_vertex_cache.average_cache_miss_ratio(faces))
+
+# The StartVertex and StartFace of the submesh that follows one ending on end_vertex in its group
+def next_submesh_offsets(end_vertex, start_face, face_count, model_type):
+    if model_type == 4:
+        return (end_vertex + 1, start_face + face_count)
+    return (end_vertex + 1, start_face + face_count * 3)
+
+def write_submesh(json_writer, sidecar_writer, sge_submesh):
+    sidecar_arrays = sidecar_writer.write_submesh_arrays(sge_submesh) if sidecar_writer is not None else None
+    json_writer.write_submesh(sge_submesh.to_json(sidecar_arrays))
+
+# Writes each mesh object's submeshes, tracking StartVertex/StartFace and reusing the export cache for unchanged objects
+class SubmeshExporter:
+    def __init__(self, model, model_type, export_context, json_writer, sidecar_writer=None, export_cache=None, profiler=None):
+        self.model = model
+        self.model_type = model_type
+        self.export_context = export_context
+        self.json_writer = json_writer
+        self.sidecar_writer = sidecar_writer
+        self.export_cache = export_cache
+        self.profiler = profiler if profiler is not None else sge_profile.SgeProfiler(False)
+        self.cache_misses = [0.0, 0.0, 0] # vertex cache misses before and after optimize_submesh_cache, and the faces they're over
+        self.begin_group()
+
+    def begin_group(self):
+        self.start_vertex = 0
+        self.start_face = 0
+
+    # Merged objects are always split back into their submeshes; split breaks others up into 16-bone palettes
+    def export_object(self, obj, split=False):
+        data = None
+        fingerprint = None
+        if self.export_cache is not None:
+            with self.profiler.stage('fingerprint', submesh=obj.name):
+                data = read_submesh(obj, obj.data, self.export_context)
+                fingerprint = submesh_fingerprint(data, self.export_context, split)
+            entries = self.export_cache.lookup(obj.name, fingerprint)
+            if entries is not None:
+                for entry in entries:
+                    self._write_entry(entry)
+                return
+
+        pieces = [(obj.data, obj)]
+        if merged_submesh_numbers(obj) is not None:
+            with self.profiler.stage('split_submeshes', submesh=obj.name) as record:
+                pieces = unmerge_submeshes(obj, self.export_context)
+                record.count(submeshes=len(pieces))
+        elif split:
+            with self.profiler.stage('split_submeshes', submesh=obj.name) as record:
+                pieces = split_submeshes(obj, self.export_context)
+                record.count(submeshes=len(pieces))
+        entries = []
+        for (submesh, subobj) in pieces:
+            with self.profiler.stage('extract_submesh', submesh=subobj.name) as record:
+                sge_submesh = extract_submesh(subobj, submesh, self.model, self.start_vertex, self.start_face, self.export_context,
+                                              data if subobj == obj else None)
+                record.count(vertices=sge_submesh.vertex_count, faces=sge_submesh.face_count)
+            if self.export_context.cache_optimization is not None:
+                with self.profiler.stage('optimize_vertex_cache', submesh=subobj.name) as record:
+                    (before, after) = optimize_submesh_cache(sge_submesh, self.export_context.cache_optimization)
+                    record.count(faces=sge_submesh.face_count)
+                print(f'{subobj.name}: ACMR {before:.3f} -> {after:.3f}')
+                self.cache_misses[0] += before * sge_submesh.face_count
+                self.cache_misses[1] += after * sge_submesh.face_count
+                self.cache_misses[2] += sge_submesh.face_count
+            if self.export_cache is None:
+                with self.profiler.stage('write_submesh'):
+                    write_submesh(self.json_writer, self.sidecar_writer, sge_submesh)
+                (self.start_vertex, self.start_face) = next_submesh_offsets(sge_submesh.end_vertex, sge_submesh.start_face,
+                                                                            sge_submesh.face_count, self.model_type)
+            else:
+                entries.append(sge_export_cache.cache_entry(sge_submesh.to_json(), self.json_writer.encode))
+                self._write_entry(entries[-1], sge_submesh)
+        if self.export_cache is not None:
+            self.export_cache.store(obj.name, fingerprint, entries)
+
+    def print_cache_stats(self):
+        (before, after, faces) = self.cache_misses
+        if faces > 0:
+            print(f'Vertex cache: ACMR {before / faces:.3f} -> {after / faces:.3f} over {faces} re-extracted faces')
+
+    def _write_entry(self, entry, sge_submesh=None):
+        with self.profiler.stage('write_submesh'):
+            if self.sidecar_writer is None:
+                self.json_writer.write_submesh_json(sge_export_cache.submesh_json(entry, self.start_vertex, self.start_face))
+            else:
+                if sge_submesh is None:
+                    sge_submesh = sge_model.SgeSubmesh.from_json(sge_export_cache.submesh_dict(entry, self.start_vertex, self.start_face))
+                write_submesh(self.json_writer, self.sidecar_writer, sge_submesh)
+        offsets = sge_export_cache.submesh_offsets(entry, self.start_vertex, self.start_face)
+        (self.start_vertex, self.start_face) = next_submesh_offsets(offsets['EndVertex'], offsets['StartFace'], offsets['FaceCount'], self.model_type)
+
+# F-curve data paths of the pose bone channels an SGE animation holds
+pose_bone_path = re.compile(r'pose\.bones\["(.+)"\]\.(location|rotation_quaternion|scale)$')
+# Value of each channel's components when the action doesn't animate them
+channel_defaults = { 'location': (0.0, 0.0, 0.0), 'rotation_quaternion': (1.0, 0.0, 0.0, 0.0), 'scale': (1.0, 1.0, 1.0) }
+
+# One action per NLA strip in track order (the way import_sge lays them out), or just the active action
+def armature_actions(obj):
+    if obj.animation_data is None:
+        return []
+    actions = []
+    for track in obj.animation_data.nla_tracks:
+        for strip in track.strips:
+            if strip.action is not None and strip.action not in actions:
+                actions.append(strip.action)
+    if len(actions) == 0 and obj.animation_data.action is not None:
+        actions.append(obj.animation_data.action)
+    return actions
+
+# Samples an action on every keyframed frame into the (frames, bone_transforms) sge_animation.encode_animations takes
+def sample_action(action, bone_names):
+    fcurves = {}
+    for fcurve in action.fcurves:
+        match = pose_bone_path.match(fcurve.data_path)
+        if match is not None:
+            fcurves[(match.group(1), match.group(2), fcurve.array_index)] = fcurve
+    frames = sorted({ max(0, round(x)) for fcurve in fcurves.values() for x in foreach_get_array(fcurve.keyframe_points, 'co', 'f', 2)[0::2] })
+    if len(frames) == 0:
+        return None
+    bone_transforms = []
+    for bone_name in bone_names[1:]:
+        channels = []
+        for (data_path, defaults) in channel_defaults.items():
+            components = []
+            for (c, default) in enumerate(defaults):
+                fcurve = fcurves.get((bone_name, data_path, c))
+                components.append([fcurve.evaluate(frame) for frame in frames] if fcurve is not None else [default] * len(frames))
+            channels.append(list(zip(*components)))
+        (locations, rotations, scales) = channels
+        bone_transforms.append([(tuple(c / model_scale for c in location), rotation, scale)
+                                for (location, rotation, scale) in zip(locations, rotations, scales)])
+    return (frames, bone_transforms)
+
+def export_sge(filename, model_type, use_sidecar=False, float_precision=None, profile=None, use_cache=False, cache_optimization=None,
+               influence_budget=None):
+    profiler = sge_profile.SgeProfiler(profile)
+    profiler.start()
     if os.path.exists(filename):
         os.remove(filename)
     f = open(filename, 'x')
@@ -192,19 +473,14 @@ def export_sge(filename, model_type):
     bpy.ops.object.select_all(action='DESELECT')
     bpy.context.object.matrix_world = bpy.context.object.matrix_world @ Matrix.Rotation(math.radians(-90), 4, 'X')
 
-    model = {"Name": os.path.basename(bpy.data.filepath).split('.')[0]}
-    # Header
-    model["SgeHeader"] = {}
-    model["SgeHeader"]["Version"] = 8
-    model["SgeHeader"]["ModelType"] = model_type
-
-    model["SgeAnimations"] = []
-    model["TranslateDataEntries"] = [vector_to_json_vector(Vector((0, 0, 0)) / model_scale)]
-    model["RotationDataEntries"] = [quaternion_to_json_quaternion(Quaternion((1, 0, 0, 0)))]
-    model["ScaleDataEntries"] = [vector_to_json_vector(Vector((1, 1, 1)))]
-    model["KeyframeDefinitions"] = [{}]
+    model = sge_model.SgeModel(os.path.basename(bpy.data.filepath).split('.')[0], sge_model.SgeHeader(8, model_type),
+                               os.path.basename(sge_sidecar.sidecar_path(filename)) if use_sidecar else None)
+    model.translations = array('d', [0, 0, 0])
+    model.rotations = array('d', [1, 0, 0, 0])
+    model.scales = array('d', [1, 1, 1])
+    model.tables["KeyframeDefinitions"] = [{}]
 
-    model["SgeGXLightingDataTable"] = [{
+    model.tables["SgeGXLightingDataTable"] = [{
         "Offset": 1,
         "AmbientR": 1,
         "AmbientG": 1,
@@ -225,183 +501,219 @@ def export_sge(filename, model_type):
         "Unknown40": 0.1,
         "DefaultLightingEnabled": True
     }]
-    model["SubmeshBlendDataTable"] = []
-    model["Unknown40Table"] = []
-    model["Unknown4CTable"] = []
-    model["BoneAnimationGroups"] = []
-    model["Unknown58Table"] = []
-    model["SgeMeshes"] = []
+    model.tables["SubmeshBlendDataTable"] = []
+    model.tables["Unknown40Table"] = []
+    model.tables["Unknown4CTable"] = []
+    model.tables["BoneAnimationGroups"] = []
+    model.tables["Unknown58Table"] = []
+    model.tables["SgeMeshes"] = []
     for i in range(10):
-        model["SgeMeshes"].append({})
+        model.tables["SgeMeshes"].append({})
 
     # Materials/Textures
     tex_folder = os.path.join(os.path.dirname(filename), os.path.splitext(os.path.basename(filename))[0])
     if not os.path.exists(tex_folder):
         os.makedirs(tex_folder)
-    model["SgeMaterials"] = []
-    tex_idx = 0
-    for image in bpy.data.images:
-        if image.name == 'Render Result':
-            continue
-        new_filepath = os.path.join(tex_folder, f'{image.name.split(".")[0]}.png')
-        image.save_render(filepath=new_filepath)
-        model["SgeMaterials"].append({
-            "Index": tex_idx,
-            "Name": image.name.split('.')[0],
-            "TexturePath": new_filepath
-        })
-        tex_idx += 1
+    with profiler.stage('textures') as record:
+        tex_idx = 0
+        texture_manifest = sge_textures.read_texture_manifest(tex_folder)
+        texture_paths = {} # pixel fingerprint -> PNG already holding those pixels
+        (pending_textures, copied_textures) = ([], [])
+        skipped_textures = 0
+        images_by_path = {} # "tex" and "tex.001" share a PNG, which ends up holding the last of them
+        for image in bpy.data.images:
+            if image.name == 'Render Result':
+                continue
+            new_filepath = os.path.join(tex_folder, f'{image.name.split(".")[0]}.png')
+            images_by_path[new_filepath] = image
+            model.materials.append(sge_model.SgeMaterial(tex_idx, image.name.split('.')[0], new_filepath))
+            tex_idx += 1
+        for (new_filepath, image) in images_by_path.items():
+            (width, height) = image.size
+            # Raw pixels skip color management, so only 8-bit sRGB images are encoded from them
+            if width * height == 0 or image.is_float or image.colorspace_settings.name != 'sRGB':
+                image.save_render(filepath=new_filepath)
+            else:
+                pixels = array('f', bytes(4 * len(image.pixels)))
+                image.pixels.foreach_get(pixels)
+                fingerprint = sge_textures.pixel_fingerprint(pixels, width, height, image.channels)
+                if sge_textures.texture_is_current(texture_manifest, new_filepath, fingerprint):
+                    skipped_textures += 1
+                elif fingerprint in texture_paths:
+                    copied_textures.append((texture_paths[fingerprint], new_filepath, fingerprint))
+                else:
+                    pending_textures.append((new_filepath, pixels, width, height, image.channels, fingerprint))
+                texture_paths.setdefault(fingerprint, new_filepath)
+        sge_textures.write_textures(pending_textures, texture_manifest)
+        sge_textures.copy_textures(copied_textures, texture_manifest)
+        sge_textures.write_texture_manifest(tex_folder, texture_manifest)
+        record.count(textures=tex_idx, written=len(pending_textures), unchanged=skipped_textures, copied=len(copied_textures))
+    print(f'Textures: {len(pending_textures)} written, {skipped_textures} unchanged, {len(copied_textures)} copied from an identical texture')
 
     # Armature
-    model["SgeBones"] = []
     armature_map = {}
     bpy.ops.object.select_by_type(type='ARMATURE')
     bpy.ops.object.mode_set(mode='EDIT')
     obj = bpy.context.object
     armature = obj.data
     for collection in [c for c in list(armature.collections.keys()) if 'AnimationGroup' in c]:
-        model["BoneAnimationGroups"].append({ "BoneIndices": [] }) # just prepopulate the list for ease of use
-    i = 1
-    # Do initial bone map
-    for (bone, edit_bone) in zip(armature.bones, armature.edit_bones):
-        sge_bone = {}
-        sge_bone['BlenderName'] = bone.name
-        sge_bone['Address'] = i
-        tail = Vector((0, 1, 0))
-        if edit_bone.parent:
-            tail = edit_bone.head - edit_bone.parent.head
-        sge_bone['TailOffset'] = vector_to_json_vector(tail / model_scale)
-        sge_bone['HeadPosition'] = vector_to_json_vector(edit_bone.head / model_scale)
-        sge_bone['ParentAddress'] = 0
-        sge_bone['ChildAddress'] = 0
-        sge_bone['NextSiblingAddress'] = 0
-        
-        if 'NeckBone' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = 0x0002
-        if 'FaceBone' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = 0x0004
-        if 'ChestBones' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = 0x0008
-        if 'StomachBone' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = 0x0010
-        if 'RightHandBone' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = 0x0020
-        if 'LeftHandBone' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = 0x0040
-        if 'Unknown0080Group' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = 0x0080
-        if 'Unknown0100Group' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = 0x0100
-        if 'RightFootBone' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = 0x0200
-        if 'LeftFootBone' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = 0x0400
-        if 'EyebrowBones' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = 0x0800
-        if 'RightLegBone' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = 0x1000
-        if 'LeftLegBone' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = 0x2000
-        if 'RightCheekBone' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = 0x4000
-        if 'LeftCheekBone' in list(bone.collections.keys()):
-            sge_bone['BodyPart'] = -32768 # 0x8000 but since it's a short it has to be negative
-        
-        if 'EyesAnimationGroup' in list(bone.collections.keys()):
-            model["BoneAnimationGroups"][0]["BoneIndices"].append(i - 1)
-        if 'MouthAnimationGroup' in list(bone.collections.keys()):
-            model["BoneAnimationGroups"][1]["BoneIndices"].append(i - 1)
-        for u in range(50): # just an arbitrarily large number; there will never be this many groups
-            if f'{u}AnimationGroup' in list(bone.collections.keys()):
-                model["BoneAnimationGroups"][u]["BoneIndices"].append(i - 1)
-
-        model["SgeBones"].append(sge_bone)
-        armature_map[bone.name] = bone
-        i += 1
-    # Resolve bone links
-    for sge_bone in model["SgeBones"]:
-        bone = armature_map[sge_bone['BlenderName']]
-        for potential_parent in model["SgeBones"]:
+        model.tables["BoneAnimationGroups"].append({ "BoneIndices": [] }) # just prepopulate the list for ease of use
+    with profiler.stage('bones') as record:
+        i = 1
+        # Do initial bone map
+        for (bone, edit_bone) in zip(armature.bones, armature.edit_bones):
+            tail = Vector((0, 1, 0))
+            if edit_bone.parent:
+                tail = edit_bone.head - edit_bone.parent.head
+            body_part = None
+
+            if 'NeckBone' in list(bone.collections.keys()):
+                body_part = 0x0002
+            if 'FaceBone' in list(bone.collections.keys()):
+                body_part = 0x0004
+            if 'ChestBones' in list(bone.collections.keys()):
+                body_part = 0x0008
+            if 'StomachBone' in list(bone.collections.keys()):
+                body_part = 0x0010
+            if 'RightHandBone' in list(bone.collections.keys()):
+                body_part = 0x0020
+            if 'LeftHandBone' in list(bone.collections.keys()):
+                body_part = 0x0040
+            if 'Unknown0080Group' in list(bone.collections.keys()):
+                body_part = 0x0080
+            if 'Unknown0100Group' in list(bone.collections.keys()):
+                body_part = 0x0100
+            if 'RightFootBone' in list(bone.collections.keys()):
+                body_part = 0x0200
+            if 'LeftFootBone' in list(bone.collections.keys()):
+                body_part = 0x0400
+            if 'EyebrowBones' in list(bone.collections.keys()):
+                body_part = 0x0800
+            if 'RightLegBone' in list(bone.collections.keys()):
+                body_part = 0x1000
+            if 'LeftLegBone' in list(bone.collections.keys()):
+                body_part = 0x2000
+            if 'RightCheekBone' in list(bone.collections.keys()):
+                body_part = 0x4000
+            if 'LeftCheekBone' in list(bone.collections.keys()):
+                body_part = -32768 # 0x8000 but since it's a short it has to be negative
+
+            sge_bone = sge_model.SgeBone(i, tuple(edit_bone.head / model_scale), tuple(tail / model_scale), body_part=body_part,
+                                         blender_name=bone.name)
+
+            if 'EyesAnimationGroup' in list(bone.collections.keys()):
+                model.tables["BoneAnimationGroups"][0]["BoneIndices"].append(i - 1)
+            if 'MouthAnimationGroup' in list(bone.collections.keys()):
+                model.tables["BoneAnimationGroups"][1]["BoneIndices"].append(i - 1)
+            for u in range(50): # just an arbitrarily large number; there will never be this many groups
+                if f'{u}AnimationGroup' in list(bone.collections.keys()):
+                    model.tables["BoneAnimationGroups"][u]["BoneIndices"].append(i - 1)
+
+            model.bones.append(sge_bone)
+            armature_map[bone.name] = bone
+            i += 1
+        # Resolve bone links
+        export_context = SgeExportContext(model, float_precision, cache_optimization, influence_budget)
+        sibling_cursors = {} # parent name -> index of the first of its children that might not have a next sibling yet
+        for sge_bone in model.bones:
+            bone = armature_map[sge_bone.blender_name]
             if bone.parent is not None:
-                if potential_parent["BlenderName"] == bone.parent.name:
-                    sge_bone["ParentAddress"] = potential_parent["Address"]
-                    if potential_parent["ChildAddress"] == 0:
-                        potential_parent["ChildAddress"] = sge_bone["Address"]
-                    else:
-                        for potential_sibling in bone.parent.children:
-                            sge_sibling = [s for s in model["SgeBones"] if s["BlenderName"] == potential_sibling.name][0]
-                            if sge_sibling["NextSiblingAddress"] == 0:
-                                sge_sibling["NextSiblingAddress"] = sge_bone["Address"]
-                                break
+                sge_parent = export_context.bones_by_name[bone.parent.name]
+                sge_bone.parent_address = sge_parent.address
+                if sge_parent.child_address == 0:
+                    sge_parent.child_address = sge_bone.address
+                else:
+                    siblings = bone.parent.children
+                    cursor = sibling_cursors.get(bone.parent.name, 0)
+                    while cursor < len(siblings) and export_context.bones_by_name[siblings[cursor].name].next_sibling_address != 0:
+                        cursor += 1
+                    sibling_cursors[bone.parent.name] = cursor
+                    if cursor < len(siblings):
+                        export_context.bones_by_name[siblings[cursor].name].next_sibling_address = sge_bone.address
+        record.count(bones=len(model.bones))
+
+    # Animations
+    with profiler.stage('animations') as record:
+        sge_import.build_lazy_animations() # actions imported lazily have no keyframes to sample until they're built
+        bone_names = [sge_bone.blender_name for sge_bone in model.bones]
+        sampled = [s for s in (sample_action(action, bone_names) for action in armature_actions(obj)) if s is not None]
+        if len(sampled) > 0:
+            (animations, keyframe_definitions, tables) = sge_animation.encode_animations(sampled)
+            model.animations = animations
+            model.tables["KeyframeDefinitions"] = keyframe_definitions
+            model.translations = array('d', [c for t in tables['translations'].entries for c in t])
+            model.rotations = array('d', [c for r in tables['rotations'].entries for c in r])
+            model.scales = array('d', [c for s in tables['scales'].entries for c in s])
+            record.count(animations=len(animations), keyframes=len(keyframe_definitions))
+            print('Animation tables: ' + ', '.join(f'{name} {table.lookups} -> {len(table.entries)}' for (name, table) in tables.items()))
+
+    # Everything but the submeshes is known now, so write it out and stream the submeshes after it
+    json_writer = sge_json.SgeJsonWriter(f)
+    with profiler.stage('write_sections'):
+        for (section, value) in model.sections():
+            json_writer.write_section(section, value)
+    sidecar_writer = sge_sidecar.SgeSidecarWriter(sge_sidecar.sidecar_path(filename)) if use_sidecar else None
+    export_cache = sge_export_cache.SgeExportCache(sge_export_cache.export_cache_path(filename)) if use_cache else None
+    submesh_exporter = SubmeshExporter(model, model_type, export_context, json_writer, sidecar_writer, export_cache, profiler)
 
     # Submeshes
     bpy.ops.object.mode_set(mode='OBJECT')
-    model["SgeSubmeshes"] = []
+    json_writer.begin_submeshes()
     for collection in bpy.data.collections:
-        submesh_group = []
-        vtx = 0
-        face = 0
+        submesh_exporter.begin_group()
         for obj in collection.objects:
             if obj.type == 'MESH':
-                submesh_group.append(extract_submesh(obj, obj.data, model, vtx, face))
-                vtx = submesh_group[-1]["EndVertex"] + 1
-                if model_type == 4:
-                    face += submesh_group[-1]["FaceCount"]
-                else:
-                    face += submesh_group[-1]["FaceCount"] * 3
-        if len(submesh_group) > 0:
-            model["SgeSubmeshes"].append(submesh_group)
-    if len(model["SgeSubmeshes"]) == 0:
-        submesh_group = []
+                submesh_exporter.export_object(obj)
+        json_writer.end_submesh_group()
+    if json_writer.submesh_groups == 0:
         bpy.ops.object.select_by_type(type='MESH')
-        vtx = 0
-        face = 0
+        submesh_exporter.begin_group()
         for obj in bpy.context.selected_objects:
-            for submesh, subobj in split_submeshes(obj):
-                submesh_group.append(extract_submesh(subobj, submesh, model, vtx, face))
-                vtx = submesh_group[-1]["EndVertex"] + 1
-                if model_type == 4:
-                    face += submesh_group[-1]["FaceCount"]
-                else:
-                    face += submesh_group[-1]["FaceCount"] * 3
-        model["SgeSubmeshes"].append(submesh_group)
-
-    json.dump(model, f)
+            submesh_exporter.export_object(obj, split=True)
+        json_writer.end_submesh_group(keep_empty=True)
+    json_writer.end_submeshes()
+    json_writer.close()
+    if sidecar_writer is not None:
+        sidecar_writer.close()
     f.close()
+    if export_cache is not None:
+        export_cache.save()
+        export_cache.print_stats()
+    submesh_exporter.print_cache_stats()
+    if influence_budget is not None:
+        export_context.influence_report.print_stats(model.name)
     
     bpy.context.object.matrix_world = bpy.context.object.matrix_world @ Matrix.Rotation(math.radians(90), 4, 'X')
     bpy.ops.object.select_by_type(type='ARMATURE')
     bpy.ops.transform.mirror(constraint_axis=(False, True, False), orient_type='GLOBAL')
     bpy.ops.object.select_all(action='DESELECT')
+    profiler.finish('export', filename)
     
     return {'FINISHED'}
 
-def vector_to_json_vector(vector):
-    return {
-        'X': vector[0],
-        'Y': vector[1],
-        'Z': vector[2]
-    }
-
-def vector2_to_json_vector2(vector):
-    return {
-        'X': vector[0],
-        'Y': vector[1]
-    }
-
-def quaternion_to_json_quaternion(quaternion):
-    return {
-        'X': quaternion[1],
-        'Y': quaternion[2],
-        'Z': quaternion[3],
-        'W': quaternion[0]
-    }
-
 if __name__ == '__main__':
-    input_file = sys.argv[-2]
-    model_type = int(sys.argv[-1])
+    parser = argparse.ArgumentParser(description='Exports a .blend to an .sge.json next to it')
+    parser.add_argument('input', help='The .blend to export')
+    parser.add_argument('model_type', type=int, help='The model type of the SGE (0: object, 3: character, 4: map, 5: unknown)')
+    parser.add_argument('--sidecar', action='store_true', help='Write a geometry sidecar')
+    parser.add_argument('--cache', action='store_true', help='Reuse the submeshes of objects that have not changed since the last export')
+    parser.add_argument('--precision', type=int, help='Decimal places to keep for vertex positions, normals, UVs and colors')
+    parser.add_argument('--optimize-cache', nargs='?', const='vertices', choices=('faces', 'vertices'),
+                        help='Reorder faces and vertices for the vertex cache (=faces leaves the vertices be)')
+    parser.add_argument('--max-influences', type=int, help='Influence budget: bones each vertex keeps')
+    parser.add_argument('--min-weight', type=float, help='Influence budget: weights below this are dropped')
+    parser.add_argument('--smooth-weight', type=float, help='Influence budget: bone set smoothing weight')
+    # Blender's own arguments come before --; without one, the .blend and model type are the last two arguments
+    args = parser.parse_args(sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[-2:])
+    (input_file, model_type) = (args.input, args.model_type)
+    float_precision = { attribute: args.precision for attribute in ('Position', 'Normal', 'UVCoords', 'Color') } if args.precision is not None else None
+    budget_options = { 'max_influences': args.max_influences, 'min_weight': args.min_weight, 'smooth_weight': args.smooth_weight }
+    influence_budget = None
+    if any(v is not None for v in budget_options.values()):
+        influence_budget = sge_influences.default_budget._replace(**{ k: v for (k, v) in budget_options.items() if v is not None })
 
     bpy.ops.wm.open_mainfile(filepath=input_file)
 
     output_file = os.path.join(os.path.dirname(input_file), f'{os.path.splitext(os.path.basename(input_file))[0]}.sge.json')
-    export_sge(output_file, model_type)
\ No newline at end of file
+    export_sge(output_file, model_type, args.sidecar, float_precision, use_cache=args.cache, cache_optimization=args.optimize_cache,
+               influence_budget=influence_budget)
\ No newline at end of file
@@ -0,0 +1,68 @@
+import json
+import os
+
+# Each mesh object's exported submeshes by fingerprint, as compact JSON without the offsets that are spliced back in on write
+export_cache_version = 1
+submesh_offset_keys = ('StartVertex', 'EndVertex', 'StartFace')
+
+def export_cache_path(json_path):
+    if json_path.endswith('.sge.json'):
+        return json_path[:-len('.sge.json')] + '.sge_export_cache.json'
+    return os.path.splitext(json_path)[0] + '.sge_export_cache.json'
+
+# { "VertexCount", "FaceCount", "Json" } for an extracted submesh; encode is the JSON writer's encoder
+def cache_entry(sge_submesh, encode):
+    return {
+        'VertexCount': sge_submesh['EndVertex'] - sge_submesh['StartVertex'] + 1,
+        'FaceCount': sge_submesh['FaceCount'],
+        'Json': encode({ k: v for (k, v) in sge_submesh.items() if k not in submesh_offset_keys }),
+    }
+
+def submesh_offsets(entry, start_vertex, start_face):
+    return { 'StartVertex': start_vertex, 'EndVertex': start_vertex + entry['VertexCount'] - 1, 'StartFace': start_face, 'FaceCount': entry['FaceCount'] }
+
+def submesh_json(entry, start_vertex, start_face):
+    offsets = submesh_offsets(entry, start_vertex, start_face)
+    return f"{entry['Json'][:-1]},\"StartVertex\":{offsets['StartVertex']},\"EndVertex\":{offsets['EndVertex']},\"StartFace\":{start_face}}}"
+
+def submesh_dict(entry, start_vertex, start_face):
+    sge_submesh = json.loads(entry['Json'])
+    sge_submesh.update(submesh_offsets(entry, start_vertex, start_face))
+    return sge_submesh
+
+class SgeExportCache:
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._used = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    cache = json.load(f)
+                if cache.get('Version') == export_cache_version:
+                    self._entries = cache['Objects']
+            except ValueError:
+                pass # a corrupt cache just means everything gets extracted again
+
+    # The cached submesh entries of an object, or None if there are none for this fingerprint
+    def lookup(self, name, fingerprint):
+        cached = self._entries.get(name)
+        if cached is None or cached['Fingerprint'] != fingerprint:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used[name] = cached
+        return cached['Submeshes']
+
+    def store(self, name, fingerprint, entries):
+        self._used[name] = { 'Fingerprint': fingerprint, 'Submeshes': entries }
+
+    # Only keeps the objects this export looked up or stored, so deleted or renamed objects don't pile up
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump({ 'Version': export_cache_version, 'Objects': self._used }, f, separators=(',', ':'))
+
+    def print_stats(self):
+        print(f'Export cache: {self.hits} objects reused, {self.misses} extracted')
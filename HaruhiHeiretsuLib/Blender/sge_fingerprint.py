@@ -0,0 +1,39 @@
+from array import array
+import hashlib
+import marshal
+
+# Per-section fingerprints (materials, submeshes, bone table, animations) that let a re-import skip unchanged sections
+
+# marshal version 2 is much faster than JSON and gives the same bytes for the same data within a Python version
+def fingerprint(*values):
+    digest = hashlib.sha1()
+    for value in values:
+        if isinstance(value, (array, memoryview)):
+            digest.update(memoryview(value).cast('B'))
+        else:
+            digest.update(marshal.dumps(value, 2))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+# texture_digest is the hash of the texture file's contents so a texture re-exported to the same path still counts as a change
+def material_fingerprint(sge_material, texture_digest):
+    return fingerprint(sge_material.to_json(), texture_digest)
+
+# Leaves out the bones' vertex groups, which belong to the submeshes they weight rather than to the armature
+def bone_table_fingerprint(model):
+    bones = [(b.address, b.head_position, b.tail_offset, b.parent_address, b.child_address, b.next_sibling_address, b.body_part, b.extra)
+             for b in model.bones]
+    return fingerprint(bones, model.tables.get('BoneAnimationGroups'))
+
+# Leaves out the offsets that shift whenever an earlier submesh changes size
+def submesh_fingerprint(submesh, submesh_bones, outline):
+    values = [submesh.positions, submesh.normals, submesh.uvs, submesh.colors, submesh.bone_indices, submesh.weights, submesh.unknown2,
+              submesh.faces, [submesh.material.to_json() if submesh.material is not None else None, list(submesh.bone_palette),
+                              submesh.gx_lighting_address, submesh.outline_address, submesh.extra], outline]
+    for (bone_idx, (vertex_indices, weights)) in sorted(submesh_bones.items()):
+        values += [bone_idx, vertex_indices, weights]
+    return fingerprint(*values)
+
+# Fingerprints the built keyframes, since the JSON's table indices change when other animations change
+def animation_fingerprint(frames, channels):
+    return fingerprint(frames, *[values for (_, _, _, values) in channels])
@@ -0,0 +1,185 @@
+from array import array
+from collections import namedtuple
+
+# Flat geometry buffers of a submesh, laid out the way foreach_set expects them
+SubmeshBuffers = namedtuple('SubmeshBuffers', [
+    'vertex_count',
+    'face_count',
+    'positions',
+    'colors',
+    'loop_vertices',
+    'loop_starts',
+    'loop_uvs',
+    'material_indices',
+])
+
+# Faces are inverted, so the loops are written already flipped instead of calling flip_normals() afterwards
+def build_submesh_buffers(submesh, scale=1.0):
+    faces = submesh.faces
+    vertex_uvs = submesh.uvs
+    loop_vertices = array('i', faces)
+    loop_vertices[1::3] = array('i', faces[2::3])
+    loop_vertices[2::3] = array('i', faces[1::3])
+    loop_uvs = array('f', [c for i in loop_vertices for c in (vertex_uvs[i * 2], vertex_uvs[i * 2 + 1])])
+    loop_starts = array('i', range(0, len(loop_vertices), 3))
+    face_count = len(faces) // 3
+
+    material_index = 0
+    if submesh.material is not None:
+        material_index = submesh.material.index
+    material_indices = array('i', [material_index]) * face_count
+
+    return SubmeshBuffers(
+        vertex_count=submesh.vertex_count,
+        face_count=face_count,
+        positions=array('f', [c * scale for c in submesh.positions]),
+        colors=array('f', submesh.colors),
+        loop_vertices=loop_vertices,
+        loop_starts=loop_starts,
+        loop_uvs=loop_uvs,
+        material_indices=material_indices,
+    )
+
+# Each vertex's sorted (bone index, weight) tuple from a submesh's build_vertex_group_index entry
+def vertex_weight_keys(vertex_count, submesh_bones):
+    influences = [[] for _ in range(vertex_count)]
+    for (bone_idx, (vertex_indices, weights)) in sorted(submesh_bones.items()):
+        for (vertex_idx, weight) in zip(vertex_indices, weights):
+            influences[vertex_idx].append((bone_idx, weight))
+    return [tuple(bones) for bones in influences]
+
+# Merges several submeshes' (buffers, normals, uvs, weight keys), welding the vertices they share
+def merge_submesh_buffers(parts):
+    keys = []
+    for (buffers, normals, uvs, weight_keys) in parts:
+        (positions, colors) = (buffers.positions, buffers.colors)
+        keys += [(tuple(positions[v * 3:v * 3 + 3]), tuple(normals[v * 3:v * 3 + 3]), tuple(uvs[v * 2:v * 2 + 2]),
+                  tuple(colors[v * 4:v * 4 + 4]), weight_keys[v]) for v in range(buffers.vertex_count)]
+    (merged_vertices, first_vertices) = weld_corners(keys)
+
+    loop_vertices = array('i')
+    (loop_uvs, material_indices, face_parts) = (array('f'), array('i'), array('i'))
+    vertex_offset = 0
+    for (part_idx, (buffers, _, _, _)) in enumerate(parts):
+        loop_vertices.extend(merged_vertices[vertex_offset + v] for v in buffers.loop_vertices)
+        loop_uvs.extend(buffers.loop_uvs)
+        material_indices.extend(buffers.material_indices)
+        face_parts.extend(array('i', [part_idx]) * buffers.face_count)
+        vertex_offset += buffers.vertex_count
+
+    vertex_groups = {}
+    for (merged_vertex, key_idx) in enumerate(first_vertices):
+        for (bone_idx, weight) in keys[key_idx][4]:
+            if bone_idx not in vertex_groups:
+                vertex_groups[bone_idx] = (array('i'), array('f'))
+            vertex_groups[bone_idx][0].append(merged_vertex)
+            vertex_groups[bone_idx][1].append(weight)
+
+    merged = SubmeshBuffers(
+        vertex_count=len(first_vertices),
+        face_count=len(face_parts),
+        positions=array('f', [c for k in first_vertices for c in keys[k][0]]),
+        colors=array('f', [c for k in first_vertices for c in keys[k][3]]),
+        loop_vertices=loop_vertices,
+        loop_starts=array('i', range(0, len(loop_vertices), 3)),
+        loop_uvs=loop_uvs,
+        material_indices=material_indices,
+    )
+    return (merged, face_parts, vertex_groups)
+
+# {(group, submesh): {bone_idx: (vertex indices, weights)}} from every bone's vertex group
+def build_vertex_group_index(sge_bones):
+    index = {}
+    for (bone_idx, bone) in enumerate(sge_bones):
+        if bone.vertex_group is None:
+            continue
+        (vertices, weights) = bone.vertex_group
+        for i in range(len(weights)):
+            submesh_bones = index.setdefault((vertices[i * 3], vertices[i * 3 + 1]), {})
+            if bone_idx not in submesh_bones:
+                submesh_bones[bone_idx] = (array('i'), array('f'))
+            submesh_bones[bone_idx][0].append(vertices[i * 3 + 2])
+            submesh_bones[bone_idx][1].append(weights[i])
+    return index
+
+# VertexGroup.add() takes a single weight, so bucket the vertices by weight
+def group_vertices_by_weight(vertex_indices, weights):
+    buckets = {}
+    for vertex_idx, weight in zip(vertex_indices, weights):
+        buckets.setdefault(weight, []).append(vertex_idx)
+    return buckets
+
+# Maps each bone address in a palette to its slot (the first one for the padding zeros, like list.index())
+def palette_slots(bone_palette):
+    return { address: slot for (slot, address) in reversed(list(enumerate(bone_palette))) }
+
+# The last loop that uses each vertex (-1 for loose vertices), which is the one whose per-loop attributes used to win
+def last_loop_per_vertex(loop_vertices, vertex_count):
+    last_loops = array('i', [-1]) * vertex_count
+    for (vertex_idx, loop_idx) in dict(zip(loop_vertices, range(len(loop_vertices)))).items():
+        last_loops[vertex_idx] = loop_idx
+    return last_loops
+
+# Picks `components` values out of a flat array for each index, substituting `default` for negative indices
+def gather(values, components, indices, default):
+    return array(values.typecode, [c for i in indices for c in (values[i * components:(i + 1) * components] if i >= 0 else default)])
+
+# Keeps (in their original order) the `max_influences` strongest of a vertex's [(vertex group, weight)] memberships
+def strongest_influences(influences, max_influences=4):
+    if len(influences) <= max_influences:
+        return influences
+    strongest = sorted(range(len(influences)), key=lambda i: influences[i][1], reverse=True)[:max_influences]
+    return [influences[i] for i in sorted(strongest)]
+
+# Each vertex's [(bone address, weight)]; group_addresses maps a vertex group index to its bone address or None
+def bone_influences(vertex_groups, group_addresses):
+    return [[(group_addresses[g], w) for (g, w) in groups if group_addresses[g] is not None] for groups in vertex_groups]
+
+# (palette padded to 16 slots, bone indices, weights) with each vertex's `max_influences` strongest bones
+def resolve_influences(vertex_influences, max_influences=4):
+    influences = [strongest_influences(bones, max_influences) for bones in vertex_influences]
+    bone_palette = list(set(address for bones in influences for (address, _) in bones))
+    while len(bone_palette) < 16:
+        bone_palette.append(0)
+    slots = palette_slots(bone_palette)
+    padding = [(None, 0)] * max_influences
+    bone_indices = array('i', [slots.get(a, 0) for bones in influences for (a, _) in (bones + padding)[:max_influences]])
+    weights = array('f', [w for bones in influences for (_, w) in (bones + padding)[:max_influences]])
+    return (bone_palette, bone_indices, weights)
+
+# Packs faces into [(palette, faces)] of at most `max_bones` bones, keeping faces with the same bone set together
+def partition_faces(face_bones, max_bones=16):
+    bone_sets = {}
+    for (face_idx, bones) in enumerate(face_bones):
+        bone_sets.setdefault(bones, []).append(face_idx)
+    partitions = [] # [bones, [face index lists]]
+    for bones in sorted(bone_sets, key=lambda b: (len(b), len(bone_sets[b])), reverse=True):
+        best = None
+        for partition in partitions:
+            added = len(bones - partition[0])
+            if len(partition[0]) + added <= max_bones and (best is None or (added, -len(partition[0])) < best[0]):
+                best = ((added, -len(partition[0])), partition)
+        if best is None:
+            partitions.append([set(bones), [bone_sets[bones]]])
+        else:
+            best[1][0] |= bones
+            best[1][1].append(bone_sets[bones])
+    partitions = [(sorted(bones), sorted(f for faces in face_lists for f in faces)) for (bones, face_lists) in partitions]
+    return sorted(partitions, key=lambda p: p[1][0] if len(p[1]) > 0 else 0)
+
+# Welds corners with identical keys into vertices; returns (the vertex of each corner, the first corner of each vertex)
+def weld_corners(corner_keys):
+    vertex_of_key = {}
+    corner_vertices = array('i', [vertex_of_key.setdefault(key, len(vertex_of_key)) for key in corner_keys])
+    first_corners = dict(zip(reversed(corner_vertices), range(len(corner_vertices) - 1, -1, -1)))
+    return (corner_vertices, array('i', [first_corners[v] for v in range(len(vertex_of_key))]))
+
+def float_rounder(digits):
+    if digits is None:
+        return float
+    return lambda x: round(x, digits)
+
+# The values divided by `divisor` and rounded to `digits` decimal places as doubles
+def rounded_array(values, digits=None, divisor=1.0):
+    r = float_rounder(digits)
+    return array('d', [r(v / divisor) for v in values])
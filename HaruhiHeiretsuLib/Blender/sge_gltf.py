@@ -0,0 +1,348 @@
+from array import array
+import argparse
+import concurrent.futures
+import json
+import math
+import os
+import struct
+import sys
+import time
+import traceback
+
+if __package__:
+    from . import sge_animation, sge_batch, sge_geometry, sge_json, sge_model, sge_sidecar
+else:
+    # Running as a standalone script, so make sibling modules importable
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import sge_animation, sge_batch, sge_geometry, sge_json, sge_model, sge_sidecar
+
+# Converts .sge.json files straight to .glb without Blender, laid out the way sge_import builds the model
+model_scale = 25.4
+fps = 60
+
+# glTF component types and buffer view targets
+FLOAT = 5126
+UNSIGNED_SHORT = 5123
+UNSIGNED_INT = 5125
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+component_types = { 'f': FLOAT, 'H': UNSIGNED_SHORT, 'I': UNSIGNED_INT }
+accessor_components = { 'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT4': 16 }
+
+def matrix_multiply(a, b):
+    return [[sum(a[r][k] * b[k][c] for k in range(4)) for c in range(4)] for r in range(4)]
+
+def translation_matrix(x, y, z):
+    return [[1, 0, 0, x], [0, 1, 0, y], [0, 0, 1, z], [0, 0, 0, 1]]
+
+# The armature object's transform after sge_import, taken from Blender's Z-up to glTF's Y-up
+def armature_matrix(model):
+    (x, y, z) = model.bones[0].head_position if len(model.bones) > 0 else (0, 0, 0)
+    rotation = [[1, 0, 0, 0], [0, 0, -1, 0], [0, 1, 0, 0], [0, 0, 0, 1]]
+    mirror = [[1, 0, 0, 0], [0, -1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]
+    blender_to_gltf = [[1, 0, 0, 0], [0, 0, 1, 0], [0, -1, 0, 0], [0, 0, 0, 1]]
+    armature = matrix_multiply(translation_matrix(x, y, z), matrix_multiply(mirror, rotation))
+    return matrix_multiply(blender_to_gltf, armature)
+
+def column_major(matrix):
+    return [float(matrix[r][c]) for c in range(4) for r in range(4)]
+
+# glTF vertex colors are linear, while the SGE's are loaded as sRGB (like sge_import's color_srgb)
+def srgb_to_linear(c):
+    return c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+
+# Spreads per-component arrays into one interleaved array ([x0, y0, z0, x1, ...])
+def interleave(components, typecode='f'):
+    values = array(typecode, bytes(array(typecode).itemsize * len(components) * len(components[0])))
+    for (c, component) in enumerate(components):
+        values[c::len(components)] = array(typecode, component)
+    return values
+
+# glTF needs unit-length normals; degenerate ones take their faces' normals, or +Z
+def unit_normals(normals, positions, loop_vertices):
+    normals = array('f', normals)
+    lengths = [math.sqrt(normals[v * 3] ** 2 + normals[v * 3 + 1] ** 2 + normals[v * 3 + 2] ** 2) for v in range(len(normals) // 3)]
+    zero = [v for (v, length) in enumerate(lengths) if not (0 < length < math.inf)]
+    if len(zero) > 0:
+        face_normals = { v: [0.0, 0.0, 0.0] for v in zero }
+        for l in range(0, len(loop_vertices), 3):
+            corners = loop_vertices[l:l + 3]
+            if not any(v in face_normals for v in corners):
+                continue
+            (a, b, c) = (positions[v * 3:v * 3 + 3] for v in corners)
+            (u, w) = ([b[i] - a[i] for i in range(3)], [c[i] - a[i] for i in range(3)])
+            cross = (u[1] * w[2] - u[2] * w[1], u[2] * w[0] - u[0] * w[2], u[0] * w[1] - u[1] * w[0])
+            for v in corners:
+                if v in face_normals:
+                    face_normals[v] = [face_normals[v][i] + cross[i] for i in range(3)]
+        for (v, normal) in face_normals.items():
+            lengths[v] = math.sqrt(sum(c * c for c in normal))
+            if not (0 < lengths[v] < math.inf):
+                (normal, lengths[v]) = ((0.0, 0.0, 1.0), 1.0)
+            normals[v * 3:v * 3 + 3] = array('f', normal)
+    for (v, length) in enumerate(lengths):
+        if length != 1.0:
+            for i in range(v * 3, v * 3 + 3):
+                normals[i] /= length
+    return normals
+
+# Each vertex's 4 strongest influences, normalized; unweighted vertices are bound to the unanimated root bone
+def vertex_joints(vertex_count, submesh_bones):
+    joints = array('H')
+    weights = array('f')
+    for influences in sge_geometry.vertex_weight_keys(vertex_count, submesh_bones):
+        influences = sge_geometry.strongest_influences(list(influences))
+        total = sum(w for (_, w) in influences)
+        if total <= 0:
+            influences = [(0, 1.0)]
+            total = 1.0
+        influences = (influences + [(0, 0.0)] * 4)[:4]
+        joints.extend(b for (b, _) in influences)
+        weights.extend(w / total for (_, w) in influences)
+    return (joints, weights)
+
+# Collects the JSON document and binary chunk of a .glb
+class GlbBuilder:
+    def __init__(self):
+        self.gltf = {
+            'asset': { 'version': '2.0', 'generator': 'HeiretsuTranslationUtility sge_gltf.py' },
+            'scene': 0,
+            'scenes': [{ 'nodes': [] }],
+            'nodes': [],
+            'meshes': [],
+            'skins': [],
+            'animations': [],
+            'materials': [],
+            'textures': [],
+            'images': [],
+            'samplers': [],
+            'accessors': [],
+            'bufferViews': [],
+            'buffers': [],
+        }
+        self._chunks = []
+        self._length = 0
+
+    def add(self, kind, item):
+        self.gltf[kind].append(item)
+        return len(self.gltf[kind]) - 1
+
+    def add_buffer_view(self, data, target=None):
+        data = bytes(data)
+        buffer_view = { 'buffer': 0, 'byteOffset': self._length, 'byteLength': len(data) }
+        if target is not None:
+            buffer_view['target'] = target
+        padding = (4 - len(data) % 4) % 4
+        self._chunks += [data, b'\0' * padding]
+        self._length += len(data) + padding
+        return self.add('bufferViews', buffer_view)
+
+    # values is a flat typed array holding `count` elements of accessor_type
+    def add_accessor(self, values, accessor_type, target=None, min_max=False):
+        if sys.byteorder != 'little':
+            values = array(values.typecode, values)
+            values.byteswap()
+        components = accessor_components[accessor_type]
+        accessor = {
+            'bufferView': self.add_buffer_view(memoryview(values).cast('B'), target),
+            'componentType': component_types[values.typecode],
+            'count': len(values) // components,
+            'type': accessor_type,
+        }
+        if min_max and len(values) > 0:
+            accessor['min'] = [min(values[c::components]) for c in range(components)]
+            accessor['max'] = [max(values[c::components]) for c in range(components)]
+        return self.add('accessors', accessor)
+
+    def write(self, path):
+        self.gltf['buffers'] = [{ 'byteLength': self._length }] if self._length > 0 else []
+        document = { k: v for (k, v) in self.gltf.items() if not isinstance(v, list) or len(v) > 0 }
+        json_chunk = json.dumps(document, separators=(',', ':')).encode('utf-8')
+        json_chunk += b' ' * ((4 - len(json_chunk) % 4) % 4)
+        length = 12 + 8 + len(json_chunk) + (8 + self._length if self._length > 0 else 0)
+        with open(path, 'wb') as f:
+            f.write(struct.pack('<4sII', b'glTF', 2, length))
+            f.write(struct.pack('<I4s', len(json_chunk), b'JSON'))
+            f.write(json_chunk)
+            if self._length > 0:
+                f.write(struct.pack('<I4s', self._length, b'BIN\0'))
+                for chunk in self._chunks:
+                    f.write(chunk)
+
+image_mime_types = { '.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg' }
+
+# One material per SgeMaterials entry; vertex colors multiply the texture since glTF has no soft light
+def add_materials(glb, model):
+    images = {} # real path -> glTF texture index
+    for sge_material in model.materials:
+        material = { 'name': sge_material.name, 'pbrMetallicRoughness': { 'metallicFactor': 0.0, 'roughnessFactor': 0.5 } }
+        texture_path = sge_material.texture_path
+        mime_type = image_mime_types.get(os.path.splitext(texture_path or '')[1].lower())
+        if texture_path is not None and mime_type is not None and os.path.exists(texture_path):
+            path = os.path.realpath(texture_path)
+            if path not in images:
+                with open(path, 'rb') as f:
+                    image = glb.add('images', { 'name': os.path.splitext(os.path.basename(path))[0], 'mimeType': mime_type,
+                                                'bufferView': glb.add_buffer_view(f.read()) })
+                if len(glb.gltf['samplers']) == 0:
+                    glb.add('samplers', {})
+                images[path] = glb.add('textures', { 'source': image, 'sampler': 0 })
+            material['pbrMetallicRoughness']['baseColorTexture'] = { 'index': images[path] }
+            material['alphaMode'] = 'MASK'
+            material['alphaCutoff'] = 0.5
+        glb.add('materials', material)
+
+# A node per bone at its rest translation relative to its parent, plus the skin; returns (bone nodes, rest translations)
+def add_skeleton(glb, model, root):
+    bones = model.bones
+    heads = [[c * model_scale for c in b.head_position] for b in bones]
+    bone_indices = { bone.address: i for (i, bone) in enumerate(bones) }
+    bone_nodes = [glb.add('nodes', { 'name': f'Bone{bone.address}' }) for bone in bones]
+    rest_translations = []
+    for (i, bone) in enumerate(bones):
+        parent = bone_indices.get(bone.parent_address)
+        if parent is None or parent == i:
+            parent_head = [0.0, 0.0, 0.0]
+            root.setdefault('children', []).append(bone_nodes[i])
+        else:
+            parent_head = heads[parent]
+            glb.gltf['nodes'][bone_nodes[parent]].setdefault('children', []).append(bone_nodes[i])
+        rest_translations.append([h - p for (h, p) in zip(heads[i], parent_head)])
+        glb.gltf['nodes'][bone_nodes[i]]['translation'] = rest_translations[i]
+    inverse_bind_matrices = array('f', [c for (x, y, z) in heads for c in column_major(translation_matrix(-x, -y, -z))])
+    glb.add('skins', { 'name': model.name + '_Armature', 'joints': bone_nodes, 'skeleton': glb.gltf['scenes'][0]['nodes'][0],
+                       'inverseBindMatrices': glb.add_accessor(inverse_bind_matrices, 'MAT4') })
+    return (bone_nodes, rest_translations)
+
+def add_submesh(glb, model, submesh, name, submesh_bones):
+    buffers = sge_geometry.build_submesh_buffers(submesh, model_scale)
+    # Blender's glTF exporter flips V, and the colors are taken from sRGB to linear
+    uvs = array('f', submesh.uvs)
+    uvs[1::2] = array('f', [1.0 - v for v in uvs[1::2]])
+    colors = array('f', buffers.colors)
+    for c in range(3):
+        colors[c::4] = array('f', [srgb_to_linear(v) for v in colors[c::4]])
+    attributes = {
+        'POSITION': glb.add_accessor(buffers.positions, 'VEC3', ARRAY_BUFFER, min_max=True),
+        'NORMAL': glb.add_accessor(unit_normals(submesh.normals, buffers.positions, buffers.loop_vertices), 'VEC3', ARRAY_BUFFER),
+        'TEXCOORD_0': glb.add_accessor(uvs, 'VEC2', ARRAY_BUFFER),
+        'COLOR_0': glb.add_accessor(colors, 'VEC4', ARRAY_BUFFER),
+    }
+    if len(model.bones) > 0:
+        (joints, weights) = vertex_joints(buffers.vertex_count, submesh_bones)
+        attributes['JOINTS_0'] = glb.add_accessor(joints, 'VEC4', ARRAY_BUFFER)
+        attributes['WEIGHTS_0'] = glb.add_accessor(weights, 'VEC4', ARRAY_BUFFER)
+    # The loops are already in the order sge_import writes them (faces inverted)
+    indices = array('H' if buffers.vertex_count <= 0xFFFF else 'I', buffers.loop_vertices)
+    primitive = { 'attributes': attributes, 'indices': glb.add_accessor(indices, 'SCALAR', ELEMENT_ARRAY_BUFFER) }
+    if len(model.materials) > 0:
+        primitive['material'] = buffers.material_indices[0] if buffers.face_count > 0 else 0
+    node = { 'name': name, 'mesh': glb.add('meshes', { 'name': name, 'primitives': [primitive] }) }
+    if len(model.bones) > 0:
+        node['skin'] = 0
+    return glb.add('nodes', node)
+
+# Bone node keyframes like sge_import's pose bones; only translations need the (translation-only) rest pose added
+def add_animation(glb, name, frames, channels, bone_nodes, rest_translations):
+    times = glb.add_accessor(array('f', [f / fps for f in frames]), 'SCALAR', min_max=True)
+    bone_channels = {}
+    for (bone_idx, data_path, index, values) in channels:
+        bone_channels.setdefault((bone_idx, data_path), {})[index] = values
+    animation = { 'name': name, 'samplers': [], 'channels': [] }
+    for ((bone_idx, data_path), components) in bone_channels.items():
+        components = [components[c] for c in sorted(components)]
+        if data_path == 'location':
+            rest = rest_translations[bone_idx]
+            (path, values) = ('translation', interleave([array('f', [v + rest[c] for v in component]) for (c, component) in enumerate(components)]))
+        elif data_path == 'rotation_quaternion':
+            (path, values) = ('rotation', interleave(components[1:] + components[:1])) # W, X, Y, Z -> X, Y, Z, W
+        else:
+            (path, values) = ('scale', interleave(components))
+        sampler = len(animation['samplers'])
+        animation['samplers'].append({ 'input': times, 'output': glb.add_accessor(values, 'VEC4' if path == 'rotation' else 'VEC3'),
+                                       'interpolation': 'LINEAR' })
+        animation['channels'].append({ 'sampler': sampler, 'target': { 'node': bone_nodes[bone_idx], 'path': path } })
+    if len(animation['channels']) > 0:
+        glb.add('animations', animation)
+
+# Writes model.sge.glb next to model.sge.json, the name sge_import.export_scene gives a gltf export
+def convert_sge(filename, output_file=None):
+    if output_file is None:
+        output_file = os.path.join(os.path.dirname(filename), os.path.splitext(os.path.basename(filename))[0]) + '.glb'
+    glb = GlbBuilder()
+    with sge_json.SgeJsonStream(filename, count_objects=False) as sge_stream:
+        sge = sge_stream.load_tables()
+        sidecar = sge_sidecar.open_sidecar(filename, sge)
+        model = sge_model.SgeModel.from_json(sge, sidecar)
+        root = { 'name': model.name, 'matrix': column_major(armature_matrix(model)) }
+        glb.gltf['scenes'][0]['nodes'].append(glb.add('nodes', root))
+        add_materials(glb, model)
+        (bone_nodes, rest_translations) = add_skeleton(glb, model, root) if len(model.bones) > 0 else ([], [])
+
+        vertex_group_index = sge_geometry.build_vertex_group_index(model.bones)
+        i = 0
+        for (j, submesh_group) in sge_stream.iter_submesh_groups():
+            for submesh in submesh_group:
+                submesh = sge_model.SgeSubmesh.from_json(submesh, sidecar)
+                name = f'{model.name}_Group{j}_Submesh{i}'
+                root.setdefault('children', []).append(add_submesh(glb, model, submesh, name, vertex_group_index.get((j, i), {})))
+                i += 1
+        if sidecar is not None:
+            sidecar.close()
+
+        if len(bone_nodes) > 0:
+            transform_tables = sge_animation.decode_transform_tables(model, model_scale)
+            for (i, anim) in sge_stream.iter_animations():
+                anim = sge_model.SgeAnimation.from_json(anim)
+                if len(anim.used_keyframes) > 0:
+                    (frames, channels) = sge_animation.build_animation_channels(model, anim, transform_tables, len(bone_nodes))
+                    add_animation(glb, f'Animation{i:3d}', frames, channels, bone_nodes, rest_translations)
+    glb.write(output_file)
+    return output_file
+
+def convert_model(sge_file):
+    result = { 'Input': sge_file }
+    start = time.perf_counter()
+    try:
+        result['Output'] = convert_sge(sge_file)
+        result['Success'] = True
+    except Exception:
+        result['Success'] = False
+        result['Error'] = traceback.format_exc()
+    result['Seconds'] = time.perf_counter() - start
+    return result
+
+# Converts the models across a process pool, largest first, reporting like sge_batch.py
+def convert_models(input_path, num_workers, report_path=None):
+    sge_files = [input_path] if input_path.endswith('.sge.json') else sge_batch.find_sge_files(input_path)
+    print(f'Converting {len(sge_files)} models to glb with {num_workers} processes...')
+    start = time.perf_counter()
+    ordered_files = sorted(sge_files, key=lambda f: os.path.getsize(f) if os.path.exists(f) else 0, reverse=True)
+    if num_workers <= 1:
+        results = { f: convert_model(f) for f in ordered_files }
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = dict(zip(ordered_files, executor.map(convert_model, ordered_files)))
+    total_seconds = time.perf_counter() - start
+
+    ordered_results = [results[f] for f in sge_files]
+    failures = [r for r in ordered_results if not r['Success']]
+    for result in ordered_results:
+        if result['Success']:
+            print(f"{result['Seconds']:8.2f}s  {result['Input']}")
+    for result in failures:
+        print(f"FAILED  {result['Input']}\n{result['Error']}")
+    print(f'Converted {len(ordered_results) - len(failures)}/{len(sge_files)} models in {total_seconds:.2f}s ({len(failures)} failed)')
+    if report_path is not None:
+        with open(report_path, 'w') as f:
+            json.dump({ 'Format': 'glb', 'Workers': num_workers, 'Seconds': total_seconds, 'Results': ordered_results }, f, indent=2)
+    return len(failures) == 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Converts SGE JSON files to GLB without Blender')
+    parser.add_argument('input', help='An .sge.json file, a directory to search for .sge.json files or a manifest listing one .sge.json file per line')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of processes to convert models with at once')
+    parser.add_argument('--report', help='Path to write a JSON report of per-model timings and failures to')
+    args = parser.parse_args()
+    sys.exit(0 if convert_models(args.input, args.workers, args.report) else 1)
@@ -1,70 +1,232 @@
+import argparse
+from array import array
 import bpy
-from mathutils import Vector, Matrix, Quaternion
+import hashlib
+from mathutils import Vector, Matrix
 import math
-import json
 import os
 import sys
 
+if __package__:
+    from . import sge_animation, sge_fingerprint, sge_geometry, sge_json, sge_model, sge_profile, sge_sidecar
+else:
+    # Running as a standalone script (e.g. blender -P sge_import.py), so make sibling modules importable
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import sge_animation, sge_fingerprint, sge_geometry, sge_json, sge_model, sge_profile, sge_sidecar
+
 model_scale = 25.4
 
-def construct_materials(sge):
+# Images loaded this session by the SHA-1 of their file, and each path's hash until the file changes
+image_cache = {}
+texture_hashes = {}
+vertex_color_mix_group_name = 'SGE Vertex Color Mix'
+
+def texture_hash(path):
+    stat = os.stat(path)
+    if path not in texture_hashes or texture_hashes[path][:2] != (stat.st_mtime_ns, stat.st_size):
+        with open(path, 'rb') as f:
+            texture_hashes[path] = (stat.st_mtime_ns, stat.st_size, hashlib.sha1(f.read()).hexdigest())
+    return texture_hashes[path][2]
+
+def load_image(texture_path, cache_stats):
+    path = os.path.realpath(texture_path)
+    digest = texture_hash(path)
+    img = image_cache.get(digest)
+    if img is not None:
+        try:
+            img.name # raises if the image was removed (e.g. the scene was reset since)
+            cache_stats['Hits'] += 1
+            return img
+        except ReferenceError:
+            pass
+    cache_stats['Misses'] += 1
+    img = bpy.data.images.load(path, check_existing=True)
+    # check_existing hands back the image already loaded from this path, which still holds the file's old pixels
+    stale_digests = [d for (d, cached) in image_cache.items() if cached == img]
+    if len(stale_digests) > 0:
+        img.reload()
+        for d in stale_digests:
+            del image_cache[d]
+    image_cache[digest] = img
+    return img
+
+# The vertex color x texture mix every textured material uses, built once and instanced as a group node
+def vertex_color_mix_group():
+    group = bpy.data.node_groups.get(vertex_color_mix_group_name)
+    if group is not None and group.bl_idname == 'ShaderNodeTree':
+        return group
+    group = bpy.data.node_groups.new(vertex_color_mix_group_name, 'ShaderNodeTree')
+    group.interface.new_socket('Texture Color', in_out='INPUT', socket_type='NodeSocketColor')
+    group.interface.new_socket('Texture Alpha', in_out='INPUT', socket_type='NodeSocketFloat')
+    group.interface.new_socket('Vertex Color', in_out='INPUT', socket_type='NodeSocketColor')
+    group.interface.new_socket('Vertex Alpha', in_out='INPUT', socket_type='NodeSocketFloat')
+    group.interface.new_socket('Color', in_out='OUTPUT', socket_type='NodeSocketColor')
+    group.interface.new_socket('Alpha', in_out='OUTPUT', socket_type='NodeSocketFloat')
+    group_input = group.nodes.new('NodeGroupInput')
+    group_output = group.nodes.new('NodeGroupOutput')
+    color_mix = group.nodes.new('ShaderNodeMix')
+    alpha_mix = group.nodes.new('ShaderNodeMix')
+    color_mix.data_type = 'RGBA'
+    alpha_mix.data_type = 'RGBA'
+    color_mix.blend_type = 'SOFT_LIGHT'
+    group.links.new(group_input.outputs['Texture Color'], color_mix.inputs['A'])
+    group.links.new(group_input.outputs['Texture Alpha'], alpha_mix.inputs['A'])
+    group.links.new(group_input.outputs['Vertex Color'], color_mix.inputs['B'])
+    group.links.new(group_input.outputs['Vertex Alpha'], alpha_mix.inputs['B'])
+    group.links.new(color_mix.outputs['Result'], group_output.inputs['Color'])
+    group.links.new(alpha_mix.outputs['Result'], group_output.inputs['Alpha'])
+    return group
+
+# A previous import's data-blocks by the section they were built from, reused while their fingerprint still matches
+class ImportedSections:
+    def __init__(self, model_name, reimport=False):
+        self.model_name = model_name
+        self.datablocks = {}
+        self.counts = {} # section kind -> [rebuilt, reused]
+        self._found = {} # section -> (data-block, name of the bpy.data collection it lives in)
+        if reimport:
+            for owner in ('objects', 'materials', 'actions', 'collections'):
+                for datablock in getattr(bpy.data, owner):
+                    if datablock.get('sge_model') == model_name:
+                        self.datablocks[datablock['sge_section']] = datablock
+                        self._found[datablock['sge_section']] = (datablock, owner)
+
+    def previous(self, section):
+        return self.datablocks.pop(section, None)
+
+    def reuse(self, previous, fingerprint):
+        if previous is None or previous.get('sge_fingerprint') != fingerprint:
+            return False
+        self.counts.setdefault(previous['sge_section'].split('/')[0], [0, 0])[1] += 1
+        return True
+
+    def tag(self, datablock, section, fingerprint):
+        datablock['sge_model'] = self.model_name
+        datablock['sge_section'] = section
+        if fingerprint is not None:
+            datablock['sge_fingerprint'] = fingerprint
+            self.counts.setdefault(section.split('/')[0], [0, 0])[0] += 1
+
+    def collection(self, section, name):
+        collection = self.previous(section)
+        if collection is None:
+            collection = bpy.data.collections.new(name)
+            bpy.context.scene.collection.children.link(collection)
+            self.tag(collection, section, None)
+        return collection
+
+    def remove(self, section):
+        (datablock, owner) = self._found.pop(section)
+        if owner == 'actions':
+            for obj in bpy.data.objects:
+                if obj.animation_data is None:
+                    continue
+                for track in list(obj.animation_data.nla_tracks):
+                    if any(strip.action == datablock for strip in track.strips):
+                        obj.animation_data.nla_tracks.remove(track)
+                if obj.animation_data.action == datablock:
+                    obj.animation_data.action = None
+        (data, data_owner) = (None, None)
+        if owner == 'objects':
+            (data, data_owner) = (datablock.data, 'meshes' if datablock.type == 'MESH' else 'armatures')
+        getattr(bpy.data, owner).remove(datablock)
+        if data is not None:
+            getattr(bpy.data, data_owner).remove(data)
+
+    # Objects go first so that their meshes, materials and actions are no longer in use when those are removed
+    def remove_all(self):
+        for section in sorted(self._found, key=lambda s: self._found[s][1] != 'objects'):
+            self.remove(section)
+        self.datablocks = {}
+
+    def remove_leftovers(self):
+        for section in sorted(self.datablocks, key=lambda s: self._found[s][1] != 'objects'):
+            self.remove(section)
+        self.datablocks = {}
+
+    def print_stats(self):
+        for (kind, (rebuilt, reused)) in self.counts.items():
+            print(f'{kind}: {rebuilt} rebuilt, {reused} reused')
+
+def texture_path_hash(texture_path):
+    if texture_path is None or len(texture_path) == 0 or not os.path.exists(texture_path):
+        return None
+    return texture_hash(os.path.realpath(texture_path))
+
+def construct_materials(model, sections=None):
     print('Constructing materials...')
+    if sections is None:
+        sections = ImportedSections(model.name)
     materials = []
-    for sge_material in sge['SgeMaterials']:
-        material = bpy.data.materials.new(sge_material['Name'])
-        material.use_backface_culling = True
-        material.use_nodes = True
-        bsdf = material.node_tree.nodes['Principled BSDF']
-        vertex_color = material.node_tree.nodes.new('ShaderNodeVertexColor')
-        if sge_material['TexturePath'] is not None and len(sge_material['TexturePath']) > 0:
-            img = bpy.data.images.load(sge_material['TexturePath'])
-            texture = material.node_tree.nodes.new('ShaderNodeTexImage')
-            texture.image = img
-            color_mix = material.node_tree.nodes.new('ShaderNodeMix')
-            alpha_mix = material.node_tree.nodes.new('ShaderNodeMix')
-            color_mix.data_type = 'RGBA'
-            alpha_mix.data_type = 'RGBA'
-            color_mix.blend_type = 'SOFT_LIGHT'
-            material.node_tree.links.new(texture.outputs['Color'], color_mix.inputs['A'])
-            material.node_tree.links.new(texture.outputs['Alpha'], alpha_mix.inputs['A'])
-            material.node_tree.links.new(vertex_color.outputs['Color'], color_mix.inputs['B'])
-            material.node_tree.links.new(vertex_color.outputs['Alpha'], alpha_mix.inputs['B'])
-            material.node_tree.links.new(color_mix.outputs['Result'], bsdf.inputs['Base Color'])
-            material.node_tree.links.new(alpha_mix.outputs['Result'], bsdf.inputs['Alpha'])
-            material.blend_method = 'CLIP'
-        else:
-            material.node_tree.links.new(vertex_color.outputs['Color'], bsdf.inputs['Base Color'])
-            material.node_tree.links.new(vertex_color.outputs['Alpha'], bsdf.inputs['Alpha'])
+    cache_stats = { 'Hits': 0, 'Misses': 0 }
+    for (i, sge_material) in enumerate(model.materials):
+        section = f'SgeMaterials/{i}'
+        fingerprint = sge_fingerprint.material_fingerprint(sge_material, texture_path_hash(sge_material.texture_path))
+        previous = sections.previous(section)
+        if sections.reuse(previous, fingerprint):
+            materials.append(previous)
+            continue
+        material = construct_material(sge_material, cache_stats)
+        if previous is not None:
+            # Meshes that are kept hold on to the old material, so move them over to the new one before dropping it
+            previous.user_remap(material)
+            sections.remove(section)
+            material.name = sge_material.name
+        sections.tag(material, section, fingerprint)
         materials.append(material)
+    print(f"Image cache: {cache_stats['Hits']} hits, {cache_stats['Misses']} misses")
     return materials
 
-def construct_armature(sge):
+def construct_material(sge_material, cache_stats):
+    material = bpy.data.materials.new(sge_material.name)
+    material.use_backface_culling = True
+    material.use_nodes = True
+    bsdf = material.node_tree.nodes['Principled BSDF']
+    vertex_color = material.node_tree.nodes.new('ShaderNodeVertexColor')
+    if sge_material.texture_path is not None and len(sge_material.texture_path) > 0:
+        texture = material.node_tree.nodes.new('ShaderNodeTexImage')
+        texture.image = load_image(sge_material.texture_path, cache_stats)
+        mix = material.node_tree.nodes.new('ShaderNodeGroup')
+        mix.node_tree = vertex_color_mix_group()
+        material.node_tree.links.new(texture.outputs['Color'], mix.inputs['Texture Color'])
+        material.node_tree.links.new(texture.outputs['Alpha'], mix.inputs['Texture Alpha'])
+        material.node_tree.links.new(vertex_color.outputs['Color'], mix.inputs['Vertex Color'])
+        material.node_tree.links.new(vertex_color.outputs['Alpha'], mix.inputs['Vertex Alpha'])
+        material.node_tree.links.new(mix.outputs['Color'], bsdf.inputs['Base Color'])
+        material.node_tree.links.new(mix.outputs['Alpha'], bsdf.inputs['Alpha'])
+        material.blend_method = 'CLIP'
+    else:
+        material.node_tree.links.new(vertex_color.outputs['Color'], bsdf.inputs['Base Color'])
+        material.node_tree.links.new(vertex_color.outputs['Alpha'], bsdf.inputs['Alpha'])
+    return material
+
+def construct_armature(model):
     print('Constructing armature...')
     bpy.ops.object.add(
         type='ARMATURE',
         enter_editmode=True,
-        location=(json_vector_to_vector(sge['SgeBones'][0]['HeadPosition']))
+        location=Vector(model.bones[0].head_position)
     )
     obj = bpy.context.object
-    obj.name = sge['Name']
+    obj.name = model.name
     armature = obj.data
-    armature.name = sge['Name'] + "_Armature"
+    armature.name = model.name + "_Armature"
     bones_list = []
-    for bone in sge['SgeBones']:
-        bone_name = f"Bone{bone['Address']}"
+    for bone in model.bones:
+        bone_name = f"Bone{bone.address}"
         new_bone = armature.edit_bones.new(bone_name)
-        new_bone.head = (json_vector_to_vector(bone['HeadPosition'])) * model_scale
+        new_bone.head = Vector(bone.head_position) * model_scale
         new_bone.tail = new_bone.head + Vector((0, 1, 0))
         bones_list.append(bone_name)
         # Uncomment to visualize Unknown00
         # new_00_bone = armature.edit_bones.new(f'{bone_name}_00')
         # new_00_bone.head = new_bone.head
-        # new_00_bone.tail = new_00_bone.head + json_vector_to_vector(bone['TailOffset']) * model_scale
+        # new_00_bone.tail = new_00_bone.head + Vector(bone.tail_offset) * model_scale
         # new_00_bone.color.palette = 'THEME02'
     for bone in armature.edit_bones:
         i = 0
-        for potential_child in sge['SgeBones']:
-            if (f"Bone{potential_child['ParentAddress']}" == bone.name):
+        for potential_child in model.bones:
+            if (f"Bone{potential_child.parent_address}" == bone.name):
                 armature.edit_bones[i].parent = bone
             i += 1
     bpy.ops.object.mode_set(mode='OBJECT')
@@ -83,218 +245,376 @@ def construct_armature(sge):
     left_leg_bone = armature.collections.new('LeftLegBone')
     right_cheek_bone = armature.collections.new('RightCheekBone')
     left_cheek_bone = armature.collections.new('LeftCheekBone')
-    for bone in sge['SgeBones']:
-        if bone['BodyPart'] == 0x0002:
-            neck_bone.assign(armature.bones[f"Bone{bone['Address']}"])
-        elif bone['BodyPart'] == 0x0004:
-            face_bone.assign(armature.bones[f"Bone{bone['Address']}"])
-        elif bone['BodyPart'] == 0x0008:
-            chest_bones.assign(armature.bones[f"Bone{bone['Address']}"])
-        elif bone['BodyPart'] == 0x0010:
-            stomach_bone.assign(armature.bones[f"Bone{bone['Address']}"])
-        elif bone['BodyPart'] == 0x0020:
-            right_hand_bone.assign(armature.bones[f"Bone{bone['Address']}"])
-        elif bone['BodyPart'] == 0x0040:
-            left_hand_bone.assign(armature.bones[f"Bone{bone['Address']}"])
-        elif bone['BodyPart'] == 0x0080:
-            unknown0080_group.assign(armature.bones[f"Bone{bone['Address']}"])
-        elif bone['BodyPart'] == 0x0100:
-            unknown0100_group.assign(armature.bones[f"Bone{bone['Address']}"])
-        elif bone['BodyPart'] == 0x0200:
-            right_foot_bone.assign(armature.bones[f"Bone{bone['Address']}"])
-        elif bone['BodyPart'] == 0x0400:
-            left_foot_bone.assign(armature.bones[f"Bone{bone['Address']}"])
-        elif bone['BodyPart'] == 0x0800:
-            eyebrow_bones.assign(armature.bones[f"Bone{bone['Address']}"])
-        elif bone['BodyPart'] == 0x1000:
-            right_leg_bone.assign(armature.bones[f"Bone{bone['Address']}"])
-        elif bone['BodyPart'] == 0x2000:
-            left_leg_bone.assign(armature.bones[f"Bone{bone['Address']}"])
-        elif bone['BodyPart'] == 0x4000:
-            right_cheek_bone.assign(armature.bones[f"Bone{bone['Address']}"])
-        elif bone['BodyPart'] == -32768: # 0x8000 but since it's a short it'll be negative
-            left_cheek_bone.assign(armature.bones[f"Bone{bone['Address']}"])
+    for bone in model.bones:
+        if bone.body_part == 0x0002:
+            neck_bone.assign(armature.bones[f"Bone{bone.address}"])
+        elif bone.body_part == 0x0004:
+            face_bone.assign(armature.bones[f"Bone{bone.address}"])
+        elif bone.body_part == 0x0008:
+            chest_bones.assign(armature.bones[f"Bone{bone.address}"])
+        elif bone.body_part == 0x0010:
+            stomach_bone.assign(armature.bones[f"Bone{bone.address}"])
+        elif bone.body_part == 0x0020:
+            right_hand_bone.assign(armature.bones[f"Bone{bone.address}"])
+        elif bone.body_part == 0x0040:
+            left_hand_bone.assign(armature.bones[f"Bone{bone.address}"])
+        elif bone.body_part == 0x0080:
+            unknown0080_group.assign(armature.bones[f"Bone{bone.address}"])
+        elif bone.body_part == 0x0100:
+            unknown0100_group.assign(armature.bones[f"Bone{bone.address}"])
+        elif bone.body_part == 0x0200:
+            right_foot_bone.assign(armature.bones[f"Bone{bone.address}"])
+        elif bone.body_part == 0x0400:
+            left_foot_bone.assign(armature.bones[f"Bone{bone.address}"])
+        elif bone.body_part == 0x0800:
+            eyebrow_bones.assign(armature.bones[f"Bone{bone.address}"])
+        elif bone.body_part == 0x1000:
+            right_leg_bone.assign(armature.bones[f"Bone{bone.address}"])
+        elif bone.body_part == 0x2000:
+            left_leg_bone.assign(armature.bones[f"Bone{bone.address}"])
+        elif bone.body_part == 0x4000:
+            right_cheek_bone.assign(armature.bones[f"Bone{bone.address}"])
+        elif bone.body_part == -32768: # 0x8000 but since it's a short it'll be negative
+            left_cheek_bone.assign(armature.bones[f"Bone{bone.address}"])
 
     animation_groups = ["Eyes", "Mouth"]
     u = 0
-    for anim_gorup in sge['BoneAnimationGroups']:
+    for anim_gorup in model.tables['BoneAnimationGroups']:
         bone_animation_group = armature.collections.new(f'{animation_groups[u] if u < len(animation_groups) else u}AnimationGroup')
         for bone_idx in anim_gorup['BoneIndices']:
-            bone_animation_group.assign(armature.bones[f"Bone{sge['SgeBones'][bone_idx]['Address']}"])
+            bone_animation_group.assign(armature.bones[f"Bone{model.bones[bone_idx].address}"])
         u += 1
 
     return (obj, bones_list)
 
-def construct_mesh(sge, submesh, materials, group_num, submesh_num):
+def construct_mesh(model, submesh, materials, vertex_group_index, group_num, submesh_num, profiler=None):
     print('Constructing mesh...')
-    mesh = bpy.data.meshes.new(sge['Name'] + "_Group" + str(group_num) + "_Submesh" + str(submesh_num))
+    if profiler is None:
+        profiler = sge_profile.SgeProfiler(False)
+    mesh = bpy.data.meshes.new(model.name + "_Group" + str(group_num) + "_Submesh" + str(submesh_num))
     mesh.validate(verbose=True)
     mesh.use_auto_smooth = True
-    obj = bpy.data.objects.new(sge['Name'] + "_Group" + str(group_num) + "_Submesh" + str(submesh_num), mesh)
+    obj = bpy.data.objects.new(model.name + "_Group" + str(group_num) + "_Submesh" + str(submesh_num), mesh)
     for material in materials:
         obj.data.materials.append(material)
 
-    vertices = []
-    normals = []
-    uvcoords = []
-    colors = []
-    for sge_vertex in submesh['SubmeshVertices']:
-        vertices.append(json_vector_to_vector(sge_vertex['Position']) * model_scale)
-        normals.append(json_vector_to_vector(sge_vertex['Normal']))
-        uvcoords.append(json_vector2_to_vector2(sge_vertex['UVCoords']))
-        colors.append(sge_vertex['Color'])
-    faces = []
-    for sge_face in submesh['SubmeshFaces']:
-        faces.append((sge_face['Polygon'][0], sge_face['Polygon'][1], sge_face['Polygon'][2])) # Faces are inverted so this is the correct order
-
-    mesh.from_pydata(vertices, [], faces) # Edges are autocalculated by blender so we can pass a blank array
-    # mesh.normals_split_custom_set([(0, 0, 0) for l in mesh.loops])
-#     mesh.normals_split_custom_set_from_vertices(normals)
-    mesh.flip_normals()
+    with profiler.stage('mesh_geometry', submesh=mesh.name) as record:
+        construct_mesh_geometry(mesh, submesh)
+        record.count(vertices=len(mesh.vertices), loops=len(mesh.loops), faces=len(mesh.polygons))
+
+    with profiler.stage('vertex_groups', submesh=mesh.name) as record:
+        add_vertex_groups(model, obj, vertex_group_index.get((group_num, submesh_num), {}), record)
+
+    outlineData = submesh_outline(model, submesh)
+    if outlineData is not None:
+        obj["OutlineWeight"] = outlineData["Weight"]
+        obj["OutlineColor"] = outlineData["Color"]
+    return obj
+
+# submesh_bones is {bone_idx: (vertex indices, weights)} (see sge_geometry.build_vertex_group_index)
+def add_vertex_groups(model, obj, submesh_bones, record):
+    for (bone_idx, (vertex_indices, weights)) in sorted(submesh_bones.items()):
+        bone_vertex_group = obj.vertex_groups.new(name='Bone' + str(model.bones[bone_idx].address))
+        for (weight, weighted_vertices) in sge_geometry.group_vertices_by_weight(vertex_indices, weights).items():
+            bone_vertex_group.add(weighted_vertices, weight, 'ADD')
+        record.count(groups=1, assignments=len(vertex_indices))
+
+# One object welded from a group's [(submesh number, submesh)], remembering each face's submesh for the exporter
+def construct_merged_mesh(model, submeshes, materials, vertex_group_index, group_num, profiler=None):
+    print('Constructing merged mesh...')
+    if profiler is None:
+        profiler = sge_profile.SgeProfiler(False)
+    mesh = bpy.data.meshes.new(model.name + "_Group" + str(group_num))
+    mesh.use_auto_smooth = True
+    obj = bpy.data.objects.new(model.name + "_Group" + str(group_num), mesh)
+    for material in materials:
+        obj.data.materials.append(material)
+
+    with profiler.stage('mesh_geometry', submesh=mesh.name) as record:
+        parts = []
+        for (submesh_num, submesh) in submeshes:
+            buffers = sge_geometry.build_submesh_buffers(submesh, model_scale)
+            weight_keys = sge_geometry.vertex_weight_keys(buffers.vertex_count, vertex_group_index.get((group_num, submesh_num), {}))
+            parts.append((buffers, submesh.normals, submesh.uvs, weight_keys))
+        (buffers, face_parts, vertex_groups) = sge_geometry.merge_submesh_buffers(parts)
+        write_mesh_buffers(mesh, buffers)
+        face_submeshes = mesh.attributes.new('sge_submesh', 'INT', 'FACE')
+        face_submeshes.data.foreach_set('value', array('i', [submeshes[p][0] for p in face_parts]))
+        record.count(vertices=len(mesh.vertices), loops=len(mesh.loops), faces=len(mesh.polygons),
+                     welded=sum(b.vertex_count for (b, _, _, _) in parts) - len(mesh.vertices))
+
+    with profiler.stage('vertex_groups', submesh=mesh.name) as record:
+        add_vertex_groups(model, obj, vertex_groups, record)
+
+    obj["SgeMergedSubmeshes"] = [submesh_num for (submesh_num, _) in submeshes]
+    outlineData = next((o for o in (submesh_outline(model, submesh) for (_, submesh) in submeshes) if o is not None), None)
+    if outlineData is not None:
+        obj["OutlineWeight"] = outlineData["Weight"]
+        obj["OutlineColor"] = outlineData["Color"]
+    return obj
+
+def submesh_outline(model, submesh):
+    return next((o for o in model.tables["OutlineDataTable"] if o["Offset"] == submesh.outline_address), None)
+
+def construct_mesh_geometry(mesh, submesh):
+    write_mesh_buffers(mesh, sge_geometry.build_submesh_buffers(submesh, model_scale))
+
+def write_mesh_buffers(mesh, buffers):
+    mesh.vertices.add(buffers.vertex_count)
+    mesh.vertices.foreach_set('co', buffers.positions)
+    mesh.loops.add(len(buffers.loop_vertices))
+    mesh.loops.foreach_set('vertex_index', buffers.loop_vertices)
+    mesh.polygons.add(buffers.face_count)
+    mesh.polygons.foreach_set('loop_start', buffers.loop_starts)
+    mesh.polygons.foreach_set('material_index', buffers.material_indices)
+    mesh.update(calc_edges=True) # Edges are autocalculated by blender so we don't need to provide them
 
     uvlayer = mesh.uv_layers.new()
     uvlayer_name = uvlayer.name
     color_layer = mesh.color_attributes.new('vertex_colors', 'FLOAT_COLOR', 'POINT')
     # Creating the color layer has invalidated the reference to the uv layer, so get it again.
     uvlayer = mesh.uv_layers[uvlayer_name]
-    for face in mesh.polygons:
-        for vert_idx, loop_idx in zip(face.vertices, face.loop_indices):
-            color_layer.data[vert_idx].color_srgb = (colors[vert_idx]['R'], colors[vert_idx]['G'], colors[vert_idx]['B'], colors[vert_idx]['A'])
-            uvlayer.uv[loop_idx].vector = uvcoords[vert_idx]
-    
-    for i in range(len(mesh.polygons)):
-        if submesh['Material'] is not None:
-            mesh.polygons[i].material_index = submesh['Material']['Index']
+    uvlayer.uv.foreach_set('vector', buffers.loop_uvs)
+    color_layer.data.foreach_set('color_srgb', buffers.colors)
     mesh.update()
-    
-    for bone in sge['SgeBones']:
-        bone_vertex_group = obj.vertex_groups.new(name='Bone' + str(bone['Address']))
-        for attached_vertex in bone['VertexGroup']:
-            attached_vertex_split = attached_vertex.split(',')
-            (attached_vertex_group, attached_vertex_submesh, attached_vertex_index) = (int(attached_vertex_split[0]), int(attached_vertex_split[1]), int(attached_vertex_split[2]))
-            if attached_vertex_group == group_num and attached_vertex_submesh == submesh_num:
-                bone_vertex_group.add([attached_vertex_index], bone['VertexGroup'][attached_vertex], 'ADD')
-
-    outlineData = next((o for o in sge["OutlineDataTable"] if o["Offset"] == submesh["OutlineAddress"]), None)
-    if outlineData is not None:
-        obj["OutlineWeight"] = outlineData["Weight"]
-        obj["OutlineColor"] = outlineData["Color"]
-    return obj
 
-def construct_animation(sge, anim, bones_list : list, anim_num):
+def attach_mesh(mesh, armature, collection):
+    collection.objects.link(mesh)
+    mesh.parent = armature
+    modifier = mesh.modifiers.new(type='ARMATURE', name='Armature')
+    modifier.object = armature
+
+# Resyncs the material slots of a kept mesh in case materials were added or removed
+def update_mesh_materials(obj, materials):
+    if list(obj.data.materials) != materials:
+        obj.data.materials.clear()
+        for material in materials:
+            obj.data.materials.append(material)
+
+def construct_animation(model, anim, bones_list : list, anim_num, transform_tables=None, profiler=None, channels=None):
     print(f'Creating animation {anim_num}...')
-    pose = bpy.context.object.pose
-
-    i = 0
-    for keyframe_idx in anim['UsedKeyframes']:
-        keyframe = sge['KeyframeDefinitions'][keyframe_idx]
-        bone_idx = 0
-        for armature_bone in bones_list:
-            if bone_idx < 1:
-                bone_idx += 1
-                continue
-            bone = pose.bones[armature_bone]
-            bone_keyframe = anim['BoneTable'][bone_idx - 1]['Keyframes']
-            trans_vec = json_vector_to_vector(sge['TranslateDataEntries'][bone_keyframe[i]['TranslateIndex']]) * model_scale
-            rot_quaternion = json_quaternion_to_quaternion(sge['RotateDataEntries'][bone_keyframe[i]['RotateIndex']])
-            scale_vec = json_vector_to_vector(sge['ScaleDataEntries'][bone_keyframe[i]['ScaleIndex']])
-            matrix = Matrix.LocRotScale(trans_vec, rot_quaternion, scale_vec)
-            bone.matrix = bone.matrix @ matrix
-
-            bone.keyframe_insert(
-                data_path=f'location',
-                frame=keyframe['EndFrame'] - keyframe['NumFrames']
-            )
-            bone.keyframe_insert(
-                data_path=f'rotation_quaternion',
-                frame=keyframe['EndFrame'] - keyframe['NumFrames']
-            )
-            bone.keyframe_insert(
-                data_path=f'scale',
-                frame=keyframe['EndFrame'] - keyframe['NumFrames']
-            )
-            bone_idx += 1
-        i += 1
-
-def json_vector_to_vector(json_vector):
-    return Vector((float(json_vector['X']), float(json_vector['Y']), float(json_vector['Z'])))
-
-def json_vector2_to_vector2(json_vector):
-    return (float(json_vector['X']), float(json_vector['Y']))
-
-def json_quaternion_to_quaternion(json_quaternion):
-    return Quaternion((float(json_quaternion['W']), float(json_quaternion['X']), float(json_quaternion['Y']), float(json_quaternion['Z'])))
-
-def import_sge(filename, output_format):
-    f = open(filename)
-    sge = json.load(f)
-    materials = construct_materials(sge)
-    sge_armature_collection = bpy.data.collections.new(f'sge_armature')
-    bpy.context.scene.collection.children.link(sge_armature_collection)
-    (armature, bones_list) = construct_armature(sge)
-    sge_armature_collection.objects.link(armature)
-
-    bpy.context.scene.render.fps = 60
-
-    i = 0
-    j = 0
-    for submeshGroup in sge['SgeSubmeshes']:
-        sge_collection = bpy.data.collections.new(f'sge_collection{j}')
-        bpy.context.scene.collection.children.link(sge_collection)
-        for submesh in submeshGroup:
-            mesh = construct_mesh(sge, submesh, materials, j, i)
-            i += 1
+    if profiler is None:
+        profiler = sge_profile.SgeProfiler(False)
+    if transform_tables is None:
+        transform_tables = sge_animation.decode_transform_tables(model, model_scale)
+    action = bpy.context.object.animation_data.action
+
+    with profiler.stage('animations') as record:
+        if channels is None:
+            channels = sge_animation.build_animation_channels(model, anim, transform_tables, len(bones_list))
+        write_animation_channels(action, bones_list, channels, record)
+
+# Writes each channel as a whole F-curve: allocate all of its keyframe points up front and fill them in one go
+def write_animation_channels(action, bones_list, channels, record=sge_profile.null_record):
+    (frames, channels) = channels
+    for (bone_idx, data_path, index, values) in channels:
+        bone_name = bones_list[bone_idx]
+        fcurve = action.fcurves.new(data_path=f'pose.bones["{bone_name}"].{data_path}', index=index, action_group=bone_name)
+        fcurve.keyframe_points.add(len(frames))
+        fcurve.keyframe_points.foreach_set('co', sge_animation.keyframe_coordinates(frames, values))
+        fcurve.update()
+    record.count(fcurves=len(channels), keyframes=len(channels) * len(frames))
+
+# Lazily imported actions are built on first use from packed tables on the armature and packed keyframes on the action
+lazy_table_keys = (('translations', 'SgeTranslateData'), ('rotations', 'SgeRotateData'), ('scales', 'SgeScaleData'))
+# Whether the open file has lazy actions left to build (None until it's been checked)
+lazy_animations_pending = None
+
+def store_lazy_tables(armature, model, transform_tables):
+    for (table_name, key) in lazy_table_keys:
+        armature[key] = getattr(transform_tables, table_name)
+    armature['SgeBoneAddresses'] = array('i', [bone.address for bone in model.bones])
+
+def pack_lazy_animation(action, packed):
+    (frames, indices) = packed
+    action['sge_frames'] = frames
+    action['sge_keyframe_indices'] = indices
+    # An empty action needs the frame range it will have to size its NLA strip
+    action.use_frame_range = True
+    action.frame_start = frames[0]
+    action.frame_end = frames[-1]
+
+def is_lazy_animation(action):
+    return action.get('sge_keyframe_indices') is not None
+
+def build_lazy_animation(action):
+    armature = next((o for o in bpy.data.objects if o.type == 'ARMATURE' and o.get('sge_model') == action.get('sge_model')
+                     and o.get('SgeBoneAddresses') is not None), None)
+    if armature is None:
+        print(f'Unable to build {action.name}: the armature it was imported with is gone')
+        return False
+    print(f'Building {action.name}...')
+    transform_tables = sge_animation.TransformTables(*[array('f', armature[key]) for (_, key) in lazy_table_keys])
+    bones_list = [f'Bone{address}' for address in armature['SgeBoneAddresses']]
+    channels = sge_animation.unpack_animation_channels(array('f', action['sge_frames']), array('i', action['sge_keyframe_indices']),
+                                                        transform_tables, len(bones_list))
+    write_animation_channels(action, bones_list, channels)
+    del action['sge_frames']
+    del action['sge_keyframe_indices']
+    action.use_frame_range = False
+    return True
 
-            sge_collection.objects.link(mesh)
+# Returns how many lazily imported actions there were to build
+def build_lazy_animations():
+    global lazy_animations_pending
+    actions = [action for action in bpy.data.actions if is_lazy_animation(action)]
+    for action in actions:
+        build_lazy_animation(action)
+    lazy_animations_pending = False
+    return len(actions)
 
-            mesh.parent = armature
-            modifier = mesh.modifiers.new(type='ARMATURE', name='Armature')
-            modifier.object = armature
-        j += 1
+# depsgraph_update_post handler building a lazy action once it becomes an object's active action
+@bpy.app.handlers.persistent
+def build_active_lazy_animations(scene, depsgraph=None):
+    global lazy_animations_pending
+    if lazy_animations_pending is None:
+        lazy_animations_pending = any(is_lazy_animation(action) for action in bpy.data.actions)
+    if not lazy_animations_pending:
+        return
+    built = False
+    for obj in scene.objects:
+        if obj.animation_data is not None and obj.animation_data.action is not None and is_lazy_animation(obj.animation_data.action):
+            built = build_lazy_animation(obj.animation_data.action) or built
+    if built:
+        lazy_animations_pending = any(is_lazy_animation(action) for action in bpy.data.actions)
 
-    if armature.animation_data is None:
-        armature.animation_data_create()
-        armature.animation_data.use_nla = True
+# load_post handler, also called after a lazy import, so the next update checks for lazy actions again
+@bpy.app.handlers.persistent
+def reset_lazy_animations(*args):
+    global lazy_animations_pending
+    lazy_animations_pending = None
 
-    if output_format.lower() != 'obj':
-        bpy.ops.object.mode_set(mode='POSE')
-        if i >= 0:    
-            i = 0
-            for anim in sge['SgeAnimations']:
-                if len(anim['UsedKeyframes']) > 0:
+# reimport keeps unchanged sections, merge_submeshes makes each group one object and lazy_animations defers building actions
+def import_sge(filename, output_format='blend', profile=None, reimport=False, merge_submeshes=False, lazy_animations=False):
+    profiler = sge_profile.SgeProfiler(profile)
+    profiler.start()
+    with sge_json.SgeJsonStream(filename) as sge_stream:
+        with profiler.stage('parse_tables'):
+            sge = sge_stream.load_tables()
+            sidecar = sge_sidecar.open_sidecar(filename, sge)
+            model = sge_model.SgeModel.from_json(sge, sidecar)
+        sections = ImportedSections(model.name, reimport)
+        bones_fingerprint = sge_fingerprint.bone_table_fingerprint(model)
+        armature = sections.previous('SgeBones')
+        if not sections.reuse(armature, bones_fingerprint):
+            # Every submesh's vertex groups and every animation's F-curves refer to the bones, so none of them can be kept
+            sections.remove_all()
+            armature = None
+        with profiler.stage('materials') as record:
+            materials = construct_materials(model, sections)
+            record.count(materials=len(materials))
+        sge_armature_collection = sections.collection('Collection/SgeBones', 'sge_armature')
+        with profiler.stage('armature') as record:
+            new_armature = armature is None
+            if new_armature:
+                (armature, bones_list) = construct_armature(model)
+                sge_armature_collection.objects.link(armature)
+                sections.tag(armature, 'SgeBones', bones_fingerprint)
+            else:
+                bones_list = [f"Bone{bone.address}" for bone in model.bones]
+                bpy.context.view_layer.objects.active = armature
+            record.count(bones=len(bones_list))
+
+        bpy.context.scene.render.fps = 60
+
+        # Submeshes and animations are decoded one at a time as we go so we never hold the whole file in memory
+        with profiler.stage('vertex_group_index'):
+            vertex_group_index = sge_geometry.build_vertex_group_index(model.bones)
+        i = 0
+        for (j, submeshGroup) in sge_stream.iter_submesh_groups():
+            sge_collection = sections.collection(f'Collection/SgeSubmeshes/{j}', f'sge_collection{j}')
+            group_submeshes = [] # (submesh number, submesh, fingerprint) for each submesh of the group when merging
+            for submesh in profiler.iterate('parse_submeshes', (sge_model.SgeSubmesh.from_json(s, sidecar) for s in submeshGroup)):
+                section = f'SgeSubmeshes/{j}/{i}'
+                fingerprint = sge_fingerprint.submesh_fingerprint(submesh, vertex_group_index.get((j, i), {}), submesh_outline(model, submesh))
+                i += 1
+                if merge_submeshes:
+                    group_submeshes.append((i - 1, submesh, fingerprint))
+                    continue
+                previous = sections.previous(section)
+                if sections.reuse(previous, fingerprint):
+                    update_mesh_materials(previous, materials)
+                    continue
+                if previous is not None:
+                    sections.remove(section)
+                mesh = construct_mesh(model, submesh, materials, vertex_group_index, j, i - 1, profiler)
+                sections.tag(mesh, section, fingerprint)
+                attach_mesh(mesh, armature, sge_collection)
+            if len(group_submeshes) > 0:
+                section = f'SgeMergedSubmeshes/{j}'
+                fingerprint = sge_fingerprint.fingerprint([n for (n, _, _) in group_submeshes], *[f for (_, _, f) in group_submeshes])
+                previous = sections.previous(section)
+                if sections.reuse(previous, fingerprint):
+                    update_mesh_materials(previous, materials)
+                    continue
+                if previous is not None:
+                    sections.remove(section)
+                mesh = construct_merged_mesh(model, [(n, submesh) for (n, submesh, _) in group_submeshes], materials, vertex_group_index, j,
+                                             profiler)
+                sections.tag(mesh, section, fingerprint)
+                attach_mesh(mesh, armature, sge_collection)
+        if sidecar is not None:
+            sidecar.close()
+
+        if armature.animation_data is None:
+            armature.animation_data_create()
+            armature.animation_data.use_nla = True
+
+        if output_format.lower() != 'obj':
+            bpy.ops.object.mode_set(mode='POSE')
+            with profiler.stage('transform_tables'):
+                transform_tables = sge_animation.decode_transform_tables(model, model_scale)
+                if lazy_animations:
+                    store_lazy_tables(armature, model, transform_tables)
+            animations = ((i, sge_model.SgeAnimation.from_json(anim)) for (i, anim) in sge_stream.iter_animations())
+            for (i, anim) in profiler.iterate('parse_animations', animations):
+                if len(anim.used_keyframes) > 0:
+                    section = f'SgeAnimations/{i}'
+                    packed = sge_animation.pack_animation(model, anim, len(bones_list))
+                    channels = sge_animation.unpack_animation_channels(*packed, transform_tables, len(bones_list))
+                    fingerprint = sge_fingerprint.animation_fingerprint(*channels)
+                    previous = sections.previous(section)
+                    if sections.reuse(previous, fingerprint):
+                        if lazy_animations and is_lazy_animation(previous):
+                            # The tables were just stored again and its entries may have moved around in them
+                            pack_lazy_animation(previous, packed)
+                        continue
+                    if previous is not None:
+                        sections.remove(section)
                     action = bpy.data.actions.new(f'Animation{i:3d}')
-                    armature.animation_data.action = action
+                    sections.tag(action, section, fingerprint)
                     action.animation_data_clear()
+                    if lazy_animations:
+                        pack_lazy_animation(action, packed)
+                    else:
+                        armature.animation_data.action = action
                     nla = armature.animation_data.nla_tracks.new()
                     nla.strips.new(f'Animation{i:3d}', 0, action)
-                i += 1
+                    if not lazy_animations:
+                        construct_animation(model, anim, bones_list, i, transform_tables, profiler, channels)
+            if lazy_animations:
+                reset_lazy_animations()
+
+        sections.remove_leftovers()
+        sge_stream.print_stats()
+        if reimport:
+            sections.print_stats()
+        profiler.finish('import', filename)
 
-            i = 0
-            for anim in sge['SgeAnimations']:
-                if len(anim['UsedKeyframes']) > 0:
-                    armature.animation_data.action = bpy.data.actions[f'Animation{i:3d}']
-                    construct_animation(sge, anim, bones_list, i)
-                i += 1
-    
     bpy.ops.object.mode_set(mode='OBJECT')
-    bpy.context.object.matrix_world = bpy.context.object.matrix_world @ Matrix.Rotation(math.radians(90), 4, 'X')
-    bpy.ops.object.select_same_collection(collection=sge_armature_collection.name)
-    bpy.ops.transform.mirror(constraint_axis=(False, True, False), orient_type='GLOBAL')
-    bpy.ops.object.select_all(action='DESELECT')
+    # A kept armature has already been turned the right way around
+    if new_armature:
+        bpy.context.object.matrix_world = bpy.context.object.matrix_world @ Matrix.Rotation(math.radians(90), 4, 'X')
+        bpy.ops.object.select_same_collection(collection=sge_armature_collection.name)
+        bpy.ops.transform.mirror(constraint_axis=(False, True, False), orient_type='GLOBAL')
+        bpy.ops.object.select_all(action='DESELECT')
     bpy.ops.object.mode_set(mode='POSE')
 
     return {'FINISHED'}
 
-if __name__ == '__main__':
-    # Clean scene
-    for o in bpy.context.scene.objects:
-        o.select_set(True)
-    bpy.ops.object.delete()
-
-    input_file = sys.argv[-2]
-    output_format = sys.argv[-1]
-
-    import_sge(input_file, output_format)
+def export_scene(input_file, output_format):
+    if output_format.lower() != 'blend':
+        build_lazy_animations()
     output_file = os.path.join(os.path.dirname(input_file), os.path.splitext(os.path.basename(input_file))[0])
 
     if output_format.lower() == 'gltf':
@@ -309,4 +629,29 @@ if __name__ == '__main__':
                               export_colors=True, export_materials=True, path_mode='COPY', export_vertex_groups=True, export_material_groups=True)
     else:
         output_file += '.blend'
-        bpy.ops.wm.save_as_mainfile(filepath=os.path.abspath(output_file), check_existing=False)
\ No newline at end of file
+        bpy.ops.wm.save_as_mainfile(filepath=os.path.abspath(output_file), check_existing=False)
+    return output_file
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Imports an .sge.json into Blender and saves the scene in another format')
+    parser.add_argument('input', help='The .sge.json to import')
+    parser.add_argument('format', help='The output format (gltf, fbx, obj or blend)')
+    parser.add_argument('--reimport', action='store_true', help='Update the .blend a previous blend-format import wrote')
+    parser.add_argument('--merge-submeshes', action='store_true', help='Import each submesh group as a single object')
+    parser.add_argument('--lazy-animations', action='store_true', help='Leave building animations until they are opened')
+    # Blender's own arguments come before --; without one, the model and format are the last two arguments
+    args = parser.parse_args(sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[-2:])
+    (input_file, output_format) = (args.input, args.format)
+    blend_file = f'{os.path.splitext(input_file)[0]}.blend'
+    reimport = args.reimport and os.path.exists(blend_file)
+
+    if reimport:
+        bpy.ops.wm.open_mainfile(filepath=blend_file)
+    else:
+        # Clean scene
+        for o in bpy.context.scene.objects:
+            o.select_set(True)
+        bpy.ops.object.delete()
+
+    import_sge(input_file, output_format, reimport=reimport, merge_submeshes=args.merge_submeshes, lazy_animations=args.lazy_animations)
+    export_scene(input_file, output_format)
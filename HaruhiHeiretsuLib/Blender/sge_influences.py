@@ -0,0 +1,62 @@
+from collections import Counter, namedtuple
+
+# Drops weak influences before bone palettes are built; a bone is whatever the caller keys influences by
+InfluenceBudget = namedtuple('InfluenceBudget', ['max_influences', 'min_weight', 'smooth_weight'])
+default_budget = InfluenceBudget(4, 0.01, 0.0)
+
+# Totals for an export, printed at the end of it
+class InfluenceReport:
+    def __init__(self):
+        self.pruned = 0 # influences dropped by max_influences/min_weight
+        self.smoothed = 0 # vertices smooth_bone_sets dropped an influence from
+        self.bones_saved = 0 # palette slots across all submeshes
+        self.submeshes_saved = 0
+
+    def print_stats(self, name):
+        print(f'Influence budget for {name}: {self.bones_saved} palette bones and {self.submeshes_saved} submeshes saved '
+              f'({self.pruned} influences pruned, {self.smoothed} vertices smoothed)')
+
+def renormalized(influences):
+    total = sum(w for (_, w) in influences)
+    if total <= 0:
+        return influences
+    return [(bone, w / total) for (bone, w) in influences]
+
+# Keeps (in their original order) a vertex's strongest influences that fit the budget and renormalizes their weights
+def budget_influences(influences, budget):
+    if len(influences) == 0:
+        return influences
+    strongest = sorted(range(len(influences)), key=lambda i: influences[i][1], reverse=True)[:budget.max_influences]
+    kept = [i for i in strongest if influences[i][1] >= budget.min_weight] or strongest[:1]
+    return renormalized([influences[i] for i in sorted(kept)])
+
+# Drops a vertex's weakest influence (up to max_weight) while the bone set left is more common; returns (influences, changed)
+def smooth_bone_sets(vertex_influences, max_weight):
+    counts = Counter(frozenset(bone for (bone, _) in influences) for influences in vertex_influences)
+    smoothed = []
+    changed = 0
+    for influences in vertex_influences:
+        bones = frozenset(bone for (bone, _) in influences)
+        original = influences
+        while len(influences) > 1:
+            weakest = min(range(len(influences)), key=lambda i: influences[i][1])
+            reduced = bones - { influences[weakest][0] }
+            if influences[weakest][1] > max_weight or counts[reduced] <= counts[bones]:
+                break
+            influences = renormalized(influences[:weakest] + influences[weakest + 1:])
+            bones = reduced
+        if influences is not original:
+            changed += 1
+        smoothed.append(influences)
+    return (smoothed, changed)
+
+# Applies the budget to every vertex of a mesh, adding what it dropped to report (if given)
+def apply_budget(vertex_influences, budget, report=None):
+    budgeted = [budget_influences(influences, budget) for influences in vertex_influences]
+    if report is not None:
+        report.pruned += sum(len(influences) for influences in vertex_influences) - sum(len(influences) for influences in budgeted)
+    if budget.smooth_weight > 0:
+        (budgeted, smoothed) = smooth_bone_sets(budgeted, budget.smooth_weight)
+        if report is not None:
+            report.smoothed += smoothed
+    return budgeted
@@ -0,0 +1,262 @@
+import codecs
+import json
+import re
+
+# The sections that hold the bulk of an SGE and are handed out one element at a time
+streamed_sections = ('SgeSubmeshes', 'SgeAnimations')
+# The tables import_sge needs before it can start building submeshes and animations
+import_tables = ('Name', 'SgeMaterials', 'SgeBones', 'BoneAnimationGroups', 'OutlineDataTable',
+                 'KeyframeDefinitions', 'TranslateDataEntries', 'RotateDataEntries', 'ScaleDataEntries')
+
+_whitespace = re.compile(r'[ \t\n\r]*')
+_number_chars = re.compile(r'[0-9.eE+-]*')
+
+# Reads an .sge.json section by section, decoding submeshes and animations one at a time and everything else into `tables`
+class SgeJsonStream:
+    def __init__(self, filename, required_tables=import_tables, count_objects=True, chunk_size=1 << 22):
+        self.tables = {}
+        self.stats = {}
+        self.required_tables = required_tables
+        self.chunk_size = chunk_size
+        self._file = open(filename, 'rb')
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._started = False
+        self._finished = False
+        self._live_section = None
+        self._spooled = {}
+        self._objects = 0
+        self._json_decoder = json.JSONDecoder(object_hook=self._count_object) if count_objects else json.JSONDecoder()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._file.close()
+        self._buffer = ''
+        self._spooled = {}
+
+    def load_tables(self):
+        while not all(t in self.tables for t in self.required_tables):
+            if self._live_section is not None:
+                self._spool(self._live_section)
+            if not self._next_section():
+                break
+        return self.tables
+
+    # Yields (group_idx, submeshes) where submeshes is an iterator over that group's submesh dicts
+    def iter_submesh_groups(self):
+        if 'SgeSubmeshes' in self._spooled:
+            spooled_groups = self._spooled.pop('SgeSubmeshes')
+            for j, group in enumerate(spooled_groups):
+                yield (j, (json.loads(raw) for raw in group))
+            return
+        if not self._advance_to('SgeSubmeshes'):
+            return
+        self._live_section = None
+        for j, _ in self._iter_array('SgeSubmeshes', nested=True):
+            submeshes = self._iter_array('SgeSubmeshes')
+            yield (j, (submesh for _, submesh in submeshes))
+            for _ in submeshes: # make sure we're past the group even if the caller didn't finish it
+                pass
+
+    def iter_animations(self):
+        if 'SgeAnimations' in self._spooled:
+            for i, raw in enumerate(self._spooled.pop('SgeAnimations')):
+                yield (i, json.loads(raw))
+            return
+        if not self._advance_to('SgeAnimations'):
+            return
+        self._live_section = None
+        yield from self._iter_array('SgeAnimations')
+
+    def print_stats(self):
+        for section, section_stats in self.stats.items():
+            print(f"{section}: {section_stats['Bytes']} bytes, {section_stats['Objects']} objects")
+
+    def _count_object(self, obj):
+        self._objects += 1
+        return obj
+
+    def _section_stats(self, section):
+        if section not in self.stats:
+            self.stats[section] = { 'Bytes': 0, 'Objects': 0 }
+        return self.stats[section]
+
+    def _fill(self):
+        if self._eof:
+            return False
+        # Reading at least as much as is buffered keeps decoding a very large value linear
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        data = self._file.read(max(self.chunk_size, len(self._buffer)))
+        if len(data) == 0:
+            self._eof = True
+            self._buffer += self._text_decoder.decode(b'', final=True)
+        else:
+            self._buffer += self._text_decoder.decode(data)
+        return True
+
+    def _peek(self):
+        while True:
+            self._pos = _whitespace.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of SGE JSON file')
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Expected '{char}' at position {self._pos} of SGE JSON buffer but found '{self._buffer[self._pos]}'")
+        self._pos += 1
+
+    def _decode_value(self, section, keep_raw=False):
+        self._peek()
+        objects = self._objects
+        while True:
+            try:
+                (value, end) = self._json_decoder.raw_decode(self._buffer, self._pos)
+                # A value running right up to the end of the buffer (or into a dangling '.' or 'e') might be a truncated number
+                if self._eof or _number_chars.match(self._buffer, end).end() < len(self._buffer):
+                    break
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._objects = objects
+            self._fill()
+        if section is not None:
+            section_stats = self._section_stats(section)
+            # Both Sge.DumpJson and json.dump escape non-ASCII characters, so characters are bytes here
+            section_stats['Bytes'] += end - self._pos
+            section_stats['Objects'] += self._objects - objects
+        raw = self._buffer[self._pos:end] if keep_raw else None
+        self._pos = end
+        return (value, raw)
+
+    def _next_section(self):
+        if self._finished:
+            return False
+        if not self._started:
+            self._expect('{')
+            self._started = True
+            if self._peek() == '}':
+                self._finished = True
+                return False
+        else:
+            separator = self._peek()
+            self._pos += 1
+            if separator == '}':
+                self._finished = True
+                return False
+            if separator != ',':
+                raise ValueError(f"Expected ',' or '}}' between SGE JSON sections but found '{separator}'")
+        (section, _) = self._decode_value(None)
+        self._expect(':')
+        if section in streamed_sections:
+            self._live_section = section
+        else:
+            (self.tables[section], _) = self._decode_value(section)
+        return True
+
+    def _advance_to(self, section):
+        while self._live_section != section:
+            if self._live_section is not None:
+                self._spool(self._live_section)
+            if not self._next_section():
+                return False
+        return True
+
+    def _spool(self, section):
+        self._live_section = None
+        spooled = []
+        if section == 'SgeSubmeshes':
+            for _ in self._iter_array(section, nested=True):
+                spooled.append([raw.encode() for _, raw in self._iter_array(section, keep_raw=True)])
+        else:
+            spooled = [raw.encode() for _, raw in self._iter_array(section, keep_raw=True)]
+        self._spooled[section] = spooled
+
+    # Yields (index, value), or (index, raw) with keep_raw; with nested, the caller iterates each element array itself
+    def _iter_array(self, section, nested=False, keep_raw=False):
+        if self._peek() == 'n':
+            self._decode_value(section) # null
+            return
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        i = 0
+        while True:
+            if nested:
+                yield (i, None)
+            else:
+                (value, raw) = self._decode_value(section, keep_raw)
+                yield (i, raw if keep_raw else value)
+                value = None
+            i += 1
+            separator = self._peek()
+            self._pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or ']' in SGE JSON section {section} but found '{separator}'")
+
+# Writes an .sge.json one section at a time, streaming submeshes last so readers have everything else first
+class SgeJsonWriter:
+    def __init__(self, f):
+        self._file = f
+        self._encoder = json.JSONEncoder(separators=(',', ':'))
+        self._started = False
+        self._group_open = False
+        self._submeshes_in_group = 0
+        self.submesh_groups = 0
+
+    def write_section(self, section, value):
+        self._begin_section(section)
+        self._file.write(self._encoder.encode(value))
+
+    def begin_submeshes(self):
+        self._begin_section('SgeSubmeshes')
+        self._file.write('[')
+
+    def encode(self, value):
+        return self._encoder.encode(value)
+
+    def write_submesh(self, submesh):
+        self.write_submesh_json(self._encoder.encode(submesh))
+
+    # Writes a submesh that has already been encoded (e.g. one from the export cache)
+    def write_submesh_json(self, submesh_json):
+        if not self._group_open:
+            self._begin_submesh_group()
+        self._file.write((',' if self._submeshes_in_group > 0 else '') + submesh_json)
+        self._submeshes_in_group += 1
+
+    # Closes the current submesh group; a group nothing was written to is left out unless keep_empty is set
+    def end_submesh_group(self, keep_empty=False):
+        if not self._group_open and keep_empty:
+            self._begin_submesh_group()
+        if self._group_open:
+            self._file.write(']')
+            self._group_open = False
+            self.submesh_groups += 1
+
+    def end_submeshes(self):
+        self._file.write(']')
+
+    def close(self):
+        self._file.write('}' if self._started else '{}')
+
+    def _begin_section(self, section):
+        self._file.write(('{' if not self._started else ',') + self._encoder.encode(section) + ':')
+        self._started = True
+
+    def _begin_submesh_group(self):
+        self._file.write(',[' if self.submesh_groups > 0 else '[')
+        self._group_open = True
+        self._submeshes_in_group = 0
@@ -0,0 +1,130 @@
+import argparse
+import bpy
+import csv
+from mathutils import Matrix
+import math
+import os
+import sys
+
+if __package__:
+    from . import sge_batch, sge_import
+else:
+    # Running as a standalone script (e.g. blender -P sge_map.py), so make sibling modules importable
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import sge_batch, sge_import
+
+# Imports each model a map's placement CSV uses once into an excluded library and places collection instances of it
+library_collection_name = 'sge_map_library'
+# MapFile stores Rotation as a bare short; a binary angle (0x10000 per turn) is assumed, so the scale is a parameter
+default_rotation_units = 0x10000
+
+# [{ 'Name', 'X', 'Y', 'Z', 'ShouldProcess', 'Rotation', 'Index' }] for every entry that places a model
+def read_map_entries(csv_path):
+    entries = []
+    with open(csv_path, newline='') as f:
+        for (i, row) in enumerate(csv.DictReader(f)):
+            if len(row['Name'].strip()) == 0:
+                continue
+            entries.append({
+                'Name': row['Name'].strip(),
+                'X': float(row['X']),
+                'Y': float(row['Y']),
+                'Z': float(row['Z']),
+                'ShouldProcess': int(row['ShouldProcess']),
+                'Rotation': int(row['Rotation']),
+                'Index': i,
+            })
+    return entries
+
+# Lower-cased model name -> .sge.json path, since map entries don't always match the dumped files' case
+def find_map_models(models_path):
+    models = {}
+    for sge_file in sge_batch.find_sge_files(models_path):
+        models.setdefault(os.path.basename(sge_file)[:-len('.sge.json')].lower(), sge_file)
+    return models
+
+# The armature transform import_sge would give a model at the origin: the game's Y up becomes Blender's Z up
+def game_to_blender_matrix():
+    return Matrix.Scale(-1, 4, (0, 1, 0)) @ Matrix.Rotation(math.radians(90), 4, 'X')
+
+# Moves an instance from the model's armature space to where the entry places it, cancelling the armature's own offset
+def placement_matrix(entry, armature_matrix, rotation_units=default_rotation_units):
+    location = Matrix.Translation((entry['X'] * sge_import.model_scale, entry['Y'] * sge_import.model_scale, entry['Z'] * sge_import.model_scale))
+    rotation = Matrix.Rotation(entry['Rotation'] * 2 * math.pi / rotation_units, 4, 'Y')
+    return game_to_blender_matrix() @ location @ rotation @ armature_matrix.inverted()
+
+def library_collection():
+    library = bpy.data.collections.get(library_collection_name)
+    if library is None:
+        library = bpy.data.collections.new(library_collection_name)
+        bpy.context.scene.collection.children.link(library)
+        # Excluding it from the view layer hides the originals while the instances of its collections still show up
+        bpy.context.view_layer.layer_collection.children[library.name].exclude = True
+    return library
+
+# Imports a model into its own collection under the library; returns (collection, armature)
+def import_library_model(sge_file, library, output_format):
+    existing = set(bpy.context.scene.collection.children)
+    # Animations are left packed; export_scene builds them when writing anything but a .blend
+    sge_import.import_sge(sge_file, output_format, lazy_animations=True)
+    bpy.ops.object.mode_set(mode='OBJECT')
+    model_collection = bpy.data.collections.new(os.path.basename(sge_file)[:-len('.sge.json')])
+    library.children.link(model_collection)
+    armature = None
+    for collection in [c for c in bpy.context.scene.collection.children if c not in existing]:
+        bpy.context.scene.collection.children.unlink(collection)
+        model_collection.children.link(collection)
+        armature = next((o for o in collection.objects if o.type == 'ARMATURE'), armature)
+    return (model_collection, armature)
+
+def assemble_map(csv_path, models_path, output_format='blend', rotation_units=default_rotation_units):
+    entries = read_map_entries(csv_path)
+    models = find_map_models(models_path)
+    library = library_collection()
+    map_collection = bpy.data.collections.new(os.path.splitext(os.path.basename(csv_path))[0])
+    bpy.context.scene.collection.children.link(map_collection)
+
+    imported = {} # model name -> (collection, armature matrix), or None if it has no .sge.json
+    placed = 0
+    for entry in entries:
+        name = entry['Name'].lower()
+        if name not in imported:
+            if name not in models:
+                print(f"No model found for {entry['Name']}, skipping its placements")
+                imported[name] = None
+            else:
+                (model_collection, armature) = import_library_model(models[name], library, output_format)
+                imported[name] = (model_collection, armature.matrix_world.copy() if armature is not None else Matrix.Identity(4))
+        if imported[name] is None:
+            continue
+        (model_collection, armature_matrix) = imported[name]
+        instance = bpy.data.objects.new(f"{entry['Name']}.{entry['Index']}", None)
+        instance.instance_type = 'COLLECTION'
+        instance.instance_collection = model_collection
+        instance.matrix_world = placement_matrix(entry, armature_matrix, rotation_units)
+        instance['sge_map_entry'] = entry['Index']
+        instance['sge_map_should_process'] = entry['ShouldProcess']
+        map_collection.objects.link(instance)
+        placed += 1
+
+    print(f'Assembled {placed} placements of {len([m for m in imported.values() if m is not None])} models')
+    return {'FINISHED'}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Assembles a map from its placement CSV and saves it as a .blend or .glb next to the CSV")
+    parser.add_argument('csv', help='The placement CSV exported from a MapFile')
+    parser.add_argument('models', help='Directory holding the .sge.json of every model the map places')
+    parser.add_argument('format', help='The output format (blend or gltf)')
+    parser.add_argument('--rotation-units', type=lambda x: int(x, 0), default=default_rotation_units,
+                        help='Rotation value of a full turn about the vertical axis (default 0x10000)')
+    # Blender's own arguments come before --; without one, the CSV, models directory and format are the last three arguments
+    args = parser.parse_args(sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else sys.argv[-3:])
+    (csv_path, models_path, output_format, rotation_units) = (args.csv, args.models, args.format, args.rotation_units)
+
+    # Clean scene
+    for o in bpy.context.scene.objects:
+        o.select_set(True)
+    bpy.ops.object.delete()
+
+    assemble_map(csv_path, models_path, output_format, rotation_units)
+    sge_import.export_scene(csv_path, output_format)
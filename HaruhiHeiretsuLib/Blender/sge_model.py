@@ -0,0 +1,268 @@
+from array import array
+
+# The in-memory SGE: __slots__ classes with flat typed arrays, keeping unused JSON fields in `extra`
+
+# Sections of the JSON with a class of their own (or a typed array) here; the rest are kept as decoded JSON
+modeled_sections = ('Name', 'GeometrySidecar', 'SgeHeader', 'SgeAnimations', 'TranslateDataEntries', 'RotateDataEntries',
+                    'ScaleDataEntries', 'SgeMaterials', 'SgeBones', 'SgeSubmeshes')
+
+def json_vector(values):
+    return { 'X': values[0], 'Y': values[1], 'Z': values[2] }
+
+def vector_values(json_vector):
+    return (json_vector['X'], json_vector['Y'], json_vector['Z'])
+
+# Splits a JSON object into the values of `keys` (None where missing) and a dict of everything else
+def split_json(value, keys):
+    return ([value.get(k) for k in keys], { k: v for (k, v) in value.items() if k not in keys })
+
+class SgeHeader:
+    __slots__ = ('version', 'model_type', 'extra')
+    json_keys = ('Version', 'ModelType')
+
+    def __init__(self, version=8, model_type=3, extra=None):
+        self.version = version
+        self.model_type = model_type
+        self.extra = extra or {}
+
+    @classmethod
+    def from_json(cls, header):
+        ((version, model_type), extra) = split_json(header, cls.json_keys)
+        return cls(version, model_type, extra)
+
+    def to_json(self):
+        return { 'Version': self.version, 'ModelType': self.model_type, **self.extra }
+
+class SgeMaterial:
+    __slots__ = ('index', 'name', 'texture_path', 'extra')
+    json_keys = ('Index', 'Name', 'TexturePath')
+
+    def __init__(self, index, name, texture_path, extra=None):
+        self.index = index
+        self.name = name
+        self.texture_path = texture_path
+        self.extra = extra or {}
+
+    @classmethod
+    def from_json(cls, material):
+        if material is None:
+            return None
+        ((index, name, texture_path), extra) = split_json(material, cls.json_keys)
+        return cls(index, name, texture_path, extra)
+
+    def to_json(self):
+        return { 'Index': self.index, 'Name': self.name, 'TexturePath': self.texture_path, **self.extra }
+
+# vertex_group is (vertices, weights) with a (submesh group, submesh, vertex index) triple per weight
+class SgeBone:
+    __slots__ = ('address', 'head_position', 'tail_offset', 'parent_address', 'child_address', 'next_sibling_address', 'body_part',
+                 'blender_name', 'vertex_group', 'extra')
+    json_keys = ('Address', 'HeadPosition', 'TailOffset', 'ParentAddress', 'ChildAddress', 'NextSiblingAddress', 'BodyPart',
+                 'BlenderName', 'VertexGroup')
+
+    def __init__(self, address, head_position=(0.0, 0.0, 0.0), tail_offset=(0.0, 1.0, 0.0), parent_address=0, child_address=0,
+                 next_sibling_address=0, body_part=None, blender_name=None, vertex_group=None, extra=None):
+        self.address = address
+        self.head_position = head_position
+        self.tail_offset = tail_offset
+        self.parent_address = parent_address
+        self.child_address = child_address
+        self.next_sibling_address = next_sibling_address
+        self.body_part = body_part
+        self.blender_name = blender_name
+        self.vertex_group = vertex_group
+        self.extra = extra or {}
+
+    @classmethod
+    def from_json(cls, bone, sidecar=None):
+        ((address, head, tail, parent, child, sibling, body_part, blender_name, json_group), extra) = split_json(bone, cls.json_keys)
+        vertex_group = None
+        if sidecar is not None and extra.pop('VertexGroupArrays', None) is not None:
+            vertex_group = (sidecar.vertex_group_array(bone, 'Vertices'), sidecar.vertex_group_array(bone, 'Weights'))
+        elif json_group is not None:
+            vertex_group = (array('i', [int(i) for attached_vertex in json_group for i in attached_vertex.split(',')]),
+                            array('d', json_group.values()))
+        return cls(address, vector_values(head), vector_values(tail), parent, child, sibling, body_part, blender_name, vertex_group, extra)
+
+    def to_json(self):
+        bone = {}
+        if self.blender_name is not None:
+            bone['BlenderName'] = self.blender_name
+        bone['Address'] = self.address
+        bone['TailOffset'] = json_vector(self.tail_offset)
+        bone['HeadPosition'] = json_vector(self.head_position)
+        bone['ParentAddress'] = self.parent_address
+        bone['ChildAddress'] = self.child_address
+        bone['NextSiblingAddress'] = self.next_sibling_address
+        if self.body_part is not None:
+            bone['BodyPart'] = self.body_part
+        if self.vertex_group is not None:
+            (vertices, weights) = self.vertex_group
+            bone['VertexGroup'] = { f'{vertices[i * 3]},{vertices[i * 3 + 1]},{vertices[i * 3 + 2]}': weights[i] for i in range(len(weights)) }
+        bone.update(self.extra)
+        return bone
+
+# Flat arrays: 3 per position and normal, 2 per UV, 4 per color, bone slot and weight, 3 vertex indices per face
+class SgeSubmesh:
+    __slots__ = ('material', 'bone_palette', 'positions', 'normals', 'uvs', 'colors', 'bone_indices', 'weights', 'unknown2', 'faces',
+                 'gx_lighting_address', 'outline_address', 'start_vertex', 'end_vertex', 'start_face', 'face_count', 'extra')
+    json_keys = ('Material', 'BonePalette', 'SubmeshVertices', 'SubmeshFaces', 'GXLightingAddress', 'OutlineAddress', 'StartVertex',
+                 'EndVertex', 'StartFace', 'FaceCount')
+
+    def __init__(self, material, bone_palette, positions, normals, uvs, colors, bone_indices, weights, unknown2, faces,
+                 gx_lighting_address=1, outline_address=None, start_vertex=0, end_vertex=None, start_face=0, face_count=None, extra=None):
+        self.material = material
+        self.bone_palette = bone_palette
+        self.positions = positions
+        self.normals = normals
+        self.uvs = uvs
+        self.colors = colors
+        self.bone_indices = bone_indices
+        self.weights = weights
+        self.unknown2 = unknown2
+        self.faces = faces
+        self.gx_lighting_address = gx_lighting_address
+        self.outline_address = outline_address
+        self.start_vertex = start_vertex
+        self.end_vertex = end_vertex if end_vertex is not None else start_vertex + len(positions) // 3 - 1
+        self.start_face = start_face
+        self.face_count = face_count if face_count is not None else len(faces) // 3
+        self.extra = extra or {}
+
+    @property
+    def vertex_count(self):
+        return len(self.positions) // 3
+
+    # A sidecar is needed to read a submesh with SidecarArrays
+    @classmethod
+    def from_json(cls, submesh, sidecar=None):
+        ((material, bone_palette, sge_vertices, sge_faces, gx_lighting_address, outline_address, start_vertex, end_vertex, start_face,
+          face_count), extra) = split_json(submesh, cls.json_keys)
+        if sidecar is not None and extra.pop('SidecarArrays', None) is not None:
+            (positions, normals, uvs, colors, weights, bone_indices, unknown2, faces) = (sidecar.submesh_array(submesh, name) for name in
+                ('Positions', 'Normals', 'UVCoords', 'Colors', 'Weights', 'BoneIndices', 'Unknown2', 'Faces'))
+        else:
+            positions = array('d', [c for v in sge_vertices for c in vector_values(v['Position'])])
+            normals = array('d', [c for v in sge_vertices for c in vector_values(v['Normal'])])
+            uvs = array('d', [c for v in sge_vertices for c in (v['UVCoords']['X'], v['UVCoords']['Y'])])
+            colors = array('d', [c for v in sge_vertices for c in (v['Color']['R'], v['Color']['G'], v['Color']['B'], v['Color']['A'])])
+            bone_indices = array('i', [b for v in sge_vertices for b in v['BoneIndices']])
+            weights = array('d', [w for v in sge_vertices for w in v['Weight']])
+            unknown2 = array('i', [v['Unknown2'] for v in sge_vertices])
+            faces = array('i', [i for f in sge_faces for i in f['Polygon']])
+        return cls(SgeMaterial.from_json(material), array('i', bone_palette), positions, normals, uvs, colors, bone_indices, weights,
+                   unknown2, faces, gx_lighting_address, outline_address, start_vertex, end_vertex, start_face, face_count, extra)
+
+    def vertices_json(self):
+        (positions, normals, uvs, colors, bone_indices, weights) = (self.positions, self.normals, self.uvs, self.colors, self.bone_indices, self.weights)
+        return [{
+            'Position': { 'X': positions[i * 3], 'Y': positions[i * 3 + 1], 'Z': positions[i * 3 + 2] },
+            'Unknown2': self.unknown2[i],
+            'BoneIndices': list(bone_indices[i * 4:(i + 1) * 4]),
+            'Weight': list(weights[i * 4:(i + 1) * 4]),
+            'Normal': { 'X': normals[i * 3], 'Y': normals[i * 3 + 1], 'Z': normals[i * 3 + 2] },
+            'UVCoords': { 'X': uvs[i * 2], 'Y': uvs[i * 2 + 1] },
+            'Color': { 'R': colors[i * 4], 'G': colors[i * 4 + 1], 'B': colors[i * 4 + 2], 'A': colors[i * 4 + 3] },
+        } for i in range(self.vertex_count)]
+
+    def faces_json(self):
+        faces = self.faces
+        return [{ 'Polygon': [faces[i], faces[i + 1], faces[i + 2]] } for i in range(0, len(faces), 3)]
+
+    # With sidecar_arrays the JSON only points at the submesh's arrays in the sidecar
+    def to_json(self, sidecar_arrays=None):
+        submesh = {
+            'Material': self.material.to_json() if self.material is not None else None,
+            'BonePalette': list(self.bone_palette),
+            'SubmeshVertices': self.vertices_json() if sidecar_arrays is None else [],
+            'SubmeshFaces': self.faces_json() if sidecar_arrays is None else [],
+            'GXLightingAddress': self.gx_lighting_address,
+        }
+        if self.outline_address is not None:
+            submesh['OutlineAddress'] = self.outline_address
+        submesh.update({ 'StartVertex': self.start_vertex, 'EndVertex': self.end_vertex, 'StartFace': self.start_face, 'FaceCount': self.face_count })
+        submesh.update(self.extra)
+        if sidecar_arrays is not None:
+            submesh['SidecarArrays'] = sidecar_arrays
+        return submesh
+
+# keyframe_indices: (TranslateIndex, RotateIndex, ScaleIndex) per used keyframe of each bone but the root
+class SgeAnimation:
+    __slots__ = ('total_frames', 'unknown04', 'used_keyframes', 'bone_count', 'keyframe_indices', 'extra')
+    json_keys = ('TotalFrames', 'Unknown04', 'UsedKeyframes', 'BoneTable')
+    index_keys = ('TranslateIndex', 'RotateIndex', 'ScaleIndex')
+
+    def __init__(self, total_frames, unknown04, used_keyframes, bone_count, keyframe_indices, extra=None):
+        self.total_frames = total_frames
+        self.unknown04 = unknown04
+        self.used_keyframes = used_keyframes
+        self.bone_count = bone_count
+        self.keyframe_indices = keyframe_indices
+        self.extra = extra or {}
+
+    @classmethod
+    def from_json(cls, animation):
+        ((total_frames, unknown04, used_keyframes, bone_table), extra) = split_json(animation, cls.json_keys)
+        keyframe_indices = array('i', [keyframe[k] for bone in bone_table for keyframe in bone['Keyframes'] for k in cls.index_keys])
+        return cls(total_frames, unknown04, array('i', used_keyframes), len(bone_table), keyframe_indices, extra)
+
+    def to_json(self):
+        (indices, keyframe_count) = (self.keyframe_indices, len(self.used_keyframes))
+        return {
+            'TotalFrames': self.total_frames,
+            'Unknown04': self.unknown04,
+            'UsedKeyframes': list(self.used_keyframes),
+            'BoneTable': [{ 'Keyframes': [{ 'TranslateIndex': indices[k], 'RotateIndex': indices[k + 1], 'ScaleIndex': indices[k + 2] }
+                                          for k in range(b * keyframe_count * 3, (b + 1) * keyframe_count * 3, 3)] } for b in range(self.bone_count)],
+            **self.extra,
+        }
+
+# The whole model; rotations are (W, X, Y, Z) and tables keeps every other section as decoded JSON in file order
+class SgeModel:
+    __slots__ = ('name', 'geometry_sidecar', 'header', 'animations', 'translations', 'rotations', 'scales', 'tables', 'materials', 'bones',
+                 'submesh_groups')
+
+    def __init__(self, name, header=None, geometry_sidecar=None):
+        self.name = name
+        self.geometry_sidecar = geometry_sidecar
+        self.header = header if header is not None else SgeHeader()
+        self.animations = []
+        self.translations = array('d')
+        self.rotations = array('d')
+        self.scales = array('d')
+        self.tables = {}
+        self.materials = []
+        self.bones = []
+        self.submesh_groups = []
+
+    @classmethod
+    def from_json(cls, sge, sidecar=None):
+        model = cls(sge.get('Name'), SgeHeader.from_json(sge['SgeHeader']) if 'SgeHeader' in sge else None, sge.get('GeometrySidecar'))
+        model.animations = [SgeAnimation.from_json(a) for a in sge.get('SgeAnimations', [])]
+        model.translations = array('d', [c for t in sge.get('TranslateDataEntries', []) for c in vector_values(t)])
+        model.rotations = array('d', [c for r in sge.get('RotateDataEntries', []) for c in (r['W'], r['X'], r['Y'], r['Z'])])
+        model.scales = array('d', [c for s in sge.get('ScaleDataEntries', []) for c in vector_values(s)])
+        model.tables = { k: v for (k, v) in sge.items() if k not in modeled_sections }
+        model.materials = [SgeMaterial.from_json(m) for m in sge.get('SgeMaterials', [])]
+        model.bones = [SgeBone.from_json(b, sidecar) for b in sge.get('SgeBones', [])]
+        model.submesh_groups = [[SgeSubmesh.from_json(s, sidecar) for s in group] for group in sge.get('SgeSubmeshes', [])]
+        return model
+
+    def sections(self):
+        yield ('Name', self.name)
+        if self.geometry_sidecar is not None:
+            yield ('GeometrySidecar', self.geometry_sidecar)
+        yield ('SgeHeader', self.header.to_json())
+        yield ('SgeAnimations', [a.to_json() for a in self.animations])
+        (t, r, s) = (self.translations, self.rotations, self.scales)
+        yield ('TranslateDataEntries', [json_vector(t[i:i + 3]) for i in range(0, len(t), 3)])
+        yield ('RotateDataEntries', [{ 'X': r[i + 1], 'Y': r[i + 2], 'Z': r[i + 3], 'W': r[i] } for i in range(0, len(r), 4)])
+        yield ('ScaleDataEntries', [json_vector(s[i:i + 3]) for i in range(0, len(s), 3)])
+        yield from self.tables.items()
+        yield ('SgeMaterials', [m.to_json() for m in self.materials])
+        yield ('SgeBones', [b.to_json() for b in self.bones])
+
+    def to_json(self):
+        sge = dict(self.sections())
+        sge['SgeSubmeshes'] = [[s.to_json() for s in group] for group in self.submesh_groups]
+        return sge
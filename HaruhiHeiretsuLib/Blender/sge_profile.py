@@ -0,0 +1,127 @@
+from contextlib import contextmanager
+import json
+import os
+import time
+import tracemalloc
+
+# Opt-in (SGE_PROFILE=1) per-stage timing and peak memory for import_sge/export_sge, written as JSON next to the model
+profile_env_var = 'SGE_PROFILE'
+
+def profiling_requested():
+    return os.environ.get(profile_env_var, '') not in ('', '0')
+
+class StageRecord:
+    def __init__(self):
+        self.counts = {}
+        self.peak = 0
+
+    def count(self, **counts):
+        for (name, n) in counts.items():
+            self.counts[name] = self.counts.get(name, 0) + n
+
+class NullRecord:
+    def count(self, **counts):
+        pass
+
+null_record = NullRecord()
+
+class SgeProfiler:
+    def __init__(self, enabled=None):
+        self.enabled = profiling_requested() if enabled is None else enabled
+        self.stages = {}
+        self.submeshes = []
+        self.total_seconds = 0.0
+        self.peak_traced_bytes = 0
+        self._stack = []
+        self._start = None
+        self._started_tracing = False
+
+    def start(self):
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        tracemalloc.reset_peak()
+        self._start = time.perf_counter()
+
+    def stop(self):
+        if not self.enabled or self._start is None:
+            return
+        self.total_seconds = time.perf_counter() - self._start
+        self.peak_traced_bytes = max([self.peak_traced_bytes, tracemalloc.get_traced_memory()[1]] + [s['PeakTracedBytes'] for s in self.stages.values()])
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._start = None
+
+    # Times the block as a call of the stage; the yielded record takes element counts
+    @contextmanager
+    def stage(self, name, submesh=None):
+        if not self.enabled:
+            yield null_record
+            return
+        record = StageRecord()
+        # tracemalloc only keeps one peak, so fold it into the enclosing stage before resetting it for this one
+        if len(self._stack) > 0:
+            self._stack[-1].peak = max(self._stack[-1].peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self._stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start
+            self._stack.pop()
+            record.peak = max(record.peak, tracemalloc.get_traced_memory()[1])
+            if len(self._stack) > 0:
+                self._stack[-1].peak = max(self._stack[-1].peak, record.peak)
+            stage = self.stages.setdefault(name, { 'Calls': 0, 'Seconds': 0.0, 'PeakTracedBytes': 0, 'Counts': {} })
+            stage['Calls'] += 1
+            stage['Seconds'] += seconds
+            stage['PeakTracedBytes'] = max(stage['PeakTracedBytes'], record.peak)
+            for (count_name, n) in record.counts.items():
+                stage['Counts'][count_name] = stage['Counts'].get(count_name, 0) + n
+            if submesh is not None:
+                self.submeshes.append({ 'Name': submesh, 'Stage': name, 'Seconds': seconds, 'PeakTracedBytes': record.peak, 'Counts': record.counts })
+
+    # Iterates over an iterable, timing each step as a call of the named stage (e.g. decoding streamed JSON)
+    def iterate(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def report(self, operation, path):
+        return {
+            'Operation': operation,
+            'Path': path,
+            'TotalSeconds': self.total_seconds,
+            'PeakTracedBytes': self.peak_traced_bytes,
+            'Stages': self.stages,
+            'Submeshes': self.submeshes,
+        }
+
+    # Writes the JSON report next to the model (model.sge.json -> model.sge_import_profile.json) and prints a summary
+    def finish(self, operation, model_path):
+        if not self.enabled:
+            return None
+        self.stop()
+        base = model_path[:-len('.sge.json')] if model_path.endswith('.sge.json') else os.path.splitext(model_path)[0]
+        report_path = f'{base}.sge_{operation}_profile.json'
+        with open(report_path, 'w') as f:
+            json.dump(self.report(operation, model_path), f, indent=2)
+        self.print_summary(operation)
+        print(f'Wrote {operation} profile to {report_path}')
+        return report_path
+
+    def print_summary(self, operation):
+        print(f'SGE {operation} profile: {self.total_seconds:.3f}s total, {self.peak_traced_bytes / (1 << 20):.1f} MiB peak traced memory')
+        for (name, stage) in sorted(self.stages.items(), key=lambda s: s[1]['Seconds'], reverse=True):
+            counts = ', '.join(f'{n} {count_name}' for (count_name, n) in stage['Counts'].items())
+            print(f"  {name:<24} {stage['Seconds']:9.3f}s {stage['Calls']:6d} calls {stage['PeakTracedBytes'] / (1 << 20):8.1f} MiB"
+                  + (f'  ({counts})' if len(counts) > 0 else ''))
@@ -0,0 +1,204 @@
+from array import array
+import json
+import mmap
+import os
+import struct
+import sys
+
+if __package__:
+    from . import sge_model
+else:
+    # Running as a standalone script, so make sibling modules importable
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    import sge_model
+
+# .sge.bin: 'SGEB', u32 version, then 16-byte aligned little-endian arrays that SidecarArrays/VertexGroupArrays point into
+sidecar_magic = b'SGEB'
+sidecar_version = 2
+sidecar_alignment = 16
+
+# name: (array typecode, components per element)
+submesh_arrays = {
+    'Positions': ('f', 3), # float32, like Blender
+    'Normals': ('f', 3), # float32
+    'UVCoords': ('f', 2), # float32
+    'Colors': ('f', 4), # float32
+    'Weights': ('d', 4), # float64, exact to the JSON (float32 in version 1)
+    'BoneIndices': ('B', 4), # uint8 palette slots
+    'Unknown2': ('i', 1),
+    'Faces': ('i', 3),
+}
+vertex_group_arrays = {
+    'Vertices': ('i', 3), # submesh group, submesh, vertex index
+    'Weights': ('d', 1), # float64 (float32 in version 1)
+}
+
+def sidecar_path(json_path):
+    if json_path.endswith('.sge.json'):
+        return json_path[:-len('.sge.json')] + '.sge.bin'
+    return os.path.splitext(json_path)[0] + '.sge.bin'
+
+# The sidecar a loaded .sge.json references, or None for plain JSON
+def open_sidecar(json_path, sge):
+    if sge.get('GeometrySidecar') is None:
+        return None
+    return SgeSidecar(os.path.join(os.path.dirname(os.path.abspath(json_path)), sge['GeometrySidecar']))
+
+class SgeSidecar:
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.version) = struct.unpack_from('<4sI', self._mmap, 0)
+        if magic != sidecar_magic:
+            raise ValueError(f'{path} is not an SGE geometry sidecar')
+        if self.version not in (1, sidecar_version):
+            raise ValueError(f'Unsupported SGE geometry sidecar version {self.version} in {path}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass # views into the map are still alive; it will be unmapped once they are released
+        self._file.close()
+
+    # A zero-copy view into the mapped file on little-endian machines
+    def array(self, layout, descriptor):
+        (typecode, components) = layout
+        count = descriptor['Count'] * components
+        size = count * struct.calcsize(typecode)
+        view = memoryview(self._mmap)[descriptor['Offset']:descriptor['Offset'] + size].cast(typecode)
+        if sys.byteorder == 'little':
+            return view
+        values = array(typecode, view)
+        values.byteswap()
+        return values
+
+    def layout(self, arrays, name):
+        (typecode, components) = arrays[name]
+        if self.version == 1 and name == 'Weights':
+            typecode = 'f'
+        return (typecode, components)
+
+    def submesh_array(self, submesh, name):
+        return self.array(self.layout(submesh_arrays, name), submesh['SidecarArrays'][name])
+
+    def vertex_group_array(self, bone, name):
+        return self.array(self.layout(vertex_group_arrays, name), bone['VertexGroupArrays'][name])
+
+class SgeSidecarWriter:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'wb')
+        self._file.write(struct.pack('<4sI', sidecar_magic, sidecar_version))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def write_array(self, layout, values):
+        (typecode, components) = layout
+        values = array(typecode, values)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        padding = -self._file.tell() % sidecar_alignment
+        self._file.write(bytes(padding))
+        descriptor = { 'Offset': self._file.tell(), 'Count': len(values) // components }
+        values.tofile(self._file)
+        return descriptor
+
+    def write_submesh_arrays(self, submesh):
+        columns = {
+            'Positions': submesh.positions,
+            'Normals': submesh.normals,
+            'UVCoords': submesh.uvs,
+            'Colors': submesh.colors,
+            'Weights': submesh.weights,
+            'BoneIndices': submesh.bone_indices,
+            'Unknown2': submesh.unknown2,
+            'Faces': submesh.faces,
+        }
+        return { name: self.write_array(submesh_arrays[name], columns[name]) for name in submesh_arrays }
+
+    # Moves a JSON-schema submesh's vertices and faces into the sidecar, leaving only offsets behind
+    def write_submesh(self, submesh):
+        for v in submesh['SubmeshVertices']:
+            if len(v['BoneIndices']) != 4 or len(v['Weight']) != 4:
+                raise ValueError('SGE vertices must have exactly four bone indices and weights to be written to a sidecar')
+        submesh['SidecarArrays'] = self.write_submesh_arrays(sge_model.SgeSubmesh.from_json(submesh))
+        submesh['SubmeshVertices'] = []
+        submesh['SubmeshFaces'] = []
+
+    def write_vertex_group(self, bone):
+        vertices = [int(i) for attached_vertex in bone['VertexGroup'] for i in attached_vertex.split(',')]
+        weights = list(bone['VertexGroup'].values())
+        bone['VertexGroupArrays'] = {
+            'Vertices': self.write_array(vertex_group_arrays['Vertices'], vertices),
+            'Weights': self.write_array(vertex_group_arrays['Weights'], weights),
+        }
+        bone['VertexGroup'] = {}
+
+# Rebuilds the plain JSON SubmeshVertices/SubmeshFaces of a submesh from the sidecar
+def expand_submesh(sidecar, submesh):
+    model_submesh = sge_model.SgeSubmesh.from_json(submesh, sidecar)
+    submesh['SubmeshVertices'] = model_submesh.vertices_json()
+    submesh['SubmeshFaces'] = model_submesh.faces_json()
+    del submesh['SidecarArrays']
+
+def expand_vertex_group(sidecar, bone):
+    vertices = sidecar.vertex_group_array(bone, 'Vertices')
+    weights = sidecar.vertex_group_array(bone, 'Weights')
+    bone['VertexGroup'] = { f'{vertices[i * 3]},{vertices[i * 3 + 1]},{vertices[i * 3 + 2]}': weights[i] for i in range(len(weights)) }
+    del bone['VertexGroupArrays']
+
+# Converts a plain .sge.json into a slim .sge.json plus an .sge.bin sidecar
+def pack_sge_json(json_path):
+    with open(json_path) as f:
+        sge = json.load(f)
+    if sge.get('GeometrySidecar') is not None:
+        return
+    bin_path = sidecar_path(json_path)
+    with SgeSidecarWriter(bin_path) as writer:
+        for submesh_group in sge['SgeSubmeshes']:
+            for submesh in submesh_group:
+                writer.write_submesh(submesh)
+        for bone in sge['SgeBones']:
+            writer.write_vertex_group(bone)
+    sge = { 'GeometrySidecar': os.path.basename(bin_path), **sge }
+    with open(json_path, 'w') as f:
+        json.dump(sge, f)
+
+# Converts a slim .sge.json + .sge.bin pair back into a single plain .sge.json (e.g. for Sge.LoadFromJson)
+def unpack_sge_json(json_path):
+    with open(json_path) as f:
+        sge = json.load(f)
+    if sge.get('GeometrySidecar') is None:
+        return
+    with open_sidecar(json_path, sge) as sidecar:
+        for submesh_group in sge['SgeSubmeshes']:
+            for submesh in submesh_group:
+                expand_submesh(sidecar, submesh)
+        for bone in sge['SgeBones']:
+            if 'VertexGroupArrays' in bone:
+                expand_vertex_group(sidecar, bone)
+    del sge['GeometrySidecar']
+    with open(json_path, 'w') as f:
+        json.dump(sge, f)
+
+if __name__ == '__main__':
+    if sys.argv[-2] == 'pack':
+        pack_sge_json(sys.argv[-1])
+    elif sys.argv[-2] == 'unpack':
+        unpack_sge_json(sys.argv[-1])
+    else:
+        print('Usage: python sge_sidecar.py pack|unpack PATH/TO/model.sge.json')
@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import shutil
+import struct
+import zlib
+
+# { png file name: { "PixelHash", "Size", "MTime" } } of the textures written next to an .sge.json
+texture_manifest_name = '.sge_textures.json'
+
+# PNG color type by number of channels (grayscale, grayscale + alpha, RGB, RGBA)
+png_color_types = { 1: 0, 2: 4, 3: 2, 4: 6 }
+
+def pixel_fingerprint(pixels, width, height, channels):
+    fingerprint = hashlib.sha1(struct.pack('<3I', width, height, channels))
+    fingerprint.update(pixels)
+    return fingerprint.hexdigest()
+
+def read_texture_manifest(tex_folder):
+    manifest_path = os.path.join(tex_folder, texture_manifest_name)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except ValueError:
+        return {} # a corrupt manifest just means everything gets written again
+
+def write_texture_manifest(tex_folder, manifest):
+    with open(os.path.join(tex_folder, texture_manifest_name), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+# Whether the PNG at path was written from these exact pixels and hasn't been touched since
+def texture_is_current(manifest, path, fingerprint):
+    entry = manifest.get(os.path.basename(path))
+    if entry is None or entry['PixelHash'] != fingerprint or not os.path.exists(path):
+        return False
+    stat = os.stat(path)
+    return entry['Size'] == stat.st_size and entry['MTime'] == stat.st_mtime_ns
+
+def png_chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+# Encodes Blender-style float pixels (bottom row first, 0-1 per channel) as an 8-bit PNG
+def encode_png(pixels, width, height, channels):
+    import numpy as np # bundled with Blender; only needed once there's something to encode
+    values = np.frombuffer(pixels, dtype=np.float32).reshape(height, width, channels)[::-1]
+    rows = np.empty((height, width * channels + 1), dtype=np.uint8)
+    rows[:, 0] = 0 # no filter
+    rows[:, 1:] = np.rint(np.clip(values, 0, 1) * 255).reshape(height, width * channels)
+    header = struct.pack('>2I5B', width, height, 8, png_color_types[channels], 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', header) + png_chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)) + png_chunk(b'IEND', b'')
+
+def write_png(path, pixels, width, height, channels):
+    with open(path, 'wb') as f:
+        f.write(encode_png(pixels, width, height, channels))
+
+def record_texture(manifest, path, fingerprint):
+    stat = os.stat(path)
+    manifest[os.path.basename(path)] = { 'PixelHash': fingerprint, 'Size': stat.st_size, 'MTime': stat.st_mtime_ns }
+
+# Writes each (path, pixels, width, height, channels, fingerprint) on a thread pool (numpy and zlib release the GIL)
+def write_textures(textures, manifest, num_workers=None):
+    with ThreadPoolExecutor(max_workers=num_workers or os.cpu_count() or 1) as executor:
+        futures = [(path, fingerprint, executor.submit(write_png, path, pixels, width, height, channels))
+                   for (path, pixels, width, height, channels, fingerprint) in textures]
+        for (path, fingerprint, future) in futures:
+            future.result()
+            record_texture(manifest, path, fingerprint)
+
+# Copies each (source path, path, fingerprint) so every image keeps a PNG of its own name
+def copy_textures(textures, manifest):
+    for (source, path, fingerprint) in textures:
+        shutil.copyfile(source, path)
+        record_texture(manifest, path, fingerprint)
@@ -0,0 +1,120 @@
+from array import array
+
+# Tom Forsyth's linear-speed vertex cache optimization over flat triangle index arrays
+
+# Entries in the simulated post-transform vertex cache, both for scoring vertices and for measuring the ACMR
+cache_size = 16
+# Forsyth's scoring constants
+cache_decay_power = 1.5
+last_triangle_score = 0.75
+valence_boost_scale = 2.0
+valence_boost_power = 0.5
+
+# Vertices transformed per triangle with a FIFO cache of `size` entries (3 at worst, about 0.5 for a regular grid)
+def average_cache_miss_ratio(faces, size=cache_size):
+    triangle_count = len(faces) // 3
+    if triangle_count == 0:
+        return 0.0
+    cached = set()
+    fifo = []
+    misses = 0
+    for v in faces:
+        if v not in cached:
+            misses += 1
+            cached.add(v)
+            fifo.append(v)
+            if len(fifo) > size:
+                cached.discard(fifo.pop(0))
+    return misses / triangle_count
+
+# Score of a vertex at `position` in the LRU cache (-1 if it isn't cached) that still has `remaining` triangles to emit
+def vertex_score(position, remaining, size=cache_size):
+    if remaining == 0:
+        return -1.0
+    score = 0.0
+    if position >= 0:
+        if position < 3:
+            score = last_triangle_score # whatever the last triangle used is equally cheap to reuse
+        else:
+            score = (1.0 - (position - 3) / (size - 3)) ** cache_decay_power
+    return score + valence_boost_scale * remaining ** -valence_boost_power
+
+# Emits the best-scoring triangle of the cached vertices, or the first one left once none of them has any
+def optimize_face_order(faces, vertex_count, size=cache_size):
+    triangle_count = len(faces) // 3
+    if triangle_count < 2:
+        return array('i', faces)
+
+    # Each vertex's triangles, the ones still to emit kept at the front of its slice
+    remaining = array('i', [0]) * vertex_count
+    for v in faces:
+        remaining[v] += 1
+    offsets = array('i', [0]) * (vertex_count + 1)
+    for v in range(vertex_count):
+        offsets[v + 1] = offsets[v] + remaining[v]
+    vertex_triangles = array('i', [0]) * len(faces)
+    fill = array('i', offsets[:vertex_count])
+    for (corner, v) in enumerate(faces):
+        vertex_triangles[fill[v]] = corner // 3
+        fill[v] += 1
+
+    max_valence = max(remaining)
+    scores_by_position = [[vertex_score(p, r, size) for r in range(max_valence + 1)] for p in range(-1, size)]
+    positions = array('i', [-1]) * vertex_count
+    scores = [scores_by_position[0][remaining[v]] for v in range(vertex_count)]
+    triangle_scores = [scores[faces[t * 3]] + scores[faces[t * 3 + 1]] + scores[faces[t * 3 + 2]] for t in range(triangle_count)]
+    emitted = bytearray(triangle_count)
+
+    ordered = array('i')
+    cache = []
+    best = max(range(triangle_count), key=triangle_scores.__getitem__)
+    next_unemitted = 0
+    for _ in range(triangle_count):
+        if best < 0:
+            while emitted[next_unemitted]:
+                next_unemitted += 1
+            best = next_unemitted
+        triangle = faces[best * 3:best * 3 + 3]
+        ordered.extend(triangle)
+        emitted[best] = 1
+
+        for v in triangle:
+            start = offsets[v]
+            end = start + remaining[v] - 1
+            i = vertex_triangles.index(best, start, end + 1)
+            (vertex_triangles[i], vertex_triangles[end]) = (vertex_triangles[end], vertex_triangles[i])
+            remaining[v] -= 1
+
+        new_cache = list(dict.fromkeys(triangle))
+        new_cache += [v for v in cache if v not in new_cache]
+        for v in new_cache[size:]:
+            positions[v] = -1
+        cache = new_cache[:size]
+        touched = new_cache
+        for (p, v) in enumerate(cache):
+            positions[v] = p
+
+        best = -1
+        best_score = -1.0
+        for v in touched:
+            scores[v] = scores_by_position[positions[v] + 1][remaining[v]]
+        for v in touched:
+            start = offsets[v]
+            for t in vertex_triangles[start:start + remaining[v]]:
+                score = scores[faces[t * 3]] + scores[faces[t * 3 + 1]] + scores[faces[t * 3 + 2]]
+                triangle_scores[t] = score
+                if score > best_score:
+                    (best, best_score) = (t, score)
+    return ordered
+
+# The old index of each vertex in the order the faces first use them, with vertices no face uses kept at the end
+def vertex_fetch_order(faces, vertex_count):
+    used = dict.fromkeys(faces)
+    return array('i', list(used) + [v for v in range(vertex_count) if v not in used])
+
+# Rewrites faces to point at the vertices' positions in `order` (see vertex_fetch_order)
+def remap_faces(faces, order):
+    new_index = array('i', [0]) * len(order)
+    for (new, old) in enumerate(order):
+        new_index[old] = new
+    return array('i', [new_index[v] for v in faces])
@@ -0,0 +1,248 @@
+import argparse
+import contextlib
+import json
+import os
+import socket
+import sys
+import time
+import traceback
+
+# A warm worker for JSON-lines jobs (see client_jobs) inside Blender with -- --serve, or its client under plain Python
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+default_host = '127.0.0.1'
+default_port = 8731
+
+# A stdout stand-in that sends each line the scripts print as a log reply
+class LogWriter:
+    def __init__(self, send, job_id):
+        self.send = send
+        self.job_id = job_id
+        self.pending = ''
+
+    def write(self, text):
+        self.pending += text
+        *lines, self.pending = self.pending.split('\n')
+        for line in lines:
+            self.send({ 'Id': self.job_id, 'Status': 'log', 'Message': line })
+        return len(text)
+
+    def flush(self):
+        if len(self.pending) > 0:
+            self.send({ 'Id': self.job_id, 'Status': 'log', 'Message': self.pending })
+            self.pending = ''
+
+def load_scripts():
+    blender_dir = os.path.dirname(os.path.abspath(__file__))
+    if blender_dir not in sys.path:
+        sys.path.append(blender_dir)
+    import sge_export, sge_import, sge_influences
+    return (sge_import, sge_export, sge_influences)
+
+def import_job(job):
+    (sge_import, _, _) = load_scripts()
+    (input_file, output_format) = (job['Input'], job.get('Format', 'gltf'))
+    blend_file = f'{os.path.splitext(input_file)[0]}.blend'
+    reimport = job.get('Reimport', False) and os.path.exists(blend_file)
+    if reimport:
+        bpy.ops.wm.open_mainfile(filepath=blend_file)
+    else:
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+    sge_import.import_sge(input_file, output_format, reimport=reimport, merge_submeshes=job.get('MergeSubmeshes', False),
+                          lazy_animations=job.get('LazyAnimations', False))
+    return sge_import.export_scene(input_file, output_format)
+
+def export_job(job):
+    (_, sge_export, sge_influences) = load_scripts()
+    input_file = job['Input']
+    output_file = job.get('Output') or os.path.join(os.path.dirname(input_file), f'{os.path.splitext(os.path.basename(input_file))[0]}.sge.json')
+    precision = job.get('Precision')
+    float_precision = { attribute: precision for attribute in ('Position', 'Normal', 'UVCoords', 'Color') } if precision is not None else None
+    influence_budget = None
+    if job.get('InfluenceBudget') is not None:
+        budget = job['InfluenceBudget']
+        default_budget = sge_influences.default_budget
+        influence_budget = sge_influences.InfluenceBudget(budget.get('MaxInfluences', default_budget.max_influences),
+                                                          budget.get('MinWeight', default_budget.min_weight),
+                                                          budget.get('SmoothWeight', default_budget.smooth_weight))
+    bpy.ops.wm.open_mainfile(filepath=input_file)
+    sge_export.export_sge(output_file, job.get('ModelType', 3), job.get('Sidecar', False), float_precision, use_cache=job.get('UseCache', False),
+                          cache_optimization=job.get('OptimizeCache'), influence_budget=influence_budget)
+    return output_file
+
+commands = {
+    'import': import_job,
+    'export': export_job,
+    'ping': lambda job: None,
+}
+
+def run_job(job, send):
+    job_id = job.get('Id')
+    send({ 'Id': job_id, 'Status': 'started' })
+    result = { 'Id': job_id }
+    start = time.perf_counter()
+    log = LogWriter(send, job_id)
+    try:
+        if job.get('Command') not in commands:
+            raise ValueError(f"Unknown command {job.get('Command')!r}")
+        with contextlib.redirect_stdout(log):
+            output = commands[job['Command']](job)
+        result['Status'] = 'finished'
+        result['Output'] = output
+    except Exception:
+        result['Status'] = 'failed'
+        result['Error'] = traceback.format_exc()
+    log.flush()
+    result['Seconds'] = time.perf_counter() - start
+    send(result)
+
+# Reads jobs from reader until it runs out or a shutdown job comes in; returns whether the worker should keep going
+def serve_stream(reader, writer):
+    lost = []
+    def send(reply):
+        # A job keeps running if its client goes away
+        if len(lost) > 0:
+            return
+        try:
+            writer.write(json.dumps(reply) + '\n')
+            writer.flush()
+        except OSError as e:
+            lost.append(e)
+
+    for line in reader:
+        if len(line.strip()) == 0:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            send({ 'Id': None, 'Status': 'failed', 'Error': f'Invalid job: {e}' })
+            continue
+        if job.get('Command') == 'shutdown':
+            send({ 'Id': job.get('Id'), 'Status': 'finished', 'Seconds': 0.0 })
+            return False
+        run_job(job, send)
+        if len(lost) > 0:
+            raise lost[0]
+    return True
+
+# Blender's C code prints to fd 1 as well, so replies get a descriptor of their own and fd 1 is pointed at stderr
+def reply_stream(reply_fd):
+    sys.stdout.flush()
+    replies = os.fdopen(os.dup(reply_fd), 'w', encoding='utf-8')
+    if reply_fd == sys.stdout.fileno():
+        os.dup2(sys.stderr.fileno(), reply_fd)
+    return replies
+
+def serve(host=default_host, port=default_port):
+    load_scripts()
+    with socket.create_server((host, port)) as server:
+        print(f'SGE worker listening on {host}:{port}', flush=True)
+        running = True
+        while running:
+            (connection, _) = server.accept()
+            try:
+                with connection, connection.makefile('r', encoding='utf-8') as reader, connection.makefile('w', encoding='utf-8') as writer:
+                    running = serve_stream(reader, writer)
+            except OSError as e:
+                print(f'Lost connection to client: {e}', flush=True)
+    print('SGE worker stopped', flush=True)
+
+# Sends jobs to a running worker and yields its replies until every job has finished or failed
+def submit(jobs, host=default_host, port=default_port):
+    with socket.create_connection((host, port)) as connection, connection.makefile('r', encoding='utf-8') as reader, \
+            connection.makefile('w', encoding='utf-8') as writer:
+        for job in jobs:
+            writer.write(json.dumps(job) + '\n')
+        writer.flush()
+        remaining = len(jobs)
+        for line in reader:
+            reply = json.loads(line)
+            yield reply
+            if reply['Status'] in ('finished', 'failed'):
+                remaining -= 1
+                if remaining == 0:
+                    break
+
+def client_jobs(args):
+    if args.command == 'import':
+        return [{ 'Id': i, 'Command': 'import', 'Input': os.path.abspath(f), 'Format': args.format, 'Reimport': args.reimport,
+                  'MergeSubmeshes': args.merge_submeshes, 'LazyAnimations': args.lazy_animations } for (i, f) in enumerate(args.inputs)]
+    if args.command == 'export':
+        jobs = []
+        for (i, f) in enumerate(args.inputs):
+            job = { 'Id': i, 'Command': 'export', 'Input': os.path.abspath(f), 'ModelType': args.model_type, 'Sidecar': args.sidecar,
+                    'Precision': args.precision, 'UseCache': args.cache, 'OptimizeCache': args.optimize_cache }
+            if args.output is not None:
+                job['Output'] = os.path.abspath(args.output)
+            if args.min_weight is not None or args.smooth_weight is not None or args.max_influences is not None:
+                job['InfluenceBudget'] = { k: v for (k, v) in (('MaxInfluences', args.max_influences), ('MinWeight', args.min_weight),
+                                                               ('SmoothWeight', args.smooth_weight)) if v is not None }
+            jobs.append(job)
+        return jobs
+    return [{ 'Id': 0, 'Command': args.command }]
+
+def run_client(args):
+    jobs = client_jobs(args)
+    start = time.perf_counter()
+    failed = 0
+    for reply in submit(jobs, args.host, args.port):
+        if reply['Status'] == 'log':
+            if args.verbose:
+                print(f"  {reply['Message']}")
+        elif reply['Status'] == 'finished':
+            output = f" -> {reply['Output']}" if reply.get('Output') is not None else ''
+            print(f"Job {reply['Id']} finished in {reply['Seconds']:.2f}s{output}")
+        elif reply['Status'] == 'failed':
+            failed += 1
+            print(f"Job {reply['Id']} failed after {reply.get('Seconds', 0.0):.2f}s\n{reply['Error']}")
+    print(f'{len(jobs) - failed}/{len(jobs)} jobs succeeded in {time.perf_counter() - start:.2f}s')
+    return failed == 0
+
+if __name__ == '__main__':
+    if bpy is not None:
+        parser = argparse.ArgumentParser(description='Runs SGE import/export jobs in this Blender process as they come in')
+        parser.add_argument('--serve', action='store_true', help='Start the worker')
+        parser.add_argument('--host', default=default_host, help='Address to listen on')
+        parser.add_argument('--port', type=int, default=default_port, help='Port to listen on')
+        parser.add_argument('--stdin', action='store_true', help='Read jobs from stdin and write replies to stdout instead of listening on a port')
+        parser.add_argument('--reply-fd', type=int, default=1,
+                            help="With --stdin, write replies to this inherited descriptor instead (stdout also carries Blender's startup banner)")
+        args = parser.parse_args(sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else [])
+        if args.stdin:
+            replies = reply_stream(args.reply_fd)
+            load_scripts()
+            serve_stream(sys.stdin, replies)
+        else:
+            serve(args.host, args.port)
+    else:
+        parser = argparse.ArgumentParser(description='Submits SGE import/export jobs to a running sge_worker.py Blender worker')
+        parser.add_argument('--host', default=default_host, help='Address of the worker')
+        parser.add_argument('--port', type=int, default=default_port, help='Port of the worker')
+        parser.add_argument('--verbose', action='store_true', help="Show the scripts' own progress output")
+        commands_parser = parser.add_subparsers(dest='command', required=True)
+        import_parser = commands_parser.add_parser('import', help='Import .sge.json files and save them in another format')
+        import_parser.add_argument('inputs', nargs='+', help='.sge.json files to import')
+        import_parser.add_argument('--format', default='gltf', help='The output format (gltf, fbx, obj or blend)')
+        import_parser.add_argument('--reimport', action='store_true', help='Update the .blend a previous blend-format import wrote')
+        import_parser.add_argument('--merge-submeshes', action='store_true', help='Import each submesh group as a single object')
+        import_parser.add_argument('--lazy-animations', action='store_true', help='Leave building animations until they are opened')
+        export_parser = commands_parser.add_parser('export', help='Export .blend files to .sge.json')
+        export_parser.add_argument('inputs', nargs='+', help='.blend files to export')
+        export_parser.add_argument('--model-type', type=int, default=3, help='The model type of the SGE (0: object, 3: character, 4: map, 5: unknown)')
+        export_parser.add_argument('--output', help='Path of the .sge.json to write (only with a single input)')
+        export_parser.add_argument('--sidecar', action='store_true', help='Write a geometry sidecar')
+        export_parser.add_argument('--precision', type=int, help='Decimal places to keep for vertex positions, normals, UVs and colors')
+        export_parser.add_argument('--cache', action='store_true', help='Reuse the submeshes of objects that have not changed since the last export')
+        export_parser.add_argument('--optimize-cache', choices=('faces', 'vertices'), help='Reorder faces (and vertices) for the vertex cache')
+        export_parser.add_argument('--max-influences', type=int, help='Influence budget: bones each vertex keeps')
+        export_parser.add_argument('--min-weight', type=float, help='Influence budget: weights below this are dropped')
+        export_parser.add_argument('--smooth-weight', type=float, help='Influence budget: bone set smoothing weight')
+        commands_parser.add_parser('ping', help='Check that the worker is up')
+        commands_parser.add_parser('shutdown', help='Stop the worker')
+        args = parser.parse_args()
+        if args.command == 'export' and args.output is not None and len(args.inputs) > 1:
+            parser.error('--output only works with a single input')
+        sys.exit(0 if run_client(args) else 1)
@@ -0,0 +1,93 @@
+import os
+import sys
+from array import array
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sge_geometry
+from sge_model import SgeMaterial, SgeSubmesh
+
+def make_submesh(faces, vertex_count, material=None):
+    return SgeSubmesh(material, [0] * 16,
+                      positions=array('d', [float(c) for c in range(vertex_count * 3)]),
+                      normals=array('d', [0.0, 0.0, 1.0] * vertex_count),
+                      uvs=array('d', [c / 10 for c in range(vertex_count * 2)]),
+                      colors=array('d', [1.0] * (vertex_count * 4)),
+                      bone_indices=array('i', [0] * (vertex_count * 4)),
+                      weights=array('d', [1.0, 0.0, 0.0, 0.0] * vertex_count),
+                      unknown2=array('i', [0] * vertex_count),
+                      faces=array('i', faces))
+
+def test_build_submesh_buffers_flips_loops():
+    buffers = sge_geometry.build_submesh_buffers(make_submesh([0, 1, 2, 2, 1, 3], 4))
+    assert list(buffers.loop_vertices) == [0, 2, 1, 2, 3, 1]
+    assert list(buffers.loop_starts) == [0, 3]
+    assert buffers.face_count == 2
+    assert buffers.vertex_count == 4
+
+def test_build_submesh_buffers_uvs_follow_flipped_loops():
+    buffers = sge_geometry.build_submesh_buffers(make_submesh([0, 1, 2], 3))
+    assert list(buffers.loop_uvs) == list(array('f', [0.0, 0.1, 0.4, 0.5, 0.2, 0.3]))
+
+def test_build_submesh_buffers_scales_positions():
+    buffers = sge_geometry.build_submesh_buffers(make_submesh([0, 1, 2], 3), scale=2.0)
+    assert list(buffers.positions) == [c * 2.0 for c in range(9)]
+
+def test_build_submesh_buffers_fills_material_index():
+    buffers = sge_geometry.build_submesh_buffers(make_submesh([0, 1, 2, 2, 1, 3, 3, 1, 0], 4, SgeMaterial(5, 'mat', 'mat.png')))
+    assert list(buffers.material_indices) == [5, 5, 5]
+
+def test_build_submesh_buffers_without_material():
+    buffers = sge_geometry.build_submesh_buffers(make_submesh([0, 1, 2], 3))
+    assert list(buffers.material_indices) == [0]
+
+def test_last_loop_per_vertex():
+    last_loops = sge_geometry.last_loop_per_vertex(array('i', [0, 2, 1, 2, 3, 1]), 5)
+    assert list(last_loops) == [0, 5, 3, 4, -1]
+
+def test_resolve_influences_pads_palette():
+    (palette, _, _) = sge_geometry.resolve_influences([[(0x100, 1.0)], [(0x200, 0.5), (0x100, 0.5)]])
+    assert len(palette) == 16
+    assert sorted(palette[:2]) == [0x100, 0x200]
+    assert palette[2:] == [0] * 14
+
+def test_resolve_influences_maps_slots():
+    influences = [[(0x100, 1.0)], [(0x200, 0.25), (0x300, 0.75)]]
+    (palette, bone_indices, weights) = sge_geometry.resolve_influences(influences)
+    assert len(bone_indices) == len(weights) == 8
+    for (v, bones) in enumerate(influences):
+        for (i, (address, weight)) in enumerate(bones):
+            assert palette[bone_indices[v * 4 + i]] == address
+            assert weights[v * 4 + i] == weight
+    assert list(weights[1:4]) == [0.0, 0.0, 0.0]
+
+def test_resolve_influences_keeps_strongest():
+    (palette, bone_indices, weights) = sge_geometry.resolve_influences([[(1, 0.1), (2, 0.3), (3, 0.2), (4, 0.25), (5, 0.15)]])
+    assert sorted(palette[bone_indices[i]] for i in range(4)) == [2, 3, 4, 5]
+    assert 1 not in palette
+
+def test_partition_faces_fits_one_palette():
+    face_bones = [frozenset(range(i, i + 3)) for i in range(14)]
+    partitions = sge_geometry.partition_faces(face_bones)
+    assert len(partitions) == 1
+    assert partitions[0] == (list(range(16)), list(range(14)))
+
+def test_partition_faces_limits_palettes():
+    face_bones = [frozenset(range(i, i + 3)) for i in range(40)]
+    partitions = sge_geometry.partition_faces(face_bones)
+    assert len(partitions) > 1
+    assert all(len(palette) <= 16 for (palette, _) in partitions)
+    assert sorted(f for (_, faces) in partitions for f in faces) == list(range(40))
+    for (palette, faces) in partitions:
+        assert all(face_bones[f] <= set(palette) for f in faces)
+
+def test_partition_faces_keeps_bone_sets_together():
+    face_bones = [frozenset(range(b, b + 4)) for b in (0, 10, 20, 0, 10, 20)]
+    partitions = sge_geometry.partition_faces(face_bones, max_bones=8)
+    partition_of_face = { f: p for (p, (_, faces)) in enumerate(partitions) for f in faces }
+    assert len(partitions) == 2
+    assert [partition_of_face[f] for f in (0, 1, 2)] == [partition_of_face[f] for f in (3, 4, 5)]
+
+def test_weld_corners():
+    (corner_vertices, first_corners) = sge_geometry.weld_corners([(0, 0.5), (1, 0.5), (0, 0.5), (0, 0.25), (1, 0.5)])
+    assert list(corner_vertices) == [0, 1, 0, 2, 1]
+    assert list(first_corners) == [0, 1, 3]
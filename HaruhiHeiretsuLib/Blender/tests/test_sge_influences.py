@@ -0,0 +1,67 @@
+import os
+import sys
+
+from pytest import approx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sge_influences
+from sge_influences import InfluenceBudget
+
+def test_budget_influences_keeps_strongest_in_order():
+    influences = [('a', 0.1), ('b', 0.5), ('c', 0.2), ('d', 0.15), ('e', 0.05)]
+    budgeted = sge_influences.budget_influences(influences, InfluenceBudget(3, 0.0, 0.0))
+    assert [bone for (bone, _) in budgeted] == ['b', 'c', 'd']
+    assert [w for (_, w) in budgeted] == approx([0.5 / 0.85, 0.2 / 0.85, 0.15 / 0.85])
+
+def test_budget_influences_drops_weak_weights():
+    budgeted = sge_influences.budget_influences([('a', 0.1), ('b', 0.6), ('c', 0.3)], InfluenceBudget(4, 0.2, 0.0))
+    assert [bone for (bone, _) in budgeted] == ['b', 'c']
+    assert sum(w for (_, w) in budgeted) == approx(1.0)
+
+def test_budget_influences_keeps_at_least_one():
+    budgeted = sge_influences.budget_influences([('a', 0.05), ('b', 0.1)], InfluenceBudget(4, 0.5, 0.0))
+    assert budgeted == [('b', approx(1.0))]
+
+def test_budget_influences_empty():
+    assert sge_influences.budget_influences([], sge_influences.default_budget) == []
+
+def test_renormalized_leaves_zero_weights():
+    assert sge_influences.renormalized([('a', 0.0)]) == [('a', 0.0)]
+
+def test_smooth_bone_sets_drops_into_more_common_set():
+    common = [('a', 0.5), ('b', 0.5)]
+    vertices = [common, common, [('a', 0.5), ('b', 0.45), ('c', 0.05)]]
+    (smoothed, changed) = sge_influences.smooth_bone_sets(vertices, 0.1)
+    assert changed == 1
+    assert smoothed[:2] == [common, common]
+    assert [bone for (bone, _) in smoothed[2]] == ['a', 'b']
+    assert sum(w for (_, w) in smoothed[2]) == approx(1.0)
+
+def test_smooth_bone_sets_keeps_heavier_influences():
+    common = [('a', 0.5), ('b', 0.5)]
+    vertices = [common, common, [('a', 0.5), ('b', 0.3), ('c', 0.2)]]
+    (smoothed, changed) = sge_influences.smooth_bone_sets(vertices, 0.1)
+    assert changed == 0
+    assert smoothed == vertices
+
+def test_smooth_bone_sets_keeps_more_common_set():
+    rare = [('a', 0.5), ('b', 0.5)]
+    common = [('a', 0.5), ('b', 0.45), ('c', 0.05)]
+    (smoothed, changed) = sge_influences.smooth_bone_sets([common, common, rare], 0.1)
+    assert changed == 0
+    assert smoothed == [common, common, rare]
+
+def test_apply_budget_reports():
+    vertices = [[('a', 0.5), ('b', 0.5)], [('a', 0.5), ('b', 0.5)], [('a', 0.5), ('b', 0.44), ('c', 0.05), ('d', 0.01)]]
+    report = sge_influences.InfluenceReport()
+    budgeted = sge_influences.apply_budget(vertices, InfluenceBudget(4, 0.02, 0.1), report)
+    assert report.pruned == 1
+    assert report.smoothed == 1
+    assert [[bone for (bone, _) in influences] for influences in budgeted] == [['a', 'b']] * 3
+
+def test_apply_budget_without_smoothing():
+    vertices = [[('a', 0.5), ('b', 0.44), ('c', 0.05), ('d', 0.01)]]
+    report = sge_influences.InfluenceReport()
+    budgeted = sge_influences.apply_budget(vertices, InfluenceBudget(3, 0.0, 0.0), report)
+    assert (report.pruned, report.smoothed) == (1, 0)
+    assert [bone for (bone, _) in budgeted[0]] == ['a', 'b', 'c']
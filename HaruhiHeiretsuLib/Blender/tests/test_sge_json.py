@@ -0,0 +1,121 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sge_json
+
+def submesh(seed):
+    return { 'SubmeshVertices': [{ 'Position': [seed / 7, -seed * 1234.56789, 1e-7 * seed], 'Weight': [0.333333333333, 0.666666666667] }
+                                 for _ in range(3)],
+             'SubmeshFaces': [{ 'Polygon': [0, 1, 2] }], 'Material': seed }
+
+def make_sge(layout):
+    sections = {
+        'Name': 'stream_test',
+        'ModelScale': 1234.5678901234,
+        'SgeMaterials': [{ 'Index': 0, 'Name': 'métal', 'TexturePath': 'm.png' }],
+        'SgeBones': [{ 'Address': 4096 + i, 'Position': [i * 0.1, 2.5e-3, -i] } for i in range(4)],
+        'BoneAnimationGroups': [],
+        'OutlineDataTable': [{ 'Weight': 0.0025 }],
+        'SgeSubmeshes': [[submesh(1), submesh(2)], [], [submesh(3)]],
+        'SgeAnimations': [{ 'BoneTable': [{ 'Keyframes': [i, i + 1] } for i in range(3)], 'Duration': 12.75 }, None],
+        'KeyframeDefinitions': [{ 'Frame': 1.0 / 3 }],
+        'TranslateDataEntries': [[0.1, 0.2, 0.3]],
+        'RotateDataEntries': [[1.0, 0.0, 0.0, 0.0]],
+        'ScaleDataEntries': [[1.0, 1.0, 1.0]],
+    }
+    return { section: sections[section] for section in layout }
+
+tables_first = ['Name', 'ModelScale', 'SgeMaterials', 'SgeBones', 'BoneAnimationGroups', 'OutlineDataTable', 'KeyframeDefinitions',
+                'TranslateDataEntries', 'RotateDataEntries', 'ScaleDataEntries', 'SgeSubmeshes', 'SgeAnimations']
+tables_last = ['Name', 'SgeSubmeshes', 'ModelScale', 'SgeMaterials', 'SgeAnimations', 'SgeBones', 'BoneAnimationGroups', 'OutlineDataTable',
+               'KeyframeDefinitions', 'TranslateDataEntries', 'RotateDataEntries', 'ScaleDataEntries']
+
+def write_sge(tmp_path, sge, indent=None):
+    path = os.path.join(tmp_path, 'test.sge.json')
+    with open(path, 'w') as f:
+        json.dump(sge, f, indent=indent)
+    return path
+
+def streamed_tables(sge):
+    return { section: value for (section, value) in sge.items() if section not in sge_json.streamed_sections }
+
+def read_submeshes(stream):
+    return [list(submeshes) for (_, submeshes) in stream.iter_submesh_groups()]
+
+def read_animations(stream):
+    return [animation for (_, animation) in stream.iter_animations()]
+
+@pytest.mark.parametrize('chunk_size', [7, 64, 1 << 22])
+@pytest.mark.parametrize('indent', [None, 2])
+def test_stream_matches_json_load(tmp_path, chunk_size, indent):
+    path = write_sge(tmp_path, make_sge(tables_first), indent)
+    with open(path) as f:
+        expected = json.load(f)
+    with sge_json.SgeJsonStream(path, chunk_size=chunk_size) as stream:
+        assert stream.load_tables() == streamed_tables(expected)
+        assert read_submeshes(stream) == expected['SgeSubmeshes']
+        assert read_animations(stream) == expected['SgeAnimations']
+
+@pytest.mark.parametrize('chunk_size', [7, 64])
+def test_stream_spools_sections_before_tables(tmp_path, chunk_size):
+    path = write_sge(tmp_path, make_sge(tables_last))
+    with open(path) as f:
+        expected = json.load(f)
+    with sge_json.SgeJsonStream(path, chunk_size=chunk_size) as stream:
+        assert stream.load_tables() == streamed_tables(expected)
+        assert read_submeshes(stream) == expected['SgeSubmeshes']
+        assert read_animations(stream) == expected['SgeAnimations']
+
+def test_stream_reads_numbers_split_across_chunks(tmp_path):
+    path = os.path.join(tmp_path, 'numbers.sge.json')
+    with open(path, 'w') as f:
+        f.write('{"ModelScale":1234.5678901234,"Name":"x","Count":-987654321}')
+    for chunk_size in range(1, 24):
+        with sge_json.SgeJsonStream(path, required_tables=('ModelScale', 'Name', 'Count'), chunk_size=chunk_size) as stream:
+            assert stream.load_tables() == { 'ModelScale': 1234.5678901234, 'Name': 'x', 'Count': -987654321 }
+
+def test_stream_spools_submeshes_for_animations(tmp_path):
+    path = write_sge(tmp_path, make_sge(tables_first))
+    with open(path) as f:
+        expected = json.load(f)
+    with sge_json.SgeJsonStream(path, chunk_size=7) as stream:
+        stream.load_tables()
+        assert read_animations(stream) == expected['SgeAnimations']
+        assert read_submeshes(stream) == expected['SgeSubmeshes']
+
+def test_stream_skips_unfinished_groups(tmp_path):
+    path = write_sge(tmp_path, make_sge(tables_first))
+    with sge_json.SgeJsonStream(path, chunk_size=7) as stream:
+        stream.load_tables()
+        first_submeshes = [next(submeshes) for (j, submeshes) in stream.iter_submesh_groups() if j != 1]
+        assert first_submeshes == [submesh(1), submesh(3)]
+
+def test_stream_counts_sections(tmp_path):
+    path = write_sge(tmp_path, make_sge(tables_first))
+    with sge_json.SgeJsonStream(path, chunk_size=7) as stream:
+        stream.load_tables()
+        read_submeshes(stream)
+        assert stream.stats['SgeSubmeshes']['Objects'] == 3 * 5
+        assert stream.stats['SgeBones']['Objects'] == 4
+
+def test_writer_matches_json(tmp_path):
+    sge = make_sge(tables_first)
+    f = io.StringIO()
+    writer = sge_json.SgeJsonWriter(f)
+    for (section, value) in sge.items():
+        if section not in sge_json.streamed_sections:
+            writer.write_section(section, value)
+    writer.write_section('SgeAnimations', sge['SgeAnimations'])
+    writer.begin_submeshes()
+    for group in sge['SgeSubmeshes']:
+        for s in group:
+            writer.write_submesh(s)
+        writer.end_submesh_group(keep_empty=True)
+    writer.end_submeshes()
+    writer.close()
+    assert json.loads(f.getvalue()) == sge
@@ -0,0 +1,78 @@
+import json
+import os
+import sys
+from array import array
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+import generate_sge
+import sge_sidecar
+
+def f32(value):
+    return array('f', [value])[0]
+
+def write_sge(tmp_path):
+    path = os.path.join(tmp_path, 'sidecar_test.sge.json')
+    with open(path, 'w') as f:
+        json.dump(generate_sge.generate_sge('sidecar_test', vertices=120, bones=6, submeshes=3, animations=0), f)
+    with open(path) as f:
+        return (path, json.load(f))
+
+def read_sge(path):
+    with open(path) as f:
+        return json.load(f)
+
+def assert_vertices_match(vertex, expected, weight):
+    assert vertex['BoneIndices'] == expected['BoneIndices']
+    assert vertex['Unknown2'] == expected['Unknown2']
+    assert vertex['Weight'] == [weight(w) for w in expected['Weight']]
+    for key in ('Position', 'Normal', 'UVCoords', 'Color'):
+        assert vertex[key] == { axis: f32(value) for (axis, value) in expected[key].items() }
+
+def assert_unpacked(sge, expected, weight):
+    assert 'GeometrySidecar' not in sge
+    for (group, expected_group) in zip(sge['SgeSubmeshes'], expected['SgeSubmeshes']):
+        for (submesh, expected_submesh) in zip(group, expected_group):
+            assert 'SidecarArrays' not in submesh
+            assert submesh['SubmeshFaces'] == expected_submesh['SubmeshFaces']
+            assert len(submesh['SubmeshVertices']) == len(expected_submesh['SubmeshVertices'])
+            for (vertex, expected_vertex) in zip(submesh['SubmeshVertices'], expected_submesh['SubmeshVertices']):
+                assert_vertices_match(vertex, expected_vertex, weight)
+    for (bone, expected_bone) in zip(sge['SgeBones'], expected['SgeBones']):
+        assert bone['VertexGroup'] == { v: weight(w) for (v, w) in expected_bone['VertexGroup'].items() }
+
+def test_pack_moves_geometry_to_sidecar(tmp_path):
+    (path, _) = write_sge(tmp_path)
+    sge_sidecar.pack_sge_json(path)
+    sge = read_sge(path)
+    assert sge['GeometrySidecar'] == 'sidecar_test.sge.bin'
+    assert list(sge)[0] == 'GeometrySidecar'
+    for group in sge['SgeSubmeshes']:
+        for submesh in group:
+            assert submesh['SubmeshVertices'] == [] and submesh['SubmeshFaces'] == []
+            assert set(submesh['SidecarArrays']) == set(sge_sidecar.submesh_arrays)
+    with sge_sidecar.open_sidecar(path, sge) as sidecar:
+        assert sidecar.version == 2
+        submesh = sge['SgeSubmeshes'][0][0]
+        assert sidecar.submesh_array(submesh, 'Weights').format == 'd'
+        assert sidecar.submesh_array(submesh, 'Positions').format == 'f'
+        assert sidecar.submesh_array(submesh, 'BoneIndices').format == 'B'
+        assert sidecar.vertex_group_array(sge['SgeBones'][1], 'Weights').format == 'd'
+
+def test_round_trip_keeps_weights_exact(tmp_path):
+    (path, expected) = write_sge(tmp_path)
+    sge_sidecar.pack_sge_json(path)
+    sge_sidecar.unpack_sge_json(path)
+    assert_unpacked(read_sge(path), expected, lambda w: w)
+
+def test_version_1_sidecars_still_read(tmp_path, monkeypatch):
+    (path, expected) = write_sge(tmp_path)
+    monkeypatch.setattr(sge_sidecar, 'sidecar_version', 1)
+    monkeypatch.setitem(sge_sidecar.submesh_arrays, 'Weights', ('f', 4))
+    monkeypatch.setitem(sge_sidecar.vertex_group_arrays, 'Weights', ('f', 1))
+    sge_sidecar.pack_sge_json(path)
+    monkeypatch.undo()
+    with sge_sidecar.open_sidecar(path, read_sge(path)) as sidecar:
+        assert sidecar.version == 1
+    sge_sidecar.unpack_sge_json(path)
+    assert_unpacked(read_sge(path), expected, f32)
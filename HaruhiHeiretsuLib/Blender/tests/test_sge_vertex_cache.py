@@ -0,0 +1,55 @@
+import os
+import random
+import sys
+from array import array
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sge_vertex_cache
+
+def grid_faces(size):
+    faces = []
+    for y in range(size):
+        for x in range(size):
+            v = y * (size + 1) + x
+            faces += [v, v + 1, v + size + 1, v + 1, v + size + 2, v + size + 1]
+    return faces
+
+def shuffled_grid_faces(size):
+    faces = grid_faces(size)
+    triangles = [faces[t * 3:t * 3 + 3] for t in range(len(faces) // 3)]
+    random.Random(0).shuffle(triangles)
+    return [v for triangle in triangles for v in triangle]
+
+def triangles(faces):
+    return sorted(tuple(faces[t * 3:t * 3 + 3]) for t in range(len(faces) // 3))
+
+def test_average_cache_miss_ratio():
+    assert sge_vertex_cache.average_cache_miss_ratio([]) == 0.0
+    assert sge_vertex_cache.average_cache_miss_ratio([0, 1, 2]) == 3.0
+    assert sge_vertex_cache.average_cache_miss_ratio([0, 1, 2, 2, 1, 3]) == 2.0
+
+def test_optimize_face_order_keeps_triangles():
+    faces = shuffled_grid_faces(16)
+    ordered = sge_vertex_cache.optimize_face_order(faces, 17 * 17)
+    assert triangles(ordered) == triangles(faces)
+
+def test_optimize_face_order_lowers_acmr():
+    faces = shuffled_grid_faces(16)
+    ordered = sge_vertex_cache.optimize_face_order(faces, 17 * 17)
+    before = sge_vertex_cache.average_cache_miss_ratio(faces)
+    after = sge_vertex_cache.average_cache_miss_ratio(ordered)
+    assert before > 2.5
+    assert after < 1.0
+
+def test_optimize_face_order_single_triangle():
+    assert list(sge_vertex_cache.optimize_face_order([2, 0, 1], 3)) == [2, 0, 1]
+
+def test_vertex_fetch_order():
+    assert list(sge_vertex_cache.vertex_fetch_order([3, 1, 4, 1, 4, 0], 6)) == [3, 1, 4, 0, 2, 5]
+
+def test_remap_faces():
+    faces = array('i', shuffled_grid_faces(4))
+    order = sge_vertex_cache.vertex_fetch_order(faces, 25)
+    remapped = sge_vertex_cache.remap_faces(faces, order)
+    assert [order[v] for v in remapped] == list(faces)
+    assert list(dict.fromkeys(remapped)) == list(range(25))